@@ -0,0 +1,133 @@
+"""
+Admission Control Module
+Bounds how many prediction requests are admitted at once and carries each
+request's deadline down to the micro-batcher and the model
+
+Requests over the in-flight limit are turned away immediately instead of
+queueing behind work that is already late. An admitted request gets a
+deadline; images whose deadline has passed are dropped before the forward
+pass, so the model only computes answers someone is still waiting for.
+"""
+
+import contextvars
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a request's deadline passes before its images reach the model
+    """
+    pass
+
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+def current_deadline():
+    """
+    Returns:
+        float: time.perf_counter() value by which the current request must be
+        answered, or None if it has no deadline
+    """
+    return _deadline.get()
+
+
+def set_deadline(deadline):
+    """
+    Make deadline the current request's deadline
+
+    Returns:
+        Token: Pass to reset_deadline when the request ends
+    """
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def check_deadline(deadline=None):
+    """
+    Raise DeadlineExceeded if the deadline (default: the current request's) has passed
+    """
+    if deadline is None:
+        deadline = _deadline.get()
+    if deadline is not None and time.perf_counter() >= deadline:
+        raise DeadlineExceeded(
+            f'request deadline passed {(time.perf_counter() - deadline) * 1000.0:.0f} ms ago'
+        )
+
+
+def parse_timeout(value, maximum):
+    """
+    Seconds a client is willing to wait, from its X-Request-Timeout header
+
+    Args:
+        value (str): Header value, or None
+        maximum (float): Timeout of requests without the header, and the most
+            a client can ask for; 0 for no limit
+
+    Returns:
+        float: Timeout in seconds, or None for no deadline
+    """
+    try:
+        timeout = float(value) if value else None
+    except ValueError:
+        timeout = None
+    if timeout is None or timeout <= 0:
+        return maximum or None
+    return min(timeout, maximum) if maximum else timeout
+
+
+class AdmissionController:
+    """
+    Non-blocking limit on the requests being handled at once
+    """
+
+    def __init__(self, max_in_flight=32):
+        """
+        Args:
+            max_in_flight (int): Requests admitted at once; 0 admits everything
+        """
+        self.max_in_flight = max(0, int(max_in_flight))
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._admitted = 0
+        self._rejected = 0
+
+    def try_acquire(self):
+        """
+        Admit a request if there is room
+
+        Returns:
+            bool: True if admitted; the caller must then call release()
+        """
+        with self._lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                self._rejected += 1
+                return False
+            self._in_flight += 1
+            self._admitted += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def in_flight(self):
+        return self._in_flight
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: Limit, current in-flight requests and admission counters
+        """
+        with self._lock:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self._in_flight,
+                'admitted': self._admitted,
+                'rejected': self._rejected
+            }
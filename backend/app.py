@@ -3,12 +3,25 @@ Flask Backend API for Chest X-Ray Disease Prediction
 Provides REST API endpoints for image upload and prediction
 """
 
-from flask import Flask, request, jsonify, send_from_directory, render_template_string
+from flask import Flask, request, jsonify, send_from_directory, render_template_string, g, Response
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
 import os
 from model import predictor
+from batching import MicroBatcher, QueueFullError
+from admission import (
+    AdmissionController, DeadlineExceeded, check_deadline, parse_timeout,
+    set_deadline, reset_deadline
+)
+from parallel import PreprocessPool, PoolFullError
+from shm_pool import SharedMemoryPreprocessPool
+from cache import PredictionCache
+from ingest import make_request_class, ingest_files
+from metrics import registry, CONTENT_TYPE, STAGE_SECONDS, PREDICTION_ERRORS
+from profiling import RequestProfiler
+from explain import ExplanationUnavailable, render_heatmap
+from jobs import JobStore, JobRunner, JobNotFound, JobQueueFullError, job_status
 import json
+import time
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -19,9 +32,267 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
+# Micro-batching of concurrent /api/predict calls
+app.config['BATCH_MAX_SIZE'] = int(os.environ.get('BATCH_MAX_SIZE', 8))
+app.config['BATCH_MAX_WAIT_MS'] = float(os.environ.get('BATCH_MAX_WAIT_MS', 10))
+app.config['BATCH_QUEUE_SIZE'] = int(os.environ.get('BATCH_QUEUE_SIZE', 64))
+app.config['BATCH_RESULT_TIMEOUT'] = 60  # Seconds to wait for a batched result
+
+# Priority lanes: /api/predict goes to 'interactive', /api/batch-predict to 'bulk'.
+# When both have work, each batch is shared by these weights; otherwise either
+# lane may use the whole batch.
+app.config['BATCH_INTERACTIVE_WEIGHT'] = float(os.environ.get('BATCH_INTERACTIVE_WEIGHT', 4))
+app.config['BATCH_BULK_WEIGHT'] = float(os.environ.get('BATCH_BULK_WEIGHT', 1))
+
+batcher = MicroBatcher(
+    predictor,
+    max_batch_size=app.config['BATCH_MAX_SIZE'],
+    max_wait_ms=app.config['BATCH_MAX_WAIT_MS'],
+    max_queue_size=app.config['BATCH_QUEUE_SIZE'],
+    lane_weights={
+        'interactive': app.config['BATCH_INTERACTIVE_WEIGHT'],
+        'bulk': app.config['BATCH_BULK_WEIGHT']
+    }
+)
+
+# Admission control: at most MAX_IN_FLIGHT prediction requests are handled at once
+# (0 = no limit), the rest get an immediate 429. An admitted request has
+# REQUEST_TIMEOUT_SECONDS (or a shorter X-Request-Timeout header) to be answered;
+# images still waiting when it passes are dropped before the forward pass.
+app.config['MAX_IN_FLIGHT'] = int(os.environ.get('MAX_IN_FLIGHT', 32))
+app.config['REQUEST_TIMEOUT_SECONDS'] = float(os.environ.get('REQUEST_TIMEOUT_SECONDS', 30))
+app.config['BUSY_RETRY_AFTER'] = int(os.environ.get('BUSY_RETRY_AFTER', 1))  # Seconds, on 429/503
+ADMISSION_ENDPOINTS = {'predict', 'batch_predict', 'explain'}
+
+admission = AdmissionController(max_in_flight=app.config['MAX_IN_FLIGHT'])
+
+# Parallel decode and preprocessing of the images in one request
+app.config['PREPROCESS_BACKEND'] = os.environ.get('PREPROCESS_BACKEND', 'threads')  # or 'processes'
+app.config['PREPROCESS_THREADS'] = int(os.environ.get('PREPROCESS_THREADS', min(4, os.cpu_count() or 1)))
+app.config['PREPROCESS_PROCESSES'] = int(os.environ.get('PREPROCESS_PROCESSES', os.cpu_count() or 1))
+app.config['PREPROCESS_MAX_PENDING'] = int(os.environ.get('PREPROCESS_MAX_PENDING', 64))
+
+if app.config['PREPROCESS_BACKEND'] == 'processes':
+    preprocess_pool = SharedMemoryPreprocessPool.from_engine(
+        predictor.preprocessor,
+        processes=app.config['PREPROCESS_PROCESSES'],
+        max_pending=app.config['PREPROCESS_MAX_PENDING']
+    )
+    preprocess_pool.warmup()
+else:
+    preprocess_pool = PreprocessPool(
+        max_workers=app.config['PREPROCESS_THREADS'],
+        max_pending=app.config['PREPROCESS_MAX_PENDING']
+    )
+predictor.preprocess_executor = preprocess_pool
+
+# Model loading: 'background' serves requests right away and loads in a thread,
+# 'lazy' loads on the first prediction, 'eager' loads before serving. Started
+# after the process pool has forked its workers.
+app.config['MODEL_LOAD_MODE'] = os.environ.get('MODEL_LOAD_MODE', 'background')
+app.config['MODEL_RETRY_AFTER'] = 5  # Seconds suggested to clients while loading
+
+if app.config['MODEL_LOAD_MODE'] == 'eager':
+    predictor.ensure_loaded()
+elif app.config['MODEL_LOAD_MODE'] == 'background':
+    predictor.start_background_load()
+
+# Uploads are parsed into memory; only files above this size spill to UPLOAD_FOLDER
+app.config['UPLOAD_SPOOL_MAX_MB'] = float(os.environ.get('UPLOAD_SPOOL_MAX_MB', 4))
+
 # Create upload folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+app.request_class = make_request_class(
+    spool_threshold=int(app.config['UPLOAD_SPOOL_MAX_MB'] * 1024 * 1024),
+    spill_dir=app.config['UPLOAD_FOLDER']
+)
+
+# Content-addressed prediction cache
+app.config['CACHE_ENABLED'] = os.environ.get('CACHE_ENABLED', '1') == '1'
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+app.config['CACHE_MAX_MB'] = float(os.environ.get('CACHE_MAX_MB', 16))
+app.config['CACHE_TTL_SECONDS'] = float(os.environ.get('CACHE_TTL_SECONDS', 3600))
+app.config['CACHE_PERSIST_PATH'] = os.environ.get('CACHE_PERSIST_PATH', '')  # Empty = memory only
+
+prediction_cache = PredictionCache(
+    predictor.model_path,
+    max_entries=app.config['CACHE_MAX_ENTRIES'],
+    max_bytes=int(app.config['CACHE_MAX_MB'] * 1024 * 1024),
+    ttl_seconds=app.config['CACHE_TTL_SECONDS'],
+    persist_path=app.config['CACHE_PERSIST_PATH'],
+    settings={
+        'preprocessing': predictor.preprocessor.get_options(),
+        'backend': predictor.backend_name,
+        'cascade_threshold': predictor.cascade_threshold if predictor.cascade_model_path else None
+    },
+    cascade_model_path=predictor.cascade_model_path
+) if app.config['CACHE_ENABLED'] else None
+
+
+# Asynchronous batch jobs (/api/jobs): images and results are kept in JOBS_DIR
+# until JOBS_TTL_SECONDS after submission, and again after the job finishes
+app.config['JOBS_DIR'] = os.environ.get('JOBS_DIR', 'jobs')
+app.config['JOBS_TTL_SECONDS'] = float(os.environ.get('JOBS_TTL_SECONDS', 24 * 3600))
+app.config['JOBS_MAX_QUEUED'] = int(os.environ.get('JOBS_MAX_QUEUED', 16))
+app.config['JOBS_CHUNK_SIZE'] = int(os.environ.get('JOBS_CHUNK_SIZE', 32))  # Images per progress update
+# Seconds a job chunk waits for room in the pools before the job fails
+app.config['JOBS_MAX_WAIT_SECONDS'] = float(os.environ.get('JOBS_MAX_WAIT_SECONDS', 600))
+
+# Error for /api/jobs/<job_id>/results with a page outside the results
+INVALID_RESULTS_RANGE = 'offset must be an integer >= 0 and limit an integer >= 1'
+
+# Grad-CAM heatmaps from /api/explain are cached under the prediction's key plus this
+EXPLANATION_KEY_SUFFIX = ':gradcam'
+
+# Per-request profiling: ?profile=1 (or an X-Profile header) returns a stage
+# timing breakdown, ?profile=cprofile|sample also writes a dump to PROFILE_DIR.
+# PROFILE_SAMPLE_RATE=N profiles 1 in N prediction requests into PROFILE_DIR.
+app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', '0') == '1'
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+app.config['PROFILE_SAMPLE_RATE'] = int(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_SAMPLE_TOOL'] = os.environ.get('PROFILE_SAMPLE_TOOL', 'sample')  # or 'cprofile'
+PROFILED_ENDPOINTS = {'predict', 'batch_predict'}
+
+profiler = RequestProfiler(
+    enabled=app.config['PROFILING_ENABLED'],
+    dump_dir=app.config['PROFILE_DIR'],
+    sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+    sample_tool=app.config['PROFILE_SAMPLE_TOOL']
+)
+
+
+# Request-level metrics for /metrics; stage timings come from the modules themselves
+HTTP_REQUESTS = registry.counter(
+    'xray_http_requests', 'HTTP requests by endpoint and status', ['endpoint', 'method', 'status']
+)
+HTTP_SECONDS = registry.histogram(
+    'xray_http_request_duration_seconds', 'Time to handle a request', ['endpoint']
+)
+IN_FLIGHT = registry.gauge('xray_http_requests_in_flight', 'Requests being handled')
+CACHE_LOOKUPS = registry.counter(
+    'xray_prediction_cache_lookups', 'Prediction cache lookups by result', ['result']
+)
+SHED_REQUESTS = registry.counter(
+    'xray_shed_requests', 'Prediction requests refused under load, by reason', ['reason']
+)
+registry.gauge(
+    'xray_admitted_requests', 'Prediction requests admitted and not yet answered'
+).set_function(admission.in_flight)
+registry.gauge(
+    'xray_batcher_queue_depth', 'Images waiting for the micro-batcher'
+).set_function(batcher.queue_depth)
+registry.gauge(
+    'xray_preprocess_pending', 'Images queued or running in the preprocessing pool'
+).set_function(lambda: preprocess_pool.get_stats()['pending'])
+registry.gauge(
+    'xray_model_ready', '1 once the model can serve predictions'
+).set_function(lambda: 1 if predictor.ready else 0)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if 'request_start' in g:
+        HTTP_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+
+@app.before_request
+def start_profile():
+    if request.endpoint in PROFILED_ENDPOINTS:
+        flag = request.args.get('profile') or request.headers.get('X-Profile')
+        g.profile, g.profile_in_response = profiler.start(request.path, flag)
+
+
+@app.before_request
+def admit_request():
+    if request.endpoint not in ADMISSION_ENDPOINTS:
+        return None
+    
+    # Refuse before the upload is parsed, so rejecting stays cheap under load
+    if not admission.try_acquire():
+        SHED_REQUESTS.inc(reason='in_flight')
+        return server_busy(f'Too many requests in flight (limit {admission.max_in_flight})', 429)
+    g.admitted = True
+    
+    timeout = parse_timeout(request.headers.get('X-Request-Timeout'),
+                            app.config['REQUEST_TIMEOUT_SECONDS'])
+    if timeout is not None:
+        g.deadline_token = set_deadline(g.request_start + timeout)
+
+
+@app.teardown_request
+def finish_request(error=None):
+    if 'request_start' in g:
+        IN_FLIGHT.dec()
+    if g.pop('admitted', False):
+        admission.release()
+    deadline_token = g.pop('deadline_token', None)
+    if deadline_token is not None:
+        reset_deadline(deadline_token)
+    # Sampled requests (and failed ones) write their dump here
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.finish()
+
+
+def with_profile(payload):
+    """
+    Add this request's timing breakdown to a response payload if it asked for one
+    
+    Args:
+        payload (dict): Response body
+        
+    Returns:
+        dict: Body to serialize
+    """
+    if not g.get('profile_in_response'):
+        return payload
+    
+    return {**payload, 'profile': g.profile.finish()}
+
+
+def server_busy(message, status_code=503):
+    """
+    Overload response telling the client when to retry
+    
+    Args:
+        message (str): Error message
+        status_code (int): 429 when over the in-flight limit, 503 when a queue is full
+        
+    Returns:
+        tuple: JSON response with a Retry-After header, status code
+    """
+    response = jsonify({
+        'success': False,
+        'error': message
+    })
+    response.headers['Retry-After'] = str(app.config['BUSY_RETRY_AFTER'])
+    return response, status_code
+
+
+def deadline_exceeded(error):
+    """
+    Response for a request whose deadline passed before its images reached the model
+    
+    Returns:
+        tuple: JSON response, 504
+    """
+    SHED_REQUESTS.inc(reason='deadline')
+    PREDICTION_ERRORS.inc(reason='deadline')
+    return jsonify({
+        'success': False,
+        'error': f'Deadline exceeded: {str(error)}'
+    }), 504
+
 
 def allowed_file(filename):
     """
@@ -37,6 +308,320 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def cache_key_for(upload):
+    """
+    Build the prediction cache key for an ingested upload
+    
+    Args:
+        upload (IngestedUpload): Upload with its content digest
+        
+    Returns:
+        str: Cache key, or None if caching is disabled
+    """
+    if prediction_cache is None:
+        return None
+    
+    return prediction_cache.make_key(upload.digest)
+
+
+def lookup_cached(upload):
+    """
+    Look up a previous prediction for the same image content
+    
+    Args:
+        upload (IngestedUpload): Upload with its content digest
+        
+    Returns:
+        tuple: (cache key, cached result or None)
+    """
+    cache_key = cache_key_for(upload)
+    if not cache_key:
+        return None, None
+    
+    with STAGE_SECONDS.time(stage='cache_lookup'):
+        cached = prediction_cache.get(cache_key)
+    CACHE_LOOKUPS.inc(result='hit' if cached is not None else 'miss')
+    if cached is not None:
+        cached['cached'] = True
+    return cache_key, cached
+
+
+def explain_uploads(uploads):
+    """
+    Predictions with Grad-CAM heatmaps for ingested uploads
+    
+    Heatmaps are cached next to the predictions. An image whose prediction is
+    already cached keeps that prediction and gets the heatmap of its class;
+    otherwise the prediction comes from the same pass as the heatmap.
+    
+    Args:
+        uploads (list): IngestedUpload per file
+        
+    Returns:
+        list: Result dict per upload, in order, with an 'explanation' on success
+    """
+    results = [None] * len(uploads)
+    pending = []  # (index, cache key, cached prediction)
+    
+    for index, upload in enumerate(uploads):
+        if not upload.ok:
+            PREDICTION_ERRORS.inc(reason='invalid_upload')
+            results[index] = {'success': False, 'error': upload.error}
+            continue
+        
+        cache_key, cached = lookup_cached(upload)
+        explained = prediction_cache.get(cache_key + EXPLANATION_KEY_SUFFIX) if cache_key else None
+        if explained is not None:
+            explained['cached'] = True
+            results[index] = explained
+        else:
+            pending.append((index, cache_key, cached))
+    
+    if not pending:
+        return results
+    
+    check_deadline()
+    batch, valid_positions, errors = predictor.preprocess_many(
+        [uploads[index].rewind() for index, _, _ in pending]
+    )
+    try:
+        if errors:
+            PREDICTION_ERRORS.inc(len(errors), reason='preprocess')
+        for position, error in errors.items():
+            print(f"❌ Error preprocessing image: {error}")
+            results[pending[position][0]] = {
+                'success': False,
+                'error': 'Failed to preprocess image'
+            }
+        
+        targets = [
+            predictor.class_index(pending[position][2]['predicted_class'])
+            if pending[position][2] is not None else None
+            for position in valid_positions
+        ]
+        explanations = predictor.explain_arrays(batch, targets) if valid_positions else []
+    finally:
+        predictor.release_batch(batch)
+    
+    # Only the Keras model alone gives the same answers as /api/predict
+    same_model = predictor.backend_name == 'keras' and predictor.cascade_backend is None
+    for position, (prediction, explanation) in zip(valid_positions, explanations):
+        index, cache_key, cached = pending[position]
+        if cached is not None:
+            prediction = cached
+        elif cache_key and same_model:
+            prediction_cache.put(cache_key, prediction)
+        
+        result = {**prediction, 'explanation': explanation}
+        if cache_key:
+            prediction_cache.put(cache_key + EXPLANATION_KEY_SUFFIX, result)
+        results[index] = result
+    
+    return results
+
+
+def predict_bulk(image_files):
+    """
+    Predict the images of a bulk request on the micro-batcher's bulk lane
+    
+    Images are queued as room frees up in the lane, so a large upload
+    shares the model with interactive requests instead of running ahead of
+    them in chunks of its own.
+    
+    Args:
+        image_files: List of file objects or file paths
+        
+    Returns:
+        list: Prediction results in input order, as predictor.predict_batch
+    """
+    results = [None] * len(image_files)
+    
+    batch, valid_indices, errors = predictor.preprocess_many(image_files)
+    try:
+        if errors:
+            PREDICTION_ERRORS.inc(len(errors), reason='preprocess')
+        for index, error in errors.items():
+            print(f"❌ Error preprocessing image: {error}")
+            results[index] = {
+                'success': False,
+                'error': 'Failed to preprocess image'
+            }
+        
+        pending = [
+            (index, batcher.submit_async(batch[row], lane='bulk',
+                                         timeout=app.config['BATCH_RESULT_TIMEOUT']))
+            for row, index in enumerate(valid_indices)
+        ]
+        for index, future in pending:
+            try:
+                results[index] = future.result(timeout=app.config['BATCH_RESULT_TIMEOUT'])
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                PREDICTION_ERRORS.inc(reason='inference')
+                results[index] = {
+                    'success': False,
+                    'error': f'Prediction failed: {str(e)}'
+                }
+    finally:
+        predictor.release_batch(batch)
+    
+    return results
+
+
+def predict_job_images(images):
+    """
+    Predict one chunk of an asynchronous job on the bulk lane
+    
+    Runs on the job runner thread. Repeats are answered from the prediction
+    cache, and a full queue is retried for up to JOBS_MAX_WAIT_SECONDS before
+    the job fails.
+    
+    Args:
+        images (list): (image path, content digest) per image
+        
+    Returns:
+        list: Prediction result per image, in order
+    """
+    if not predictor.ensure_loaded():
+        raise RuntimeError(f'Model not available: {predictor.load_error or predictor.state}')
+    
+    results = [None] * len(images)
+    cache_keys = [None] * len(images)
+    if prediction_cache is not None:
+        for index, (_, digest) in enumerate(images):
+            cache_keys[index] = prediction_cache.make_key(digest)
+            results[index] = prediction_cache.get(cache_keys[index])
+            CACHE_LOOKUPS.inc(result='hit' if results[index] is not None else 'miss')
+            if results[index] is not None:
+                results[index]['cached'] = True
+    
+    missing = [index for index, result in enumerate(results) if result is None]
+    give_up = time.monotonic() + app.config['JOBS_MAX_WAIT_SECONDS']
+    while True:
+        try:
+            predictions = predict_bulk([images[index][0] for index in missing])
+            break
+        except (QueueFullError, PoolFullError) as e:
+            if time.monotonic() + app.config['BUSY_RETRY_AFTER'] > give_up:
+                raise RuntimeError(
+                    f"Server busy for over {app.config['JOBS_MAX_WAIT_SECONDS']:.0f} s: {e}"
+                )
+            print(f"⏳ Job waiting for capacity: {e}")
+            time.sleep(app.config['BUSY_RETRY_AFTER'])
+    
+    for index, prediction in zip(missing, predictions):
+        if cache_keys[index]:
+            prediction_cache.put(cache_keys[index], prediction)
+        results[index] = prediction
+    return results
+
+
+job_store = JobStore(app.config['JOBS_DIR'], ttl_seconds=app.config['JOBS_TTL_SECONDS'])
+job_runner = JobRunner(
+    job_store,
+    predict_job_images,
+    # A chunk larger than the pools could never be admitted as a whole
+    chunk_size=min(app.config['JOBS_CHUNK_SIZE'], app.config['PREPROCESS_MAX_PENDING'],
+                   app.config['BATCH_QUEUE_SIZE']),
+    max_queued=app.config['JOBS_MAX_QUEUED']
+)
+registry.gauge(
+    'xray_jobs_queued', 'Asynchronous jobs waiting to run in this process'
+).set_function(job_runner.queued)
+
+
+def results_range(args):
+    """
+    Offset and limit query parameters of /api/jobs/<job_id>/results
+    
+    Args:
+        args (Mapping): Query parameters
+        
+    Returns:
+        tuple: (offset, limit or None for all results), or None unless offset
+        is an integer >= 0 and limit an integer >= 1
+    """
+    try:
+        offset = int(args.get('offset', 0))
+        limit = args.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return None
+    if offset < 0 or (limit is not None and limit < 1):
+        return None
+    return offset, limit
+
+
+def job_results(job, offset, limit):
+    """
+    Response body with the results a job has finished so far
+    
+    Args:
+        job (dict): Job state
+        offset (int): Index of the first result
+        limit (int): Most results, None for all
+        
+    Returns:
+        dict: Job progress and its results from offset on
+    """
+    results = job_store.read_results(job, offset=offset, limit=limit)
+    return {
+        **job_status(job),
+        'complete': job['state'] == 'done',
+        'offset': offset,
+        'count': len(results),
+        'predictions': results
+    }
+
+
+def add_heatmap_images(results):
+    """
+    Render each explanation's heatmap as a PNG data URL (not kept in the cache)
+    """
+    for result in results:
+        explanation = result.get('explanation')
+        if explanation is not None:
+            result['explanation'] = {
+                **explanation,
+                'heatmap_png': render_heatmap(explanation['heatmap'], predictor.img_size)
+            }
+    return results
+
+
+def model_unavailable():
+    """
+    Check that the model can serve predictions
+    
+    In lazy mode the first caller loads the model.
+    
+    Returns:
+        tuple: 503 response if the model is not ready, otherwise None
+    """
+    if app.config['MODEL_LOAD_MODE'] == 'lazy':
+        predictor.ensure_loaded()
+    if predictor.ready:
+        return None
+    
+    status = predictor.get_status()
+    if status['state'] in ('not_loaded', 'loading'):
+        response = jsonify({
+            'success': False,
+            'error': 'Model is still loading. Please retry shortly.',
+            'model_state': status['state']
+        })
+        response.headers['Retry-After'] = str(app.config['MODEL_RETRY_AFTER'])
+        return response, 503
+    
+    return jsonify({
+        'success': False,
+        'error': 'Model not loaded. Please train the model first using the Colab notebook.',
+        'instructions': 'Upload chest_xray_model.h5 to the models/ folder',
+        'model_state': status['state'],
+        'load_error': status['error']
+    }), 503
+
+
 @app.route('/')
 def index():
     """
@@ -80,17 +665,26 @@ def debug_info():
     """
     import numpy as np
     
+    unavailable = model_unavailable()
+    if unavailable:
+        return unavailable
+    
     # Create test prediction with random data
     test_input = np.random.rand(1, 224, 224, 3).astype('float32')
-    test_pred = predictor.model.predict(test_input, verbose=0)
+    test_pred = predictor.run_model(test_input)
+    
+    # Verify the traced inference path still matches model.predict
+    parity = predictor.engine.check_parity() if predictor.engine is not None else None
     
     return jsonify({
-        'model_loaded': predictor.model is not None,
+        'model_loaded': predictor.ready,
+        'backend': predictor.backend_name,
         'class_labels': predictor.class_labels,
         'test_prediction_shape': test_pred.shape,
         'test_prediction_sum': float(np.sum(test_pred[0])),
         'test_max_index': int(np.argmax(test_pred[0])),
-        'test_max_value': float(np.max(test_pred[0]))
+        'test_max_value': float(np.max(test_pred[0])),
+        'inference_parity': parity
     })
 
 
@@ -108,10 +702,31 @@ def health_check():
         'status': 'healthy',
         'service': 'Chest X-Ray Prediction API',
         'model_loaded': model_info['loaded'],
+        'model_state': predictor.state,
         'version': '1.0.0'
     })
 
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: 200 once the model can serve predictions, 503 before
+    
+    Unlike /api/health this never triggers a lazy load.
+    
+    Returns:
+        JSON: Model loading state
+    """
+    status = predictor.get_status()
+    if status['ready']:
+        return jsonify(status)
+    
+    response = jsonify(status)
+    if status['state'] in ('not_loaded', 'loading'):
+        response.headers['Retry-After'] = str(app.config['MODEL_RETRY_AFTER'])
+    return response, 503
+
+
 @app.route('/api/model-info', methods=['GET'])
 def model_info():
     """
@@ -124,6 +739,45 @@ def model_info():
     return jsonify(info)
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, request/error/cache
+    counters, batch sizes and queue gauges
+    
+    Returns:
+        Text in the Prometheus exposition format
+    """
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/api/batcher-stats', methods=['GET'])
+def batcher_stats():
+    """
+    Get micro-batching and admission statistics
+    
+    Returns:
+        JSON: Batch sizes, queue wait times and in-flight requests
+    """
+    return jsonify({**batcher.get_stats(), 'admission': admission.get_stats()})
+
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    Get prediction cache statistics
+    
+    Returns:
+        JSON: Hit/miss/eviction counters and cache size
+    """
+    if prediction_cache is None:
+        return jsonify({'enabled': False})
+    
+    stats = prediction_cache.get_stats()
+    stats['enabled'] = True
+    return jsonify(stats)
+
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """
@@ -137,21 +791,20 @@ def predict():
     """
     try:
         # Check if model is loaded
-        if not predictor.model:
-            return jsonify({
-                'success': False,
-                'error': 'Model not loaded. Please train the model first using the Colab notebook.',
-                'instructions': 'Upload chest_xray_model.h5 to the models/ folder'
-            }), 503
+        unavailable = model_unavailable()
+        if unavailable:
+            return unavailable
         
-        # Check if files were uploaded
-        if 'file' not in request.files:
+        # Check if files were uploaded (reading request.files parses the upload)
+        with STAGE_SECONDS.time(stage='upload'):
+            uploaded = request.files
+        if 'file' not in uploaded:
             return jsonify({
                 'success': False,
                 'error': 'No file uploaded'
             }), 400
         
-        files = request.files.getlist('file')
+        files = uploaded.getlist('file')
         
         if len(files) == 0:
             return jsonify({
@@ -159,50 +812,87 @@ def predict():
                 'error': 'No files selected'
             }), 400
         
-        results = []
+        with STAGE_SECONDS.time(stage='hash'):
+            uploads = ingest_files(files, allowed_file)
+        results = [None] * len(uploads)
+        cache_keys = [None] * len(uploads)
         
-        for file in files:
-            # Check if file is empty
-            if file.filename == '':
-                continue
-            
-            # Check if file type is allowed
-            if not allowed_file(file.filename):
-                results.append({
-                    'filename': file.filename,
-                    'success': False,
-                    'error': 'Invalid file type. Only PNG, JPG, and JPEG are allowed.'
-                })
-                continue
+        try:
+            for index, upload in enumerate(uploads):
+                if not upload.ok:
+                    PREDICTION_ERRORS.inc(reason='invalid_upload')
+                    results[index] = {'success': False, 'error': upload.error}
+                else:
+                    # Re-uploads of the same image are answered from the cache
+                    cache_keys[index], results[index] = lookup_cached(upload)
             
-            # Save file temporarily
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            # Decode and preprocess the uncached images in parallel, straight
+            # from their upload buffers
+            missing = [index for index, result in enumerate(results) if result is None]
+            if missing:
+                check_deadline()
+            batch, valid_positions, errors = predictor.preprocess_many(
+                [uploads[index].rewind() for index in missing]
+            )
             
-            # Make prediction
-            prediction_result = predictor.predict(filepath)
-            prediction_result['filename'] = filename
-            
-            results.append(prediction_result)
+            if errors:
+                PREDICTION_ERRORS.inc(len(errors), reason='preprocess')
+            for position, error in errors.items():
+                print(f"❌ Error preprocessing image: {error}")
+                results[missing[position]] = {
+                    'success': False,
+                    'error': 'Failed to preprocess image'
+                }
             
-            # Clean up uploaded file
+            # Share the forward pass with concurrent requests
             try:
-                os.remove(filepath)
-            except:
-                pass
+                pending = {
+                    missing[position]: batcher.submit_async(batch[row])
+                    for row, position in enumerate(valid_positions)
+                }
+                for index, future in pending.items():
+                    try:
+                        results[index] = future.result(timeout=app.config['BATCH_RESULT_TIMEOUT'])
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as e:
+                        print(f"❌ Error during prediction: {str(e)}")
+                        PREDICTION_ERRORS.inc(reason='inference')
+                        results[index] = {
+                            'success': False,
+                            'error': 'Prediction failed'
+                        }
+                        continue
+                    if cache_keys[index]:
+                        prediction_cache.put(cache_keys[index], results[index])
+            finally:
+                predictor.release_batch(batch)
+        except (QueueFullError, PoolFullError) as e:
+            PREDICTION_ERRORS.inc(reason='busy')
+            SHED_REQUESTS.inc(reason='busy')
+            return server_busy(f'Server busy: {str(e)}')
+        except DeadlineExceeded as e:
+            return deadline_exceeded(e)
+        finally:
+            for upload in uploads:
+                upload.close()
+        
+        for upload, result in zip(uploads, results):
+            result['filename'] = upload.filename
         
         # Return results
-        if len(results) == 1:
-            return jsonify(results[0])
-        else:
-            return jsonify({
-                'success': True,
-                'count': len(results),
-                'predictions': results
-            })
+        with STAGE_SECONDS.time(stage='serialize'):
+            if len(results) == 1:
+                return jsonify(with_profile(results[0]))
+            else:
+                return jsonify(with_profile({
+                    'success': True,
+                    'count': len(results),
+                    'predictions': results
+                }))
     
     except Exception as e:
+        PREDICTION_ERRORS.inc(reason='server')
         return jsonify({
             'success': False,
             'error': f'Server error: {str(e)}'
@@ -222,14 +912,13 @@ def batch_predict():
     """
     try:
         # Check if model is loaded
-        if not predictor.model:
-            return jsonify({
-                'success': False,
-                'error': 'Model not loaded. Please train the model first.'
-            }), 503
+        unavailable = model_unavailable()
+        if unavailable:
+            return unavailable
         
         # Get all uploaded files
-        files = request.files.getlist('files')
+        with STAGE_SECONDS.time(stage='upload'):
+            files = request.files.getlist('files')
         
         if len(files) == 0:
             return jsonify({
@@ -237,28 +926,244 @@ def batch_predict():
                 'error': 'No files uploaded'
             }), 400
         
-        results = []
+        with STAGE_SECONDS.time(stage='hash'):
+            uploads = ingest_files(files, allowed_file)
+        results = [None] * len(uploads)
+        cache_keys = [None] * len(uploads)
         
-        for file in files:
-            if file and allowed_file(file.filename):
-                # Make prediction
-                prediction = predictor.predict(file)
-                prediction['filename'] = secure_filename(file.filename)
-                results.append(prediction)
+        try:
+            for index, upload in enumerate(uploads):
+                if not upload.ok:
+                    PREDICTION_ERRORS.inc(reason='invalid_upload')
+                    results[index] = {'success': False, 'error': upload.error}
+                else:
+                    cache_keys[index], results[index] = lookup_cached(upload)
+            
+            # Preprocess the uncached images, then queue them on the bulk lane
+            missing = [index for index, result in enumerate(results) if result is None]
+            if missing:
+                check_deadline()
+            predictions = predict_bulk([uploads[index].rewind() for index in missing])
+            
+            for index, prediction in zip(missing, predictions):
+                if cache_keys[index]:
+                    prediction_cache.put(cache_keys[index], prediction)
+                results[index] = prediction
+        except (QueueFullError, PoolFullError) as e:
+            PREDICTION_ERRORS.inc(reason='busy')
+            SHED_REQUESTS.inc(reason='busy')
+            return server_busy(f'Server busy: {str(e)}')
+        except DeadlineExceeded as e:
+            return deadline_exceeded(e)
+        finally:
+            for upload in uploads:
+                upload.close()
+        
+        for upload, prediction in zip(uploads, results):
+            prediction['filename'] = upload.filename
         
+        with STAGE_SECONDS.time(stage='serialize'):
+            return jsonify(with_profile({
+                'success': True,
+                'count': len(results),
+                'predictions': results
+            }))
+    
+    except Exception as e:
+        PREDICTION_ERRORS.inc(reason='server')
         return jsonify({
-            'success': True,
-            'count': len(results),
-            'predictions': results
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/explain', methods=['POST'])
+def explain():
+    """
+    Predict and explain X-ray image(s) with a Grad-CAM heatmap of the
+    predicted class
+    
+    Expects:
+        file: Image file(s) in form data
+        
+    Returns:
+        JSON: Prediction results, each with an 'explanation'
+    """
+    try:
+        unavailable = model_unavailable()
+        if unavailable:
+            return unavailable
+        
+        with STAGE_SECONDS.time(stage='upload'):
+            files = request.files.getlist('file')
+        
+        if len(files) == 0:
+            return jsonify({
+                'success': False,
+                'error': 'No file uploaded'
+            }), 400
+        
+        with STAGE_SECONDS.time(stage='hash'):
+            uploads = ingest_files(files, allowed_file)
+        
+        try:
+            results = explain_uploads(uploads)
+        except ExplanationUnavailable as e:
+            return jsonify({
+                'success': False,
+                'error': f'Explanations unavailable: {str(e)}'
+            }), 501
+        except PoolFullError as e:
+            PREDICTION_ERRORS.inc(reason='busy')
+            SHED_REQUESTS.inc(reason='busy')
+            return server_busy(f'Server busy: {str(e)}')
+        except DeadlineExceeded as e:
+            return deadline_exceeded(e)
+        finally:
+            for upload in uploads:
+                upload.close()
+        
+        for upload, result in zip(uploads, add_heatmap_images(results)):
+            result['filename'] = upload.filename
+        
+        with STAGE_SECONDS.time(stage='serialize'):
+            if len(results) == 1:
+                return jsonify(results[0])
+            return jsonify({
+                'success': True,
+                'count': len(results),
+                'predictions': results
+            })
+    
+    except Exception as e:
+        PREDICTION_ERRORS.inc(reason='server')
+        return jsonify({
+            'success': False,
+            'error': f'Server error: {str(e)}'
+        }), 500
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Submit X-ray images for background prediction
+    
+    Expects:
+        files: Multiple image files in form data
+        
+    Returns:
+        JSON: Job id and URLs to poll, with status 202
+    """
+    try:
+        # Jobs may be queued while the model is still loading
+        if predictor.state in ('failed', 'missing'):
+            return model_unavailable()
+        
+        files = request.files.getlist('files')
+        if len(files) == 0:
+            return jsonify({
+                'success': False,
+                'error': 'No files uploaded'
+            }), 400
+        
+        uploads = ingest_files(files, allowed_file)
+        try:
+            job = job_runner.submit(uploads)
+        except JobQueueFullError as e:
+            SHED_REQUESTS.inc(reason='busy')
+            return server_busy(f'Server busy: {str(e)}')
+        finally:
+            for upload in uploads:
+                upload.close()
+        
+        status_url = f"/api/jobs/{job['id']}"
+        response = jsonify({
+            **job_status(job),
+            'status_url': status_url,
+            'results_url': status_url + '/results'
         })
+        response.headers['Location'] = status_url
+        return response, 202
     
     except Exception as e:
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': f'Server error: {str(e)}'
         }), 500
 
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get the state and progress of a job
+    
+    Returns:
+        JSON: Job state, images completed and failed so far, expiry
+    """
+    try:
+        return jsonify(job_status(job_store.load(job_id)))
+    except JobNotFound:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found or expired'
+        }), 404
+
+
+@app.route('/api/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """
+    Get the results a job has finished so far
+    
+    Query parameters:
+        offset: Index of the first result (default 0)
+        limit: Most results to return (default all)
+        
+    Returns:
+        JSON: Job progress and results, in input order
+    """
+    page = results_range(request.args)
+    if page is None:
+        return jsonify({
+            'success': False,
+            'error': INVALID_RESULTS_RANGE
+        }), 400
+    
+    try:
+        job = job_store.load(job_id)
+    except JobNotFound:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found or expired'
+        }), 404
+    
+    offset, limit = page
+    return jsonify(job_results(job, offset=offset, limit=limit))
+
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """
+    Cancel a job and delete its images and results
+    
+    Returns:
+        JSON: Confirmation
+    """
+    try:
+        job_store.load(job_id)
+    except JobNotFound:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found or expired'
+        }), 404
+    
+    job_store.delete(job_id)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'deleted': True
+    })
+
+
 @app.errorhandler(413)
 def request_entity_too_large(error):
     """
@@ -302,8 +1207,13 @@ if __name__ == '__main__':
     if model_info['loaded']:
         print("  ✅ Model loaded successfully!")
         print(f"  📁 Model path: {model_info['model_path']}")
-        print(f"  🧠 Total parameters: {model_info['total_parameters']:,}")
+        print(f"  ⚙️  Backend: {model_info['backend']['name']} "
+              f"({model_info['backend']['latency']['baseline_single_image_ms']:.1f} ms/image)")
+        if model_info['total_parameters'] is not None:
+            print(f"  🧠 Total parameters: {model_info['total_parameters']:,}")
         print(f"  📋 Classes: {list(model_info['classes'].values())}")
+    elif predictor.state in ('not_loaded', 'loading'):
+        print(f"  ⏳ Model not ready yet ({app.config['MODEL_LOAD_MODE']} loading) - poll /api/ready")
     else:
         print("  ⚠️  Model not loaded!")
         print("  📝 Instructions:")
@@ -319,8 +1229,15 @@ if __name__ == '__main__':
     
     print("\n📡 API Endpoints:")
     print("  • GET  /api/health       - Health check")
+    print("  • GET  /api/ready        - Readiness (model loaded)")
     print("  • GET  /api/model-info   - Model information")
+    print("  • GET  /api/batcher-stats - Micro-batching statistics")
+    print("  • GET  /api/cache-stats  - Prediction cache statistics")
+    print("  • GET  /metrics          - Prometheus metrics")
     print("  • POST /api/predict      - Single/multiple image prediction")
+    print("  • POST /api/explain      - Prediction with Grad-CAM heatmap")
+    print("  • POST /api/jobs         - Submit a background batch job")
+    print("  • GET  /api/jobs/<id>    - Job progress (/results for results)")
     
     print("\n🚀 Starting server...")
     print("="*60 + "\n")
@@ -0,0 +1,784 @@
+"""
+ASGI Backend API for Chest X-Ray Disease Prediction
+Asyncio serving mode exposing the same /api/* endpoints as app.py
+
+Uploads are received on the event loop, so slow clients cost a coroutine
+instead of a thread. Hashing, decoding and preprocessing run on a dedicated
+thread pool, and inference goes through the shared MicroBatcher: /api/predict
+awaits its interactive lane without blocking a thread, /api/batch-predict
+queues on its bulk lane. Predictor, batcher, preprocessing pool and
+prediction cache are the ones configured in app.py.
+
+Usage: uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, QueryParams, UploadFile
+from starlette.formparsers import MultiPartParser
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, JSONResponse, Response
+from starlette.routing import Route
+
+from app import (
+    app as flask_app, predictor, batcher, prediction_cache, allowed_file, lookup_cached,
+    explain_uploads, add_heatmap_images, predict_bulk, admission, profiler, SHED_REQUESTS,
+    HTTP_REQUESTS, HTTP_SECONDS, IN_FLIGHT, job_store, job_runner, job_results, results_range,
+    INVALID_RESULTS_RANGE
+)
+from jobs import JobNotFound, JobQueueFullError, job_status
+from admission import DeadlineExceeded, check_deadline, parse_timeout, set_deadline, reset_deadline
+from explain import ExplanationUnavailable
+from batching import QueueFullError
+from parallel import PoolFullError
+from ingest import ingest_files
+from metrics import registry, CONTENT_TYPE, PREDICTION_ERRORS
+
+# Same settings as the Flask app, plus the executor sizes of this mode
+config = flask_app.config
+config['ASGI_PREPROCESS_THREADS'] = int(os.environ.get('ASGI_PREPROCESS_THREADS', 8))
+# Threads that block on the bulk lane, Grad-CAM or loading; as many as a
+# gunicorn worker has request threads, so one /api/batch-predict upload does
+# not hold up /api/explain. The forward passes themselves run on the batcher.
+config['ASGI_INFERENCE_THREADS'] = int(os.environ.get('ASGI_INFERENCE_THREADS', 4))
+
+# Keep parts up to UPLOAD_SPOOL_MAX_MB in memory, as the Flask request class does
+MultiPartParser.spool_max_size = int(config['UPLOAD_SPOOL_MAX_MB'] * 1024 * 1024)
+
+# Blocking request work: hashing, decode and preprocessing (which itself fans
+# out over the shared PreprocessPool) ...
+preprocess_executor = ThreadPoolExecutor(
+    max_workers=config['ASGI_PREPROCESS_THREADS'], thread_name_prefix='asgi-preprocess'
+)
+# ... and /api/batch-predict uploads waiting on the bulk lane, Grad-CAM passes and lazy loading
+inference_executor = ThreadPoolExecutor(
+    max_workers=config['ASGI_INFERENCE_THREADS'], thread_name_prefix='asgi-inference'
+)
+
+FRONTEND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend')
+
+
+async def run_blocking(executor, fn, *args):
+    """
+    Run a blocking call on one of the executors without blocking the event loop
+    """
+    # In the caller's context, so the request deadline reaches the predictor
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+def error_response(message, status_code, headers=None, **extra):
+    """
+    JSON error in the same shape as the Flask app's
+    """
+    return JSONResponse(
+        {'success': False, 'error': message, **extra},
+        status_code=status_code,
+        headers=headers
+    )
+
+
+def server_busy(message, status_code=503):
+    """
+    Overload response telling the client when to retry
+    """
+    return error_response(message, status_code,
+                          headers={'Retry-After': str(config['BUSY_RETRY_AFTER'])})
+
+
+def deadline_exceeded(error):
+    SHED_REQUESTS.inc(reason='deadline')
+    PREDICTION_ERRORS.inc(reason='deadline')
+    return error_response(f'Deadline exceeded: {str(error)}', 504)
+
+
+class RequestTooLarge(Exception):
+    """
+    Raised while receiving a body that goes over MAX_CONTENT_LENGTH
+    """
+
+
+def too_large_response():
+    return error_response('File too large. Maximum size is 16MB.', 413)
+
+
+class RequestMetricsMiddleware:
+    """
+    Request counts, durations and in-flight requests for /metrics, as the
+    Flask app's request hooks record them
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            route = scope.get('route')
+            # Same labels as Flask's url rules: /api/jobs/<job_id>
+            endpoint = (route.path.replace('{', '<').replace('}', '>')
+                        if route is not None else 'unmatched')
+            HTTP_REQUESTS.inc(endpoint=endpoint, method=scope['method'], status=status)
+            HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+
+class BodySizeLimitMiddleware:
+    """
+    Reject bodies above MAX_CONTENT_LENGTH
+
+    A declared Content-Length is checked before anything is read; the bytes
+    actually received are counted too, so a chunked upload without a length
+    is cut off as soon as it goes over the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = config['MAX_CONTENT_LENGTH']
+        length = Headers(scope=scope).get('content-length')
+        if length and length.isdigit() and int(length) > max_bytes:
+            await too_large_response()(scope, receive, send)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_bytes:
+                    too_large = True
+                    raise RequestTooLarge(f'Body over {max_bytes} bytes')
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # The endpoint's response to the aborted upload is replaced by the 413
+            if too_large:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except RequestTooLarge:
+            pass
+        if too_large and not response_started:
+            await too_large_response()(scope, receive, send)
+
+
+class ProfileMiddleware:
+    """
+    Per-request profiling of the prediction endpoints, as start_profile and
+    finish_request do for the Flask app
+    """
+
+    paths = {'/api/predict', '/api/batch-predict'}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        flag = (QueryParams(scope['query_string']).get('profile')
+                or Headers(scope=scope).get('x-profile'))
+        profile, in_response = profiler.start(scope['path'], flag)
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        # request.state.profile in the endpoint
+        scope.setdefault('state', {})['profile'] = profile if in_response else None
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Sampled requests (and failed ones) write their dump here
+            profile.finish()
+
+
+def with_profile(request, payload):
+    """
+    Add this request's timing breakdown to a response payload if it asked for one
+    """
+    profile = getattr(request.state, 'profile', None)
+    if profile is None:
+        return payload
+    return {**payload, 'profile': profile.finish()}
+
+
+class AdmissionMiddleware:
+    """
+    In-flight limit and request deadlines for the prediction endpoints, as
+    admit_request does for the Flask app
+    """
+
+    paths = {'/api/predict', '/api/batch-predict', '/api/explain'}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not admission.try_acquire():
+            SHED_REQUESTS.inc(reason='in_flight')
+            response = server_busy(
+                f'Too many requests in flight (limit {admission.max_in_flight})', 429
+            )
+            await response(scope, receive, send)
+            return
+
+        timeout = parse_timeout(Headers(scope=scope).get('x-request-timeout'),
+                                config['REQUEST_TIMEOUT_SECONDS'])
+        token = set_deadline(time.perf_counter() + timeout) if timeout is not None else None
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if token is not None:
+                reset_deadline(token)
+            admission.release()
+
+
+async def model_unavailable():
+    """
+    Check that the model can serve predictions
+
+    Returns:
+        JSONResponse: 503 response if the model is not ready, otherwise None
+    """
+    if config['MODEL_LOAD_MODE'] == 'lazy':
+        await run_blocking(inference_executor, predictor.ensure_loaded)
+    if predictor.ready:
+        return None
+
+    status = predictor.get_status()
+    if status['state'] in ('not_loaded', 'loading'):
+        return error_response(
+            'Model is still loading. Please retry shortly.', 503,
+            headers={'Retry-After': str(config['MODEL_RETRY_AFTER'])},
+            model_state=status['state']
+        )
+
+    return error_response(
+        'Model not loaded. Please train the model first using the Colab notebook.', 503,
+        instructions='Upload chest_xray_model.h5 to the models/ folder',
+        model_state=status['state'],
+        load_error=status['error']
+    )
+
+
+def as_file_storage(upload):
+    """
+    Adapt a Starlette UploadFile to the attributes ingest_upload uses
+    """
+    return SimpleNamespace(filename=upload.filename or '', stream=upload.file)
+
+
+async def read_uploads(form, field):
+    """
+    Validate and hash the files of one form field off the event loop
+
+    Args:
+        form (FormData): Parsed multipart form
+        field (str): Form field name
+
+    Returns:
+        list: IngestedUpload per non-empty file part, in request order
+    """
+    files = [
+        as_file_storage(item) for item in form.getlist(field)
+        if isinstance(item, UploadFile)
+    ]
+    return await run_blocking(preprocess_executor, ingest_files, files, allowed_file)
+
+
+async def index(request):
+    return FileResponse(os.path.join(FRONTEND_PATH, 'index.html'))
+
+
+async def serve_css(request):
+    return FileResponse(os.path.join(FRONTEND_PATH, 'style.css'))
+
+
+async def serve_js(request):
+    return FileResponse(os.path.join(FRONTEND_PATH, 'script.js'))
+
+
+async def favicon(request):
+    return Response(status_code=204)
+
+
+async def debug_info(request):
+    """
+    Debug endpoint to check model info
+    """
+    import numpy as np
+
+    unavailable = await model_unavailable()
+    if unavailable:
+        return unavailable
+
+    def run_checks():
+        test_input = np.random.rand(1, 224, 224, 3).astype('float32')
+        test_pred = predictor.run_model(test_input)
+        parity = predictor.engine.check_parity() if predictor.engine is not None else None
+        return test_pred, parity
+
+    test_pred, parity = await run_blocking(inference_executor, run_checks)
+    return JSONResponse({
+        'model_loaded': predictor.ready,
+        'backend': predictor.backend_name,
+        'class_labels': predictor.class_labels,
+        'test_prediction_shape': list(test_pred.shape),
+        'test_prediction_sum': float(np.sum(test_pred[0])),
+        'test_max_index': int(np.argmax(test_pred[0])),
+        'test_max_value': float(np.max(test_pred[0])),
+        'inference_parity': parity
+    })
+
+
+async def health_check(request):
+    """
+    Health check endpoint
+    """
+    model_info = predictor.get_model_info()
+
+    return JSONResponse({
+        'status': 'healthy',
+        'service': 'Chest X-Ray Prediction API',
+        'model_loaded': model_info['loaded'],
+        'model_state': predictor.state,
+        'version': '1.0.0'
+    })
+
+
+async def readiness_check(request):
+    """
+    Readiness probe: 200 once the model can serve predictions, 503 before
+    """
+    status = predictor.get_status()
+    if status['ready']:
+        return JSONResponse(status)
+
+    headers = {}
+    if status['state'] in ('not_loaded', 'loading'):
+        headers['Retry-After'] = str(config['MODEL_RETRY_AFTER'])
+    return JSONResponse(status, status_code=503, headers=headers)
+
+
+async def model_info(request):
+    """
+    Get detailed model information
+    """
+    return JSONResponse(predictor.get_model_info())
+
+
+async def batcher_stats(request):
+    """
+    Get micro-batching and admission statistics
+    """
+    return JSONResponse({**batcher.get_stats(), 'admission': admission.get_stats()})
+
+
+async def cache_stats(request):
+    """
+    Get prediction cache statistics
+    """
+    if prediction_cache is None:
+        return JSONResponse({'enabled': False})
+
+    stats = prediction_cache.get_stats()
+    stats['enabled'] = True
+    return JSONResponse(stats)
+
+
+async def metrics(request):
+    """
+    Prometheus metrics (same registry as the Flask app)
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+async def predict(request):
+    """
+    Predict disease from uploaded X-ray image(s)
+
+    Expects:
+        file: Image file(s) in form data
+    """
+    try:
+        unavailable = await model_unavailable()
+        if unavailable:
+            return unavailable
+
+        async with request.form() as form:
+            if 'file' not in form:
+                return error_response('No file uploaded', 400)
+
+            uploads = await read_uploads(form, 'file')
+            if len(uploads) == 0:
+                return error_response('No files selected', 400)
+
+            results = [None] * len(uploads)
+            cache_keys = [None] * len(uploads)
+
+            try:
+                for index, upload in enumerate(uploads):
+                    if not upload.ok:
+                        PREDICTION_ERRORS.inc(reason='invalid_upload')
+                        results[index] = {'success': False, 'error': upload.error}
+                    else:
+                        cache_keys[index], results[index] = lookup_cached(upload)
+
+                missing = [index for index, result in enumerate(results) if result is None]
+                if missing:
+                    check_deadline()
+                batch, valid_positions, errors = await run_blocking(
+                    preprocess_executor,
+                    predictor.preprocess_many,
+                    [uploads[index].rewind() for index in missing]
+                )
+
+                if errors:
+                    PREDICTION_ERRORS.inc(len(errors), reason='preprocess')
+                for position, error in errors.items():
+                    print(f"❌ Error preprocessing image: {error}")
+                    results[missing[position]] = {
+                        'success': False,
+                        'error': 'Failed to preprocess image'
+                    }
+
+                # Share the forward pass with concurrent requests; awaiting the
+                # batcher's futures does not hold a thread
+                try:
+                    pending = {
+                        missing[position]: asyncio.wrap_future(batcher.submit_async(batch[row]))
+                        for row, position in enumerate(valid_positions)
+                    }
+                    for index, future in pending.items():
+                        try:
+                            results[index] = await asyncio.wait_for(
+                                future, timeout=config['BATCH_RESULT_TIMEOUT']
+                            )
+                        except DeadlineExceeded:
+                            raise
+                        except Exception as e:
+                            print(f"❌ Error during prediction: {str(e)}")
+                            PREDICTION_ERRORS.inc(reason='inference')
+                            results[index] = {
+                                'success': False,
+                                'error': 'Prediction failed'
+                            }
+                            continue
+                        if cache_keys[index]:
+                            prediction_cache.put(cache_keys[index], results[index])
+                finally:
+                    predictor.release_batch(batch)
+            except (QueueFullError, PoolFullError) as e:
+                PREDICTION_ERRORS.inc(reason='busy')
+                SHED_REQUESTS.inc(reason='busy')
+                return server_busy(f'Server busy: {str(e)}')
+            except DeadlineExceeded as e:
+                return deadline_exceeded(e)
+            finally:
+                for upload in uploads:
+                    upload.close()
+
+        for upload, result in zip(uploads, results):
+            result['filename'] = upload.filename
+
+        if len(results) == 1:
+            return JSONResponse(with_profile(request, results[0]))
+        return JSONResponse(with_profile(request, {
+            'success': True,
+            'count': len(results),
+            'predictions': results
+        }))
+
+    except Exception as e:
+        PREDICTION_ERRORS.inc(reason='server')
+        return error_response(f'Server error: {str(e)}', 500)
+
+
+async def batch_predict(request):
+    """
+    Predict diseases from multiple X-ray images
+
+    Expects:
+        files: Multiple image files in form data
+    """
+    try:
+        unavailable = await model_unavailable()
+        if unavailable:
+            return unavailable
+
+        async with request.form() as form:
+            uploads = await read_uploads(form, 'files')
+            if len(uploads) == 0:
+                return error_response('No files uploaded', 400)
+
+            results = [None] * len(uploads)
+            cache_keys = [None] * len(uploads)
+
+            try:
+                for index, upload in enumerate(uploads):
+                    if not upload.ok:
+                        PREDICTION_ERRORS.inc(reason='invalid_upload')
+                        results[index] = {'success': False, 'error': upload.error}
+                    else:
+                        cache_keys[index], results[index] = lookup_cached(upload)
+
+                missing = [index for index, result in enumerate(results) if result is None]
+                if missing:
+                    check_deadline()
+                predictions = await run_blocking(
+                    inference_executor,
+                    predict_bulk,
+                    [uploads[index].rewind() for index in missing]
+                )
+
+                for index, prediction in zip(missing, predictions):
+                    if cache_keys[index]:
+                        prediction_cache.put(cache_keys[index], prediction)
+                    results[index] = prediction
+            except (QueueFullError, PoolFullError) as e:
+                PREDICTION_ERRORS.inc(reason='busy')
+                SHED_REQUESTS.inc(reason='busy')
+                return server_busy(f'Server busy: {str(e)}')
+            except DeadlineExceeded as e:
+                return deadline_exceeded(e)
+            finally:
+                for upload in uploads:
+                    upload.close()
+
+        for upload, prediction in zip(uploads, results):
+            prediction['filename'] = upload.filename
+
+        return JSONResponse(with_profile(request, {
+            'success': True,
+            'count': len(results),
+            'predictions': results
+        }))
+
+    except Exception as e:
+        PREDICTION_ERRORS.inc(reason='server')
+        return error_response(str(e), 500)
+
+
+async def explain(request):
+    """
+    Predict and explain X-ray image(s) with a Grad-CAM heatmap of the
+    predicted class
+
+    Expects:
+        file: Image file(s) in form data
+    """
+    try:
+        unavailable = await model_unavailable()
+        if unavailable:
+            return unavailable
+
+        async with request.form() as form:
+            uploads = await read_uploads(form, 'file')
+            if len(uploads) == 0:
+                return error_response('No file uploaded', 400)
+
+            try:
+                results = await run_blocking(inference_executor, explain_uploads, uploads)
+            except ExplanationUnavailable as e:
+                return error_response(f'Explanations unavailable: {str(e)}', 501)
+            except PoolFullError as e:
+                PREDICTION_ERRORS.inc(reason='busy')
+                SHED_REQUESTS.inc(reason='busy')
+                return server_busy(f'Server busy: {str(e)}')
+            except DeadlineExceeded as e:
+                return deadline_exceeded(e)
+            finally:
+                for upload in uploads:
+                    upload.close()
+
+        results = await run_blocking(preprocess_executor, add_heatmap_images, results)
+        for upload, result in zip(uploads, results):
+            result['filename'] = upload.filename
+
+        if len(results) == 1:
+            return JSONResponse(results[0])
+        return JSONResponse({
+            'success': True,
+            'count': len(results),
+            'predictions': results
+        })
+
+    except Exception as e:
+        PREDICTION_ERRORS.inc(reason='server')
+        return error_response(f'Server error: {str(e)}', 500)
+
+
+async def submit_job(request):
+    """
+    Submit X-ray images for background prediction
+
+    Expects:
+        files: Multiple image files in form data
+    """
+    try:
+        # Jobs may be queued while the model is still loading
+        if predictor.state in ('failed', 'missing'):
+            return await model_unavailable()
+
+        async with request.form() as form:
+            uploads = await read_uploads(form, 'files')
+            if len(uploads) == 0:
+                return error_response('No files uploaded', 400)
+
+            try:
+                job = await run_blocking(preprocess_executor, job_runner.submit, uploads)
+            except JobQueueFullError as e:
+                SHED_REQUESTS.inc(reason='busy')
+                return server_busy(f'Server busy: {str(e)}')
+            finally:
+                for upload in uploads:
+                    upload.close()
+
+        status_url = f"/api/jobs/{job['id']}"
+        return JSONResponse({
+            **job_status(job),
+            'status_url': status_url,
+            'results_url': status_url + '/results'
+        }, status_code=202, headers={'Location': status_url})
+
+    except Exception as e:
+        return error_response(f'Server error: {str(e)}', 500)
+
+
+async def get_job(request):
+    """
+    Get the state and progress of a job
+    """
+    try:
+        job = await run_blocking(preprocess_executor, job_store.load, request.path_params['job_id'])
+    except JobNotFound:
+        return error_response('Job not found or expired', 404)
+    return JSONResponse(job_status(job))
+
+
+async def get_job_results(request):
+    """
+    Get the results a job has finished so far (?offset=&limit=)
+    """
+    page = results_range(request.query_params)
+    if page is None:
+        return error_response(INVALID_RESULTS_RANGE, 400)
+
+    offset, limit = page
+    try:
+        job = await run_blocking(preprocess_executor, job_store.load, request.path_params['job_id'])
+    except JobNotFound:
+        return error_response('Job not found or expired', 404)
+    return JSONResponse(await run_blocking(preprocess_executor, job_results, job, offset, limit))
+
+
+async def delete_job(request):
+    """
+    Cancel a job and delete its images and results
+    """
+    job_id = request.path_params['job_id']
+    try:
+        await run_blocking(preprocess_executor, job_store.load, job_id)
+    except JobNotFound:
+        return error_response('Job not found or expired', 404)
+    await run_blocking(preprocess_executor, job_store.delete, job_id)
+    return JSONResponse({'success': True, 'job_id': job_id, 'deleted': True})
+
+
+async def not_found(request, exc):
+    return error_response('Endpoint not found', 404)
+
+
+async def internal_error(request, exc):
+    return error_response('Internal server error', 500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    preprocess_executor.shutdown(wait=False, cancel_futures=True)
+    inference_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/style.css', serve_css),
+        Route('/script.js', serve_js),
+        Route('/favicon.ico', favicon),
+        Route('/api/debug', debug_info, methods=['GET']),
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/ready', readiness_check, methods=['GET']),
+        Route('/api/model-info', model_info, methods=['GET']),
+        Route('/api/batcher-stats', batcher_stats, methods=['GET']),
+        Route('/api/cache-stats', cache_stats, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/api/predict', predict, methods=['POST']),
+        Route('/api/batch-predict', batch_predict, methods=['POST']),
+        Route('/api/explain', explain, methods=['POST']),
+        Route('/api/jobs', submit_job, methods=['POST']),
+        Route('/api/jobs/{job_id}', get_job, methods=['GET']),
+        Route('/api/jobs/{job_id}', delete_job, methods=['DELETE']),
+        Route('/api/jobs/{job_id}/results', get_job_results, methods=['GET'])
+    ],
+    middleware=[Middleware(RequestMetricsMiddleware),
+                Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'],
+                           allow_headers=['*']),
+                Middleware(BodySizeLimitMiddleware),
+                Middleware(ProfileMiddleware),
+                Middleware(AdmissionMiddleware)],
+    exception_handlers={404: not_found, 500: internal_error},
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("\n🚀 Starting ASGI server on http://localhost:5000 ...")
+    # One process: the model, batcher and pools live in this interpreter
+    uvicorn.run(app, host='0.0.0.0', port=5000, workers=1)
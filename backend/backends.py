@@ -0,0 +1,556 @@
+"""
+Inference Backend Module
+Interchangeable runtimes behind ChestXrayPredictor: the Keras model (through
+the traced InferenceEngine) and a TFLite interpreter converted from the same .h5
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from metrics import BATCH_SIZE, STAGE_SECONDS
+
+
+BACKENDS = ('keras', 'tflite')
+
+
+def load_keras_model(model_path, model_cache_dir=None):
+    """
+    Load the Keras model, preferring the converted copy in the model cache
+
+    The first load of a given .h5 converts it; a broken cache entry only
+    costs a fallback to the .h5.
+
+    Args:
+        model_path (str): Path to the .h5 file
+        model_cache_dir (str): ModelCache directory, or None to always read the .h5
+
+    Returns:
+        tuple: (keras.Model, 'cache' or 'h5')
+    """
+    from tensorflow.keras.models import load_model
+
+    cache = None
+    if model_cache_dir:
+        from model_cache import ModelCache
+        cache = ModelCache(model_cache_dir)
+        try:
+            model = cache.load(model_path)
+            if model is not None:
+                return model, 'cache'
+        except Exception as e:
+            print(f"⚠️  Model cache unusable, loading the .h5: {str(e)}")
+
+    # Inference only; skipping the optimizer state also makes loading faster
+    model = load_model(model_path, compile=False)
+
+    if cache is not None:
+        try:
+            entry = cache.save(model_path, model)
+            print(f"💾 Converted model cached at {entry}")
+        except Exception as e:
+            print(f"⚠️  Could not write model cache: {str(e)}")
+    return model, 'h5'
+
+
+QUANTIZATIONS = ('dynamic', 'float16', 'int8')
+
+
+def convert_to_tflite(model, quantization=None, representative_images=None):
+    """
+    Convert a Keras model to a TFLite flatbuffer
+
+    Args:
+        model (keras.Model): Loaded model
+        quantization (str): None for float32, 'dynamic' (int8 weights, float
+            activations), 'float16' (float16 weights) or 'int8' (int8 weights,
+            activations, input and output; needs representative_images)
+        representative_images (numpy array): Preprocessed calibration images
+            of shape (N, 224, 224, 3)
+
+    Returns:
+        bytes: TFLite model
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization is None:
+        return converter.convert()
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}' (expected one of {QUANTIZATIONS})")
+
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_images is None or len(representative_images) == 0:
+            raise ValueError('int8 quantization needs representative images for calibration')
+
+        def representative_dataset():
+            for image in representative_images:
+                yield [np.asarray(image[np.newaxis], dtype=np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+def export_tflite(model_path, model_cache_dir):
+    """
+    Float32 TFLite conversion of a .h5 as a file in the model cache, converted
+    only if the cache has none for the current content of the .h5
+
+    Args:
+        model_path (str): Path to the .h5 file
+        model_cache_dir (str): ModelCache directory
+
+    Returns:
+        tuple: (path of the .tflite file, 'cache' or 'converted')
+    """
+    from model_cache import ModelCache
+
+    cache = ModelCache(model_cache_dir)
+    path = cache.artifact_path(model_path, 'model.tflite')
+    if os.path.exists(path):
+        return path, 'cache'
+
+    print("🔄 Converting model to TFLite...")
+    model, _ = load_keras_model(model_path, model_cache_dir)
+    return cache.write_artifact(model_path, 'model.tflite', convert_to_tflite(model)), 'converted'
+
+
+def tflite_interpreter_class():
+    """
+    The TFLite interpreter class: the standalone LiteRT runtime when it is
+    installed, otherwise the one bundled with TensorFlow
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def tflite_builtin_resolver():
+    """
+    Op resolver type that runs the builtin kernels without the XNNPACK delegate
+    """
+    try:
+        from ai_edge_litert.interpreter import OpResolverType
+    except ImportError:
+        import tensorflow as tf
+        OpResolverType = tf.lite.experimental.OpResolverType
+    return OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+
+
+class InferenceBackend:
+    """
+    Base class for inference runtimes
+
+    Subclasses implement load() and _run(); run() adds latency accounting.
+    """
+
+    name = None
+    # Stage label of run() in the latency metrics
+    metrics_stage = 'inference'
+
+    def __init__(self, model_path, img_size=224, batch_sizes=(1, 8, 32), latency_window=500):
+        """
+        Initialize the backend
+
+        Args:
+            model_path (str): Model file
+            img_size (int): Model input height and width
+            batch_sizes (tuple): Batch sizes to prepare during warmup
+            latency_window (int): Recent calls kept for latency statistics
+        """
+        self.model_path = model_path
+        self.img_size = img_size
+        self.batch_sizes = tuple(sorted(set(int(size) for size in batch_sizes if int(size) > 0)))
+        self.source = None
+        self.baseline_ms = None
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)  # (batch size, seconds)
+        self._calls = 0
+        self._images = 0
+
+    def load(self):
+        """
+        Load the model; raises on failure
+        """
+        raise NotImplementedError
+
+    def _run(self, img_batch):
+        raise NotImplementedError
+
+    def run(self, img_batch):
+        """
+        Get class probabilities for a batch
+
+        Args:
+            img_batch (numpy array): Batch of shape (N, 224, 224, 3)
+
+        Returns:
+            numpy array: Probabilities of shape (N, num_classes)
+        """
+        start = time.perf_counter()
+        output = self._run(img_batch)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._latencies.append((len(img_batch), elapsed))
+            self._calls += 1
+            self._images += len(img_batch)
+        STAGE_SECONDS.observe(elapsed, stage=self.metrics_stage)
+        BATCH_SIZE.observe(len(img_batch))
+        return output
+
+    def warmup(self):
+        """
+        Run every prepared batch size once
+
+        Returns:
+            float: Seconds taken
+        """
+        start = time.perf_counter()
+        for size in self.batch_sizes:
+            self._run(np.zeros((size, self.img_size, self.img_size, 3), dtype=np.float32))
+        return time.perf_counter() - start
+
+    def measure_baseline(self, runs=5):
+        """
+        Time single-image calls on a warm backend
+
+        Args:
+            runs (int): Timed calls (the median is kept)
+
+        Returns:
+            float: Median milliseconds per single-image call
+        """
+        sample = np.zeros((1, self.img_size, self.img_size, 3), dtype=np.float32)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            self._run(sample)
+            timings.append(time.perf_counter() - start)
+        self.baseline_ms = float(np.median(timings)) * 1000.0
+        return self.baseline_ms
+
+    def get_latency_stats(self):
+        """
+        Latency of recent calls
+
+        Returns:
+            dict: Call counts plus average, p50 and p95 per call and average per image
+        """
+        with self._lock:
+            recent = list(self._latencies)
+            calls = self._calls
+            images = self._images
+
+        stats = {
+            'calls': calls,
+            'images': images,
+            'baseline_single_image_ms': self.baseline_ms
+        }
+        if recent:
+            seconds = np.array([elapsed for _, elapsed in recent]) * 1000.0
+            stats.update({
+                'avg_ms': float(seconds.mean()),
+                'p50_ms': float(np.percentile(seconds, 50)),
+                'p95_ms': float(np.percentile(seconds, 95)),
+                'avg_ms_per_image': float(seconds.sum() / sum(size for size, _ in recent))
+            })
+        return stats
+
+    def describe(self):
+        """
+        Describe the backend
+
+        Returns:
+            dict: Name, where the model came from and measured latency
+        """
+        return {
+            'name': self.name,
+            'source': self.source,
+            'latency': self.get_latency_stats()
+        }
+
+
+class KerasBackend(InferenceBackend):
+    """
+    The Keras model, called through InferenceEngine's traced functions and
+    falling back to model.predict if tracing fails
+    """
+
+    name = 'keras'
+
+    def __init__(self, model_path, img_size=224, batch_sizes=(1, 8, 32), check_parity=False,
+                 model_cache_dir=None):
+        """
+        Initialize the backend
+
+        Args:
+            model_path (str): Path to the .h5 file
+            img_size (int): Model input height and width
+            batch_sizes (tuple): Batch sizes traced with a fixed input signature
+            check_parity (bool): Compare the traced path with model.predict after loading
+            model_cache_dir (str): ModelCache directory, or None
+        """
+        super().__init__(model_path, img_size=img_size, batch_sizes=batch_sizes)
+        self.check_parity = check_parity
+        self.model_cache_dir = model_cache_dir
+        self.model = None
+        self.engine = None
+
+    def load(self):
+        self.model, self.source = load_keras_model(self.model_path, self.model_cache_dir)
+
+    def warmup(self):
+        """
+        Trace and warm up the low-overhead inference path
+
+        Falls back to model.predict if tracing fails.
+
+        Returns:
+            float: Seconds taken
+        """
+        start = time.perf_counter()
+        try:
+            from inference import InferenceEngine
+
+            self.engine = InferenceEngine(
+                self.model,
+                batch_sizes=self.batch_sizes,
+                img_size=self.img_size
+            )
+            warmup_time = self.engine.warmup()
+            print(f"⚡ Inference engine warmed up in {warmup_time:.2f}s "
+                  f"(batch sizes {list(self.engine.batch_sizes)})")
+
+            if self.check_parity:
+                parity = self.engine.check_parity()
+                status = "✅" if parity['passed'] else "❌"
+                print(f"{status} Parity with model.predict: "
+                      f"max diff {parity['max_abs_diff']:.2e}, "
+                      f"top-1 agreement {parity['top1_agreement'] * 100:.1f}%")
+                if not parity['passed']:
+                    print("⚠️  Falling back to model.predict")
+                    self.engine = None
+
+        except Exception as e:
+            print(f"⚠️  Inference engine unavailable, using model.predict: {str(e)}")
+            self.engine = None
+        return time.perf_counter() - start
+
+    def _run(self, img_batch):
+        if self.engine is not None:
+            return self.engine.run(img_batch)
+        return self.model.predict(img_batch, verbose=0)
+
+    def describe(self):
+        info = super().describe()
+        info.update({
+            'input_shape': self.model.input_shape,
+            'output_shape': self.model.output_shape,
+            'total_parameters': self.model.count_params(),
+            'inference_engine': self.engine.describe() if self.engine is not None else None
+        })
+        return info
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    TFLite interpreter on the CPU
+
+    A .tflite model path (including the quantized variants written by
+    quantize.py) is used as is; for a .h5 the float32 conversion is made on
+    first use and kept in the model cache. An interpreter is not
+    thread-safe, so every thread gets its own: one per prepared batch size
+    and one that is resized for any other size, like InferenceEngine's fixed
+    and dynamic signatures. Every interpreter holds its own arena (and, with
+    XNNPACK, its own repacked weights), so a thread never keeps more than
+    len(batch_sizes) + 1 of them.
+
+    With share_weights, interpreters are opened from the .tflite file instead
+    of a bytes copy. TFLite memory-maps the file read-only and the builtin
+    kernels read constant tensors straight from the mapping, so every thread
+    and every worker process shares one copy of the weights through the page
+    cache. The XNNPACK delegate is left out in that mode because it repacks
+    the weights into private memory for each interpreter.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path, img_size=224, batch_sizes=(1, 8, 32), num_threads=None,
+                 model_cache_dir=None, share_weights=False):
+        """
+        Initialize the backend
+
+        Args:
+            model_path (str): Path to a .h5 (converted on demand) or .tflite file
+            img_size (int): Model input height and width
+            batch_sizes (tuple): Batch sizes to prepare during warmup
+            num_threads (int): Threads per interpreter (None: runtime default)
+            model_cache_dir (str): ModelCache directory for the conversion, or None
+            share_weights (bool): Memory-map the .tflite file read-only instead
+                of loading it into this process
+        """
+        super().__init__(model_path, img_size=img_size, batch_sizes=batch_sizes)
+        self.num_threads = num_threads
+        self.model_cache_dir = model_cache_dir
+        self.share_weights = share_weights
+        self.flatbuffer_path = None
+        self.model_content = None
+        self.input_dtype = None
+        self.output_shape = None
+        self._interpreter_class = None
+        self._local = threading.local()
+        self._interpreters_created = 0
+        self._resizes = 0
+
+    def load(self):
+        if self.model_path.endswith('.tflite'):
+            self.flatbuffer_path = self.model_path
+            self.source = 'tflite'
+        elif self.model_cache_dir:
+            self.flatbuffer_path, self.source = export_tflite(self.model_path, self.model_cache_dir)
+        elif self.share_weights:
+            raise ValueError('Shared weights need a .tflite model or the model cache')
+        else:
+            print("🔄 Converting model to TFLite...")
+            model, _ = load_keras_model(self.model_path)
+            self.model_content = convert_to_tflite(model)
+            self.source = 'converted'
+
+        if self.model_content is None and not self.share_weights:
+            with open(self.flatbuffer_path, 'rb') as f:
+                self.model_content = f.read()
+
+        self._interpreter_class = tflite_interpreter_class()
+        # Fail here rather than on the first request if the flatbuffer is unusable
+        interpreter = self._get_interpreter(1)
+        self.input_dtype = interpreter.get_input_details()[0]['dtype']
+        self.output_shape = [None] + [
+            int(dim) for dim in interpreter.get_output_details()[0]['shape_signature'][1:]
+        ]
+
+    def _create_interpreter(self):
+        """
+        A new interpreter for the loaded model
+        """
+        if self.share_weights:
+            interpreter = self._interpreter_class(
+                model_path=self.flatbuffer_path,
+                num_threads=self.num_threads,
+                experimental_op_resolver_type=tflite_builtin_resolver()
+            )
+        else:
+            interpreter = self._interpreter_class(
+                model_content=self.model_content, num_threads=self.num_threads
+            )
+        with self._lock:
+            self._interpreters_created += 1
+        return interpreter
+
+    def _get_interpreter(self, batch_size):
+        """
+        This thread's interpreter for one batch size: its own for a prepared
+        size, otherwise the shared one resized to batch_size
+        """
+        interpreters = getattr(self._local, 'interpreters', None)
+        if interpreters is None:
+            interpreters = self._local.interpreters = {}
+
+        key = batch_size if batch_size in self.batch_sizes else None
+        interpreter = interpreters.get(key)
+        if interpreter is None:
+            interpreter = interpreters[key] = self._create_interpreter()
+        elif interpreter.get_input_details()[0]['shape'][0] == batch_size:
+            return interpreter
+        elif key is None:
+            with self._lock:
+                self._resizes += 1
+
+        input_index = interpreter.get_input_details()[0]['index']
+        interpreter.resize_tensor_input(
+            input_index, [batch_size, self.img_size, self.img_size, 3]
+        )
+        interpreter.allocate_tensors()
+        return interpreter
+
+    def _run(self, img_batch):
+        interpreter = self._get_interpreter(len(img_batch))
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+
+        if np.issubdtype(input_details['dtype'], np.integer):
+            # Fully quantized model: quantize the input, dequantize the output
+            scale, zero_point = input_details['quantization']
+            info = np.iinfo(input_details['dtype'])
+            img_batch = np.clip(np.round(img_batch / scale + zero_point), info.min, info.max)
+        interpreter.set_tensor(
+            input_details['index'],
+            np.ascontiguousarray(img_batch, dtype=input_details['dtype'])
+        )
+        interpreter.invoke()
+
+        output = interpreter.get_tensor(output_details['index'])
+        if np.issubdtype(output_details['dtype'], np.integer):
+            scale, zero_point = output_details['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+    def describe(self):
+        info = super().describe()
+        with self._lock:
+            interpreters = self._interpreters_created
+            resizes = self._resizes
+        info.update({
+            'input_dtype': np.dtype(self.input_dtype).name,
+            'input_shape': [None, self.img_size, self.img_size, 3],
+            'output_shape': self.output_shape,
+            'total_parameters': None,
+            'model_bytes': (os.path.getsize(self.flatbuffer_path) if self.share_weights
+                            else len(self.model_content)),
+            'shared_weights': self.share_weights,
+            'num_threads': self.num_threads,
+            'interpreters': interpreters,
+            'interpreter_resizes': resizes
+        })
+        return info
+
+
+def create_backend(name, model_path, img_size=224, batch_sizes=(1, 8, 32), check_parity=False,
+                   model_cache_dir=None, num_threads=None, share_weights=False):
+    """
+    Build an inference backend by name
+
+    Args:
+        name (str): 'keras' or 'tflite'
+        model_path (str): Model file
+        img_size (int): Model input height and width
+        batch_sizes (tuple): Batch sizes prepared at warmup
+        check_parity (bool): Keras only; compare traced and model.predict outputs
+        model_cache_dir (str): ModelCache directory, or None
+        num_threads (int): TFLite only; threads per interpreter
+        share_weights (bool): TFLite only; memory-map the weights read-only
+
+    Returns:
+        InferenceBackend: Unloaded backend
+    """
+    if name == 'keras':
+        return KerasBackend(model_path, img_size=img_size, batch_sizes=batch_sizes,
+                            check_parity=check_parity, model_cache_dir=model_cache_dir)
+    if name == 'tflite':
+        return TFLiteBackend(model_path, img_size=img_size, batch_sizes=batch_sizes,
+                             num_threads=num_threads, model_cache_dir=model_cache_dir,
+                             share_weights=share_weights)
+    raise ValueError(f"Unknown inference backend '{name}' (expected one of {BACKENDS})")
@@ -0,0 +1,372 @@
+"""
+Dynamic Micro-Batching Module
+Groups concurrent requests into one forward pass, with priority lanes so
+bulk work cannot stall interactive predictions
+
+Requests wait in one bounded queue per lane. Every batch is filled by
+weighted fair sharing: each lane with waiting images is owed a share of the
+batch proportional to its weight, and slots a lane cannot use go to the
+lanes in priority order. Interactive images therefore wait behind at most
+bulk's share of one batch, while bulk still gets its share when interactive
+traffic alone could fill every batch, and all spare capacity otherwise.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from admission import DeadlineExceeded, current_deadline
+from metrics import STAGE_SECONDS, LANE_QUEUE_DEPTH, LANE_WAIT_SECONDS, LANE_IMAGES
+from profiling import current_profile
+
+
+# Lane name -> weight, highest priority first
+DEFAULT_LANE_WEIGHTS = {'interactive': 4, 'bulk': 1}
+
+
+class QueueFullError(Exception):
+    """
+    Raised when the batching queue cannot accept more requests
+    """
+    pass
+
+
+class _PendingRequest:
+    """
+    A preprocessed image waiting for its turn in a batch
+    """
+
+    __slots__ = ('img_array', 'lane', 'future', 'enqueued_at', 'profile', 'deadline')
+
+    def __init__(self, img_array, lane):
+        self.img_array = img_array
+        self.lane = lane
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        # The batch runs on the worker thread, outside the request's context
+        self.profile = current_profile()
+        self.deadline = current_deadline()
+
+
+class _Lane:
+    """
+    Queue and counters of one priority class
+    """
+
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = max(0.0, float(weight))
+        self.queue = deque()
+        # Batch slots owed to the lane (deficit round robin)
+        self.credit = 0.0
+        self.items = 0
+        self.rejected = 0
+        self.expired = 0
+        self.recent_waits = deque(maxlen=1000)
+
+
+def _wait_stats(waits):
+    waits = sorted(waits)
+    if not waits:
+        return {'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    return {
+        'avg': sum(waits) / len(waits),
+        'p50': waits[int(0.50 * (len(waits) - 1))],
+        'p95': waits[int(0.95 * (len(waits) - 1))],
+        'max': waits[-1]
+    }
+
+
+class MicroBatcher:
+    """
+    Collects requests arriving within a short window and runs them
+    through ChestXrayPredictor as a single batch
+    """
+
+    def __init__(self, predictor, max_batch_size=8, max_wait_ms=10, max_queue_size=64,
+                 lane_weights=None):
+        """
+        Initialize the batcher
+
+        Args:
+            predictor (ChestXrayPredictor): Predictor used for the forward pass
+            max_batch_size (int): Largest number of images per forward pass
+            max_wait_ms (float): How long the first request of a batch may
+                wait for others to join
+            max_queue_size (int): Pending requests allowed per lane before rejecting
+            lane_weights (dict): Lane name -> share of each batch when several
+                lanes have work, highest priority first (default:
+                interactive 4, bulk 1)
+        """
+        self.predictor = predictor
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue_size = max(1, int(max_queue_size))
+
+        self._lanes = {
+            name: _Lane(name, weight)
+            for name, weight in (lane_weights or DEFAULT_LANE_WEIGHTS).items()
+        }
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        # Statistics
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._failed_batches = 0
+        self._batch_sizes = {}
+        self._recent_waits = deque(maxlen=1000)
+
+    def start(self):
+        """
+        Start the background worker thread if it is not running yet
+        """
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='micro-batcher', daemon=True
+                )
+                self._worker.start()
+
+    def submit_async(self, img_array, lane='interactive', timeout=0):
+        """
+        Queue one preprocessed image for prediction
+
+        Args:
+            img_array (numpy array): Image of shape (1, 224, 224, 3) or (224, 224, 3)
+            lane (str): Priority lane, e.g. 'interactive' or 'bulk'
+            timeout (float): Seconds to wait for room when the lane is full
+                (never past the request's deadline); 0 rejects at once
+
+        Returns:
+            Future: Resolves to the prediction result dict, or fails with
+            DeadlineExceeded if the request's deadline passes while queued
+        """
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown lane '{lane}', expected one of {list(self._lanes)}")
+        self.start()
+
+        if img_array.ndim == 4:
+            img_array = img_array[0]
+
+        pending = _PendingRequest(img_array, lane)
+        queue = self._lanes[lane].queue
+        with self._lock:
+            give_up = pending.enqueued_at + timeout
+            if pending.deadline is not None:
+                give_up = min(give_up, pending.deadline)
+            while len(queue) >= self.max_queue_size:
+                remaining = give_up - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._not_full.wait(remaining)
+
+            if len(queue) >= self.max_queue_size:
+                self._lanes[lane].rejected += 1
+                if pending.deadline is not None and time.perf_counter() >= pending.deadline:
+                    raise DeadlineExceeded(f'deadline passed waiting for room in the {lane} queue')
+                raise QueueFullError(
+                    f'Prediction queue is full ({self.max_queue_size} pending {lane} requests)'
+                )
+
+            queue.append(pending)
+            LANE_QUEUE_DEPTH.set(len(queue), lane=lane)
+            self._not_empty.notify()
+
+        return pending.future
+
+    def submit(self, img_array, timeout=None, lane='interactive'):
+        """
+        Queue one preprocessed image and wait for its prediction
+
+        Args:
+            img_array (numpy array): Preprocessed image
+            timeout (float): Seconds to wait for the result
+            lane (str): Priority lane
+
+        Returns:
+            dict: Prediction result
+        """
+        return self.submit_async(img_array, lane=lane).result(timeout=timeout)
+
+    def _queued(self):
+        return sum(len(lane.queue) for lane in self._lanes.values())
+
+    def _collect_batch(self):
+        """
+        Block for the first request, then gather more until the batch is
+        full or the wait window of the oldest request has passed
+        """
+        with self._lock:
+            while not self._queued():
+                self._not_empty.wait()
+
+            oldest = min(lane.queue[0].enqueued_at for lane in self._lanes.values() if lane.queue)
+            deadline = oldest + self.max_wait
+            while self._queued() < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._not_empty.wait(remaining)
+
+            batch = self._take()
+            self._not_full.notify_all()
+        return batch
+
+    def _take(self):
+        """
+        Fill one batch from the lanes by weighted fair sharing (lock held)
+
+        Every lane with waiting requests earns max_batch_size * weight /
+        total weight slots; fractions carry over to the next batch, and a lane
+        whose queue runs empty starts from zero again. Slots left after the
+        shares go to the lanes in priority order.
+        """
+        active = [lane for lane in self._lanes.values() if lane.queue]
+        total_weight = sum(lane.weight for lane in active)
+        batch = []
+
+        for lane in active:
+            if total_weight:
+                share = self.max_batch_size * lane.weight / total_weight
+                lane.credit = min(lane.credit + share, float(self.max_batch_size))
+            count = min(int(lane.credit), len(lane.queue), self.max_batch_size - len(batch))
+            batch.extend(lane.queue.popleft() for _ in range(count))
+            lane.credit -= count
+
+        for lane in self._lanes.values():
+            while lane.queue and len(batch) < self.max_batch_size:
+                batch.append(lane.queue.popleft())
+
+        for lane in self._lanes.values():
+            if not lane.queue:
+                lane.credit = 0.0
+            LANE_QUEUE_DEPTH.set(len(lane.queue), lane=lane.name)
+        return batch
+
+    def _drop_expired(self, batch):
+        """
+        Fail the requests whose deadline has passed instead of running them
+
+        Returns:
+            list: Requests still worth answering
+        """
+        now = time.perf_counter()
+        live = []
+        expired = []
+        for item in batch:
+            if item.deadline is not None and now >= item.deadline:
+                item.future.set_exception(DeadlineExceeded(
+                    f'deadline passed after {(now - item.enqueued_at) * 1000.0:.0f} ms in the queue'
+                ))
+                expired.append(item)
+            else:
+                live.append(item)
+
+        if expired:
+            with self._stats_lock:
+                for item in expired:
+                    self._lanes[item.lane].expired += 1
+        return live
+
+    def _run(self):
+        """
+        Worker loop: collect a batch, run it, hand out results
+        """
+        while True:
+            batch = self._drop_expired(self._collect_batch())
+            if not batch:
+                continue
+            started = time.perf_counter()
+
+            try:
+                img_batch = np.stack([item.img_array for item in batch])
+                results = self.predictor.predict_arrays(img_batch)
+            except Exception as e:
+                with self._stats_lock:
+                    self._failed_batches += 1
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            # A request with several images in this batch shares one forward pass
+            profiled = set()
+            for item in batch:
+                if item.profile is not None:
+                    item.profile.add('batch_wait', started - item.enqueued_at)
+                    if id(item.profile) not in profiled:
+                        profiled.add(id(item.profile))
+                        item.profile.add('inference', finished - started)
+
+            for item, result in zip(batch, results):
+                item.future.set_result(result)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+                for item in batch:
+                    wait_ms = (started - item.enqueued_at) * 1000.0
+                    self._recent_waits.append(wait_ms)
+                    self._lanes[item.lane].recent_waits.append(wait_ms)
+                    self._lanes[item.lane].items += 1
+            for item in batch:
+                STAGE_SECONDS.observe(started - item.enqueued_at, stage='batch_wait')
+                LANE_WAIT_SECONDS.observe(started - item.enqueued_at, lane=item.lane)
+                LANE_IMAGES.inc(lane=item.lane)
+
+    def queue_depth(self):
+        """
+        Requests waiting for the worker thread, across all lanes
+        """
+        return self._queued()
+
+    def get_stats(self):
+        """
+        Get batching statistics for tuning
+
+        Returns:
+            dict: Settings, batch-size distribution, queue wait times, and
+            queue depth, throughput and waits per lane
+        """
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            lanes = {
+                lane.name: {
+                    'weight': lane.weight,
+                    'queue_depth': len(lane.queue),
+                    'items': lane.items,
+                    'rejected': lane.rejected,
+                    'expired': lane.expired,
+                    'queue_wait_ms': _wait_stats(lane.recent_waits)
+                }
+                for lane in self._lanes.values()
+            }
+
+            return {
+                'settings': {
+                    'max_batch_size': self.max_batch_size,
+                    'max_wait_ms': self.max_wait * 1000.0,
+                    'max_queue_size': self.max_queue_size,
+                    'lane_weights': {name: lane['weight'] for name, lane in lanes.items()}
+                },
+                'batches': batches,
+                'items': items,
+                'rejected': sum(lane['rejected'] for lane in lanes.values()),
+                'expired': sum(lane['expired'] for lane in lanes.values()),
+                'failed_batches': self._failed_batches,
+                'avg_batch_size': items / batches if batches else 0.0,
+                'batch_size_counts': dict(sorted(self._batch_sizes.items())),
+                'queue_wait_ms': _wait_stats(self._recent_waits),
+                'queue_depth': self._queued(),
+                'lanes': lanes
+            }
@@ -0,0 +1,310 @@
+"""
+Benchmark Suite
+Times preprocessing, inference and the Flask endpoints on synthetic X-rays
+and compares the results with a saved JSON baseline
+
+Runs without patient data or the trained model: images are generated at
+several resolutions, and when MODEL_PATH does not exist a small stand-in
+model with the same input and output shapes is used instead.
+
+Usage:
+    python benchmark.py                       Run and compare with the baseline
+    python benchmark.py --save                Run and write the baseline
+    python benchmark.py --resolutions 512,1024 --repeats 10 --threshold 0.3
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'benchmarks', 'baseline.json')
+DEFAULT_RESOLUTIONS = (512, 1024, 2048)
+BATCH_IMAGES = 8
+# Allowed slowdown of a benchmark's median before it counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+
+def build_stand_in_model(path, img_size=224, num_classes=6):
+    """
+    Save a small untrained model with the production input and output shapes
+
+    Predictions are meaningless, but preprocessing, batching, serialization
+    and the endpoints do the same work as with the real model; only the
+    forward pass is cheaper.
+
+    Args:
+        path (str): Where to write the .h5
+        img_size (int): Input width and height
+        num_classes (int): Softmax outputs
+
+    Returns:
+        str: path
+    """
+    import tensorflow as tf
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input((img_size, img_size, 3)),
+        tf.keras.layers.Conv2D(8, 3, strides=2, activation='relu'),
+        tf.keras.layers.Conv2D(16, 3, strides=2, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(num_classes, activation='softmax')
+    ])
+    model.save(path)
+    return path
+
+
+def measure(fn, repeats, warmup=2):
+    """
+    Time repeated calls of fn
+
+    Args:
+        fn (callable): Code under test
+        repeats (int): Timed calls
+        warmup (int): Untimed calls first
+
+    Returns:
+        dict: Median, p95, mean and min in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+
+    times = np.array(times)
+    return {
+        'median_ms': float(np.median(times)),
+        'p95_ms': float(np.percentile(times, 95)),
+        'mean_ms': float(times.mean()),
+        'min_ms': float(times.min()),
+        'repeats': repeats
+    }
+
+
+def upload(path, name=None):
+    """
+    Form-data file tuple for the Flask test client
+    """
+    import io
+
+    with open(path, 'rb') as f:
+        return (io.BytesIO(f.read()), name or os.path.basename(path))
+
+
+def run_benchmarks(resolutions=DEFAULT_RESOLUTIONS, repeats=20, stand_in=False):
+    """
+    Run every benchmark in this process
+
+    Args:
+        resolutions (tuple): Square image sizes to generate
+        repeats (int): Timed runs per benchmark
+        stand_in (bool): Use the stand-in model even if the real one exists
+
+    Returns:
+        dict: Environment and per-benchmark timings
+    """
+    work_dir = tempfile.mkdtemp(prefix='xray_benchmark_')
+    try:
+        model_path = os.environ.get('MODEL_PATH', '../models/chest_xray_model.h5')
+        model_kind = 'real'
+        if stand_in or not os.path.exists(model_path):
+            print("🧪 Using a stand-in model (same input/output shapes as the real one)")
+            model_path = build_stand_in_model(os.path.join(work_dir, 'stand_in.h5'))
+            os.environ['MODEL_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+            model_kind = 'stand-in'
+
+        # Read by model.py and app.py at import: measure real work, not cache hits
+        os.environ.update({
+            'MODEL_PATH': model_path,
+            'MODEL_LOAD_MODE': 'eager',
+            'CACHE_ENABLED': '0'
+        })
+
+        from preprocessing import make_synthetic_xrays
+        from app import app
+        from model import predictor
+
+        if not predictor.ready:
+            raise RuntimeError(f'Model failed to load: {predictor.load_error}')
+
+        images = {
+            size: make_synthetic_xrays(os.path.join(work_dir, str(size)),
+                                       count=BATCH_IMAGES, size=size, seed=size)
+            for size in resolutions
+        }
+        # End-to-end benchmarks use the middle resolution
+        e2e_size = resolutions[len(resolutions) // 2]
+        single = images[e2e_size][0]
+        batch = images[e2e_size]
+        client = app.test_client()
+
+        def post(url, field, paths):
+            response = client.post(url, data={field: [upload(path) for path in paths]},
+                                   content_type='multipart/form-data')
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned {response.status_code}: {response.get_data(as_text=True)}')
+
+        benchmarks = {}
+        for size in resolutions:
+            path = images[size][0]
+            print(f"⏱️  preprocess_image {size}x{size}...")
+            benchmarks[f'preprocess_image[{size}]'] = measure(
+                lambda: predictor.preprocess_image(path), repeats
+            )
+
+        cases = {
+            f'predict[{e2e_size}]': lambda: predictor.predict(single),
+            f'predict_batch[{BATCH_IMAGES}x{e2e_size}]': lambda: predictor.predict_batch(batch),
+            f'api_predict[{e2e_size}]': lambda: post('/api/predict', 'file', [single]),
+            f'api_batch_predict[{BATCH_IMAGES}x{e2e_size}]':
+                lambda: post('/api/batch-predict', 'files', batch),
+            'api_health': lambda: client.get('/api/health')
+        }
+        for name, fn in cases.items():
+            print(f"⏱️  {name}...")
+            benchmarks[name] = measure(fn, repeats)
+
+        return {
+            'environment': environment(model_kind, predictor),
+            'benchmarks': benchmarks
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def environment(model_kind, predictor):
+    """
+    What the numbers depend on, so baselines from other setups are recognized
+    """
+    import tensorflow as tf
+
+    return {
+        'python': platform.python_version(),
+        'tensorflow': tf.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'model': model_kind,
+        'backend': predictor.backend_name,
+        'preprocess_mode': predictor.preprocessor.mode,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def compare(results, baseline, default_threshold=DEFAULT_THRESHOLD):
+    """
+    Compare median timings with a baseline
+
+    Args:
+        results (dict): Output of run_benchmarks
+        baseline (dict): Saved results, optionally with per-benchmark
+            'thresholds' (allowed relative slowdown)
+        default_threshold (float): Threshold for benchmarks without their own
+
+    Returns:
+        tuple: (rows per benchmark, list of regressed benchmark names)
+    """
+    thresholds = baseline.get('thresholds', {})
+    rows = []
+    regressions = []
+
+    for name, current in results['benchmarks'].items():
+        reference = baseline['benchmarks'].get(name)
+        if reference is None:
+            rows.append({'name': name, 'median_ms': current['median_ms'], 'status': 'new'})
+            continue
+
+        threshold = thresholds.get(name, default_threshold)
+        change = current['median_ms'] / reference['median_ms'] - 1.0
+        status = 'REGRESSION' if change > threshold else 'ok'
+        if status == 'REGRESSION':
+            regressions.append(name)
+        rows.append({
+            'name': name,
+            'median_ms': current['median_ms'],
+            'baseline_ms': reference['median_ms'],
+            'change': change,
+            'threshold': threshold,
+            'status': status
+        })
+
+    return rows, regressions
+
+
+def print_comparison(rows):
+    print(f"\n{'benchmark':<34}{'median':>10}{'baseline':>10}{'change':>9}{'limit':>8}  status")
+    for row in rows:
+        if 'baseline_ms' in row:
+            print(f"{row['name']:<34}{row['median_ms']:>8.2f}ms{row['baseline_ms']:>8.2f}ms"
+                  f"{row['change']:>+9.0%}{row['threshold']:>+8.0%}  {row['status']}")
+        else:
+            print(f"{row['name']:<34}{row['median_ms']:>8.2f}ms{'-':>10}{'-':>9}{'-':>8}  {row['status']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Preprocessing, inference and API benchmarks')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--output', help='Also write these results to this JSON file')
+    parser.add_argument('--resolutions', default=','.join(map(str, DEFAULT_RESOLUTIONS)))
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed relative slowdown of the median (0.25 = 25%%)')
+    parser.add_argument('--stand-in', action='store_true',
+                        help='Use the stand-in model even if MODEL_PATH exists')
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        tuple(int(size) for size in args.resolutions.split(',')),
+        repeats=args.repeats, stand_in=args.stand_in
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save:
+        previous = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+        # Keep thresholds tuned by hand in the old baseline
+        results['thresholds'] = previous.get('thresholds', {})
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(json.dumps(results, indent=2))
+        print(f"\n⚠️  No baseline at {args.baseline}; run with --save to create one")
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    for key in ('model', 'backend', 'preprocess_mode', 'cpu_count', 'machine'):
+        if baseline['environment'].get(key) != results['environment'][key]:
+            print(f"⚠️  Baseline was recorded with {key}={baseline['environment'].get(key)}, "
+                  f"this run uses {results['environment'][key]}")
+
+    rows, regressions = compare(results, baseline, args.threshold)
+    print_comparison(rows)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower than their baseline threshold: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ No regressions")
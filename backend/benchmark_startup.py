@@ -0,0 +1,103 @@
+"""
+Startup Benchmark
+Compares boot times of the predictor in fresh interpreters: loading the .h5,
+the first boot that converts it into the model cache, a boot from the cache
+and a lazy import that defers loading altogether
+
+Usage: python benchmark_startup.py [repeats]
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+# Runs in a fresh interpreter; prints one JSON line of timings
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from model import predictor
+imported = time.perf_counter()
+tf_imported = 'tensorflow' in sys.modules
+result = {'import_s': imported - start, 'tensorflow_at_import': tf_imported}
+if LOAD:
+    predictor.ensure_loaded()
+    ready = time.perf_counter()
+    import numpy as np
+    predictor.predict_arrays(np.zeros((1, 224, 224, 3), dtype=np.float32))
+    result.update({
+        'ready_s': ready - start,
+        'first_prediction_s': time.perf_counter() - start,
+        'load_seconds': predictor.load_seconds,
+        'source': predictor.load_source,
+        'state': predictor.state
+    })
+print(json.dumps(result))
+'''
+
+
+def run_boot(load, env_overrides):
+    """
+    Boot the predictor in a subprocess
+
+    Args:
+        load (bool): Load the model and run one prediction after importing
+        env_overrides (dict): Extra environment variables
+
+    Returns:
+        dict: Timings reported by the child
+    """
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3', **env_overrides)
+    script = CHILD_SCRIPT.replace('LOAD', 'True' if load else 'False')
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def best_of(runs):
+    """
+    Keep the fastest run (by time to first prediction, or import time)
+    """
+    key = 'first_prediction_s' if 'first_prediction_s' in runs[0] else 'import_s'
+    return min(runs, key=lambda run: run[key])
+
+
+def benchmark_startup(repeats=3):
+    """
+    Measure cold, cached and lazy boots
+
+    Args:
+        repeats (int): Boots per scenario (the fastest is reported)
+
+    Returns:
+        dict: Timings per scenario
+    """
+    cache_dir = tempfile.mkdtemp(prefix='model_cache_bench_')
+    try:
+        no_cache = {'MODEL_CACHE': '0'}
+        with_cache = {'MODEL_CACHE': '1', 'MODEL_CACHE_DIR': cache_dir}
+
+        report = {
+            'h5': best_of([run_boot(True, no_cache) for _ in range(repeats)]),
+            # Only the first boot of a model version pays for the conversion
+            'cold_convert': run_boot(True, with_cache),
+            'cached': best_of([run_boot(True, with_cache) for _ in range(repeats)]),
+            'lazy_import': best_of([run_boot(False, with_cache) for _ in range(repeats)])
+        }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    h5_ready = report['h5']['ready_s']
+    report['cached_speedup'] = h5_ready / report['cached']['ready_s']
+    return report
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(json.dumps(benchmark_startup(repeats), indent=2))
@@ -0,0 +1,370 @@
+"""
+Bulk Inference Module
+Scores every X-ray under a directory tree without going through the HTTP
+API, writing one result per image to JSONL or CSV as it goes
+
+Images stream through the pipeline in batches: a producer thread decodes and
+preprocesses the next batches in parallel (thread or process pool) while the
+model runs the current one. Only `prefetch` batches are held at a time, so
+memory stays constant whatever the archive size. After every batch the output
+is flushed and a checkpoint records how far the run got; --resume continues
+from there after an interruption.
+
+The model, backend and preprocessing are configured with the same
+environment variables as the server (MODEL_PATH, INFERENCE_BACKEND,
+PREPROCESS_MODE, ...).
+
+Usage:
+    python bulk.py /archive/xrays --output scores.jsonl
+    python bulk.py /archive/xrays --output scores.csv --processes 8
+    python bulk.py /archive/xrays --output scores.csv --resume
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+FORMATS = ('jsonl', 'csv')
+
+
+class CheckpointError(Exception):
+    """
+    Raised when a run cannot be resumed from its checkpoint
+    """
+    pass
+
+
+def iter_images(root):
+    """
+    Yield image paths under root, relative to it, in a stable order
+
+    Directories are listed one at a time, so memory does not grow with the
+    size of the tree.
+
+    Args:
+        root (str): Directory to walk
+
+    Yields:
+        str: Relative path of each image
+    """
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(directory, filename), root)
+
+
+def iter_batches(paths, batch_size):
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ResultWriter:
+    """
+    Appends result records to a JSONL or CSV file
+    """
+
+    def __init__(self, path, fmt, class_names, append=False):
+        """
+        Args:
+            path (str): Output file
+            fmt (str): 'jsonl' or 'csv'
+            class_names (list): Class labels, one probability column each in CSV
+            append (bool): Continue an existing file instead of starting over
+        """
+        self.path = path
+        self.format = fmt
+        self.columns = (['path', 'success', 'predicted_class', 'confidence'] +
+                        [f'p_{name}' for name in class_names] + ['error'])
+        self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._csv = csv.writer(self._file) if fmt == 'csv' else None
+        if self._csv is not None and not append:
+            self._csv.writerow(self.columns)
+
+    def write(self, path, result):
+        """
+        Write the result of one image
+
+        Args:
+            path (str): Image path relative to the scanned root
+            result (dict): Prediction result, or {'success': False, 'error': ...}
+        """
+        if self._csv is None:
+            record = {'path': path, 'success': result['success']}
+            if result['success']:
+                record.update({
+                    'predicted_class': result['predicted_class'],
+                    'confidence': result['confidence'],
+                    'probabilities': result['all_probabilities']
+                })
+            else:
+                record['error'] = result['error']
+            self._file.write(json.dumps(record) + '\n')
+            return
+
+        if result['success']:
+            row = [path, 1, result['predicted_class'], f"{result['confidence']:.6f}"]
+            row += [f'{probability:.6f}' for probability in result['all_probabilities'].values()]
+            row.append('')
+        else:
+            row = [path, 0, '', ''] + [''] * (len(self.columns) - 5) + [result['error']]
+        self._csv.writerow(row)
+
+    def sync(self):
+        """
+        Flush everything written so far to disk
+
+        Returns:
+            int: File size, which is where a resumed run continues
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class Checkpoint:
+    """
+    Progress of a bulk run, saved atomically next to the output
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+
+    def load(self):
+        with open(self.path) as f:
+            self.state = json.load(f)
+        return self.state
+
+    def save(self, **state):
+        self.state.update(state)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def _put(out_queue, item, stop):
+    """
+    Queue an item unless the consumer has stopped
+
+    Returns:
+        bool: True if the item was queued
+    """
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _produce(predictor, root, batches, out_queue, stop):
+    """
+    Producer thread: preprocess batches in order and hand them to the consumer
+    """
+    try:
+        for paths in batches:
+            full_paths = [os.path.join(root, path) for path in paths]
+            item = (paths, *predictor.preprocess_many(full_paths))
+            if not _put(out_queue, item, stop):
+                predictor.release_batch(item[1])
+                return
+        _put(out_queue, None, stop)
+    except Exception as e:
+        _put(out_queue, e, stop)
+
+
+def run_bulk(predictor, root, output, fmt='jsonl', batch_size=32, prefetch=2,
+             resume=False, progress_every=10.0):
+    """
+    Score every image under root
+
+    Args:
+        predictor (ChestXrayPredictor): Loaded predictor, with a
+            preprocess_executor for parallel decoding
+        root (str): Directory tree to scan
+        output (str): Results file
+        fmt (str): 'jsonl' or 'csv'
+        batch_size (int): Images per forward pass
+        prefetch (int): Preprocessed batches waiting for the model
+        resume (bool): Continue from the checkpoint of an interrupted run
+        progress_every (float): Seconds between progress lines
+
+    Returns:
+        dict: Images scored, failures and throughput of this run
+    """
+    checkpoint = Checkpoint(output + '.checkpoint')
+    settings = {
+        'root': os.path.abspath(root),
+        'format': fmt,
+        'model_path': os.path.abspath(predictor.model_path)
+    }
+
+    done = 0
+    failed = 0
+    paths = iter_images(root)
+    if resume:
+        if not os.path.exists(checkpoint.path):
+            raise CheckpointError(f"No checkpoint at {checkpoint.path}; start without --resume")
+        state = checkpoint.load()
+        for key, value in settings.items():
+            if state.get(key) != value:
+                raise CheckpointError(
+                    f"Checkpoint was written with {key}={state.get(key)}, this run uses {value}"
+                )
+        if state.get('complete'):
+            print(f"✅ {output} is already complete ({state['done']} images)")
+            return {'images': 0, 'total_images': state['done'], 'failed': state['failed'],
+                    'seconds': 0.0, 'images_per_second': 0.0}
+
+        done, failed = state['done'], state['failed']
+        # Drop anything written after the last checkpoint, then skip what is done
+        with open(output, 'r+b') as f:
+            f.truncate(state['output_bytes'])
+        last_path = None
+        for _ in range(done):
+            last_path = next(paths, None)
+        if last_path != state['last_path']:
+            raise CheckpointError(
+                f"The image tree changed since the checkpoint: image {done} is "
+                f"{last_path}, expected {state['last_path']}"
+            )
+        print(f"↩️  Resuming after {done} images ({state['last_path']})")
+
+    writer = ResultWriter(output, fmt, list(predictor.class_labels.values()), append=resume)
+    if not resume:
+        # output_bytes keeps the CSV header
+        checkpoint.save(**settings, done=0, failed=0, last_path=None,
+                        output_bytes=writer.sync(), complete=False)
+    batches = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce, args=(predictor, root, iter_batches(paths, batch_size), batches, stop),
+        name='bulk-preprocess', daemon=True
+    )
+
+    started = time.perf_counter()
+    last_report = started
+    scored = 0
+    producer.start()
+    try:
+        while True:
+            item = batches.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            batch_paths, batch, valid_indices, errors = item
+            results = [None] * len(batch_paths)
+            for index, error in errors.items():
+                results[index] = {'success': False, 'error': f'Failed to preprocess image: {error}'}
+
+            try:
+                if valid_indices:
+                    for index, result in zip(valid_indices, predictor.predict_arrays(batch)):
+                        results[index] = result
+            except Exception as e:
+                for index in valid_indices:
+                    results[index] = {'success': False, 'error': f'Prediction failed: {str(e)}'}
+            finally:
+                predictor.release_batch(batch)
+
+            for path, result in zip(batch_paths, results):
+                writer.write(path, result)
+                failed += not result['success']
+            done += len(batch_paths)
+            scored += len(batch_paths)
+            checkpoint.save(done=done, failed=failed, last_path=batch_paths[-1],
+                            output_bytes=writer.sync())
+
+            now = time.perf_counter()
+            if now - last_report >= progress_every:
+                print(f"📈 {done} images ({scored / (now - started):.1f}/s, {failed} failed)")
+                last_report = now
+
+        checkpoint.save(complete=True)
+    finally:
+        stop.set()
+        writer.close()
+        producer.join(timeout=5)
+
+    seconds = time.perf_counter() - started
+    return {
+        'images': scored,
+        'total_images': done,
+        'failed': failed,
+        'seconds': seconds,
+        'images_per_second': scored / seconds if seconds else 0.0
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a directory tree of X-rays')
+    parser.add_argument('root', help='Directory to scan (recursively)')
+    parser.add_argument('--output', required=True, help='Results file (.jsonl or .csv)')
+    parser.add_argument('--format', choices=FORMATS,
+                        help='Output format (default: from the output extension)')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted run')
+    parser.add_argument('--overwrite', action='store_true', help='Start over if output exists')
+    parser.add_argument('--batch-size', type=int, default=int(os.environ.get('PREDICT_BATCH_SIZE', 32)))
+    parser.add_argument('--prefetch', type=int, default=2,
+                        help='Preprocessed batches waiting for the model')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Decode/preprocess threads or processes')
+    parser.add_argument('--processes', action='store_true',
+                        help='Preprocess in worker processes (shared-memory batches)')
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    if os.path.exists(args.output) and not (args.resume or args.overwrite):
+        sys.exit(f"❌ {args.output} exists; pass --resume to continue it or --overwrite to start over")
+
+    from model import predictor
+    from parallel import PreprocessPool
+    from shm_pool import SharedMemoryPreprocessPool
+
+    # Pool before the model: forked workers must not inherit TensorFlow
+    if args.processes:
+        pool = SharedMemoryPreprocessPool.from_engine(
+            predictor.preprocessor, processes=args.workers,
+            max_pending=args.batch_size, buffer_capacity=args.batch_size
+        )
+        pool.warmup()
+    else:
+        pool = PreprocessPool(max_workers=args.workers, max_pending=args.batch_size)
+    predictor.preprocess_executor = pool
+
+    if not predictor.ensure_loaded():
+        sys.exit(f"❌ Model not available: {predictor.load_error or predictor.state}")
+
+    try:
+        summary = run_bulk(predictor, args.root, args.output, fmt=fmt,
+                           batch_size=args.batch_size, prefetch=args.prefetch,
+                           resume=args.resume)
+    except KeyboardInterrupt:
+        sys.exit(f"\n⏸️  Interrupted; run again with --resume to continue {args.output}")
+    except CheckpointError as e:
+        sys.exit(f"❌ {e}")
+    finally:
+        pool.shutdown()
+
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,349 @@
+"""
+Prediction Cache Module
+Content-addressed cache of prediction results with LRU and TTL eviction
+"""
+
+import atexit
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def hash_bytes(data):
+    """
+    Calculate the SHA-256 digest of uploaded bytes
+
+    Args:
+        data (bytes): Raw file contents
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(filepath, chunk_size=1024 * 1024):
+    """
+    Calculate the SHA-256 digest of a file without reading it all at once
+
+    Args:
+        filepath (str): Path to the file
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: Hex digest
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class PredictionCache:
+    """
+    Bounded cache of prediction results keyed by image content and model
+
+    Keys combine the hash of the uploaded bytes with a fingerprint of the
+    model file (and the cascade's first-stage model, if any) and of the
+    settings that change results (preprocessing, inference backend, cascade
+    threshold), and the whole cache is dropped as soon as a model file on
+    disk changes.
+    """
+
+    def __init__(self, model_path, max_entries=1024, max_bytes=16 * 1024 * 1024,
+                 ttl_seconds=3600, persist_path=None, persist_every=20, settings=None,
+                 cascade_model_path=None):
+        """
+        Initialize the cache
+
+        Args:
+            model_path (str): Model file whose content fingerprints the entries
+            max_entries (int): Most results kept in memory
+            max_bytes (int): Approximate memory budget for stored results
+            ttl_seconds (float): Lifetime of an entry, 0 to disable expiry
+            persist_path (str): JSON file used to keep entries across restarts
+            persist_every (int): Save to disk after this many new entries
+            settings (dict): JSON-serializable settings that change prediction
+                results; entries made under other settings are never returned
+            cascade_model_path (str): First-stage model of a cascade, fingerprinted
+                together with model_path
+        """
+        self.model_path = model_path
+        self.cascade_model_path = cascade_model_path or None
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl_seconds = float(ttl_seconds)
+        self.persist_path = persist_path or None
+        self.persist_every = max(1, int(persist_every))
+        self.settings_hash = hashlib.sha256(
+            json.dumps(settings or {}, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:8]
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (created_at, size, result)
+        self._bytes = 0
+        self._unsaved = 0
+
+        self._model_signature = None
+        self._fingerprint = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        if self.persist_path:
+            self._load()
+            atexit.register(self.save)
+
+    def _stat_model(self):
+        """
+        Cheap signature of the model files used to detect changes
+
+        Returns:
+            tuple: (size, mtime in ns) per model file, None for a missing one
+        """
+        signature = []
+        for path in (self.model_path, self.cascade_model_path):
+            if path is None:
+                continue
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _check_model(self):
+        """
+        Recompute the fingerprint and drop all entries if the model changed
+
+        Must be called with the lock held.
+        """
+        signature = self._stat_model()
+        if signature == self._model_signature:
+            return
+
+        fingerprint = hash_file(self.model_path) if signature[0] is not None else 'no-model'
+        if self.cascade_model_path is not None:
+            cascade = hash_file(self.cascade_model_path) if signature[1] is not None else 'no-model'
+            fingerprint = hashlib.sha256(f'{fingerprint}:{cascade}'.encode('utf-8')).hexdigest()
+        if self._fingerprint is not None and fingerprint != self._fingerprint:
+            if self._entries:
+                print("♻️  Model file changed, dropping cached predictions")
+            self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+        self._model_signature = signature
+        self._fingerprint = fingerprint
+
+    @property
+    def fingerprint(self):
+        """
+        Content hash of the current model file(s)
+        """
+        with self._lock:
+            self._check_model()
+            return self._fingerprint
+
+    def make_key(self, digest):
+        """
+        Build a cache key from the hash of the uploaded bytes
+
+        Args:
+            digest (str): SHA-256 hex digest of the image bytes
+
+        Returns:
+            str: Cache key bound to the current model and settings
+        """
+        return f"{self.fingerprint[:16]}:{self.settings_hash}:{digest}"
+
+    def _is_expired(self, created_at, now):
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """
+        Look up a cached prediction
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            dict: Copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            self._check_model()
+            entry = self._entries.get(key)
+
+            if entry is None or not key.startswith(self._fingerprint[:16]):
+                self.misses += 1
+                return None
+
+            if self._is_expired(entry[0], time.time()):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+    def put(self, key, result):
+        """
+        Store a successful prediction
+
+        Args:
+            key (str): Key from make_key
+            result (dict): Prediction result
+        """
+        if not result.get('success'):
+            return
+
+        result = copy.deepcopy(result)
+        result.pop('filename', None)
+        size = len(json.dumps(result))
+
+        with self._lock:
+            self._check_model()
+            if not key.startswith(self._fingerprint[:16]):
+                return
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.time(), size, result)
+            self._bytes += size
+            self._evict()
+            self._unsaved += 1
+            should_save = self.persist_path and self._unsaved >= self.persist_every
+
+        if should_save:
+            self.save()
+
+    def _evict(self):
+        """
+        Drop expired entries, then least recently used ones until within budget
+
+        Must be called with the lock held.
+        """
+        now = time.time()
+        for key in [k for k, entry in self._entries.items() if self._is_expired(entry[0], now)]:
+            self._remove(key)
+            self.expirations += 1
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Remove all cached predictions
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._unsaved += 1
+
+    def save(self):
+        """
+        Write the cache to persist_path atomically
+        """
+        if not self.persist_path:
+            return
+
+        with self._lock:
+            snapshot = {
+                'fingerprint': self._fingerprint,
+                'settings': self.settings_hash,
+                'entries': [
+                    [key, created_at, result]
+                    for key, (created_at, _, result) in self._entries.items()
+                ]
+            }
+            self._unsaved = 0
+
+        try:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Every gunicorn worker saves to the same path
+            tmp_path = f"{self.persist_path}.tmp{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            print(f"⚠️  Could not save prediction cache: {str(e)}")
+
+    def _load(self):
+        """
+        Restore entries saved by a previous run, skipping ones that were
+        made with a different model or settings or have expired
+        """
+        if not os.path.exists(self.persist_path):
+            return
+
+        try:
+            with open(self.persist_path) as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Could not read prediction cache: {str(e)}")
+            return
+
+        with self._lock:
+            self._check_model()
+            if snapshot.get('fingerprint') != self._fingerprint:
+                print("♻️  Saved prediction cache belongs to another model, ignoring it")
+                return
+            if snapshot.get('settings') != self.settings_hash:
+                print("♻️  Saved prediction cache was made with other settings, ignoring it")
+                return
+
+            now = time.time()
+            for key, created_at, result in snapshot.get('entries', []):
+                if self._is_expired(created_at, now):
+                    continue
+                size = len(json.dumps(result))
+                self._entries[key] = (created_at, size, result)
+                self._bytes += size
+            self._evict()
+
+        print(f"💾 Restored {len(self._entries)} cached predictions")
+
+    def get_stats(self):
+        """
+        Get cache counters and usage
+
+        Returns:
+            dict: Hit/miss/eviction counters and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'persistent': self.persist_path is not None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'model_fingerprint': self._fingerprint[:16] if self._fingerprint else None
+            }
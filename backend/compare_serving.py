@@ -0,0 +1,232 @@
+"""
+Serving Mode Comparison
+Load-tests the Flask server (app.py) and the ASGI server (asgi_app.py) with
+the same mix of traffic: clients that trickle large uploads slowly, alongside
+clients sending normal /api/predict requests back to back
+
+Usage: python compare_serving.py [--slow-clients 32] [--fast-clients 8]
+                                 [--duration 20] [--modes flask,asgi]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+from PIL import Image
+
+
+SERVER_COMMANDS = {
+    'flask': [sys.executable, '-c',
+              "import sys; from app import app; "
+              "app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)"],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1',
+             '--log-level', 'warning', '--port']
+}
+
+
+def make_png(size, seed):
+    """
+    Random grayscale PNG; noise does not compress, so size controls the upload size
+    """
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def multipart_body(field, filename, data, boundary='comparebenchboundary'):
+    """
+    Build a multipart/form-data body with one file part
+
+    Returns:
+        tuple: (body bytes, content type header)
+    """
+    return multipart_files(field, [(filename, data)], boundary)
+
+
+def multipart_files(field, files, boundary='comparebenchboundary'):
+    """
+    Build a multipart/form-data body with one part per (filename, data) pair
+
+    Returns:
+        tuple: (body bytes, content type header)
+    """
+    body = b''.join(
+        (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: image/png\r\n\r\n'
+        ).encode() + data + b'\r\n'
+        for filename, data in files
+    ) + f'--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+async def post_upload(port, body, content_type, send_seconds=0.0, chunks=1,
+                      path='/api/predict', host='127.0.0.1'):
+    """
+    POST an upload over a raw connection, optionally trickling the body
+
+    Args:
+        port (int): Server port
+        body (bytes): Request body
+        content_type (str): Content-Type header
+        send_seconds (float): Spread sending the body over this long
+        chunks (int): Number of pieces the body is sent in
+        path (str): Endpoint
+        host (str): Server address
+
+    Returns:
+        tuple: (HTTP status or None on connection failure, seconds taken)
+    """
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write((
+            f'POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+            f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'
+        ).encode())
+
+        piece = -(-len(body) // chunks)
+        for offset in range(0, len(body), piece):
+            writer.write(body[offset:offset + piece])
+            await writer.drain()
+            if send_seconds:
+                await asyncio.sleep(send_seconds / chunks)
+
+        status_line = await reader.readline()
+        await reader.read()
+        writer.close()
+        status = int(status_line.split()[1])
+    except (OSError, ValueError, IndexError):
+        status = None
+    return status, time.perf_counter() - start
+
+
+def summarize(samples):
+    """
+    Latency percentiles and status counts for a list of (status, seconds)
+    """
+    latencies = np.array([seconds for _, seconds in samples]) * 1000.0
+    statuses = {}
+    for status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    summary = {'requests': len(samples), 'statuses': statuses}
+    if len(latencies):
+        summary.update({
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'max_ms': float(latencies.max())
+        })
+    return summary
+
+
+async def run_load(port, slow_clients, fast_clients, duration, slow_seconds):
+    """
+    Run slow uploaders and fast clients against one server
+
+    Returns:
+        dict: Fast-client latency and throughput, slow-client completion
+    """
+    fast_body, content_type = multipart_body('file', 'fast.png', make_png(256, 0))
+    slow_body, _ = multipart_body('file', 'slow.png', make_png(1024, 1))
+
+    deadline = time.perf_counter() + duration
+    fast_samples = []
+
+    async def fast_client():
+        while time.perf_counter() < deadline:
+            fast_samples.append(await post_upload(port, fast_body, content_type))
+
+    async def slow_client():
+        return await post_upload(port, slow_body, content_type,
+                                 send_seconds=slow_seconds, chunks=50)
+
+    start = time.perf_counter()
+    slow_tasks = [asyncio.create_task(slow_client()) for _ in range(slow_clients)]
+    await asyncio.gather(*(fast_client() for _ in range(fast_clients)))
+    slow_samples = await asyncio.gather(*slow_tasks)
+    elapsed = time.perf_counter() - start
+
+    fast = summarize(fast_samples)
+    fast['throughput_rps'] = len(fast_samples) / elapsed
+    return {'fast_clients': fast, 'slow_clients': summarize(slow_samples)}
+
+
+def wait_until_ready(port, timeout=180, host='127.0.0.1'):
+    """
+    Poll /api/ready until the model is loaded
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://{host}:{port}/api/ready', timeout=2):
+                return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    return False
+
+
+def compare(modes, port, slow_clients, fast_clients, duration, slow_seconds):
+    """
+    Start each server in turn and run the same load against it
+
+    Returns:
+        dict: Load results per serving mode
+    """
+    # Identical uploads would be answered from the prediction cache
+    env = dict(os.environ, CACHE_ENABLED='0', MODEL_LOAD_MODE='eager', TF_CPP_MIN_LOG_LEVEL='3')
+    report = {
+        'slow_clients': slow_clients,
+        'slow_upload_seconds': slow_seconds,
+        'fast_clients': fast_clients,
+        'duration_s': duration,
+        'modes': {}
+    }
+
+    for mode in modes:
+        server = subprocess.Popen(
+            SERVER_COMMANDS[mode] + [str(port)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            if not wait_until_ready(port):
+                report['modes'][mode] = {'error': 'server did not become ready'}
+                continue
+            print(f"⏱️  Load testing {mode}...")
+            report['modes'][mode] = asyncio.run(
+                run_load(port, slow_clients, fast_clients, duration, slow_seconds)
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare Flask and ASGI serving')
+    parser.add_argument('--modes', default='flask,asgi')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--slow-clients', type=int, default=32)
+    parser.add_argument('--slow-seconds', type=float, default=10.0,
+                        help='Time each slow client takes to send its upload')
+    parser.add_argument('--fast-clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args()
+
+    print(json.dumps(compare(
+        args.modes.split(','), args.port, args.slow_clients, args.fast_clients,
+        args.duration, args.slow_seconds
+    ), indent=2))
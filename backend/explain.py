@@ -0,0 +1,183 @@
+"""
+Grad-CAM Explanation Module
+Class-activation heatmaps computed in the same forward pass as the prediction
+
+The model is split at its last convolutional output. One pass runs the
+convolutional part, watches its activations, finishes the prediction with the
+head layers and differentiates the target class score back to the
+activations. The prediction therefore costs no extra forward pass, and the
+gradients of a whole batch are computed together.
+
+Importing this module needs neither TensorFlow nor OpenCV: both are loaded
+when first used, and heatmaps are rendered with PIL without OpenCV.
+"""
+
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+
+class ExplanationUnavailable(Exception):
+    """
+    Raised when heatmaps cannot be computed for the served model
+    """
+    pass
+
+
+class GradCamExplainer:
+    """
+    Grad-CAM for a Keras model whose last convolutional output feeds a simple
+    chain of head layers (pooling, dropout, dense), as in transfer-learning
+    classifiers built on ResNet50
+    """
+
+    def __init__(self, model, img_size=224):
+        """
+        Initialize the explainer and trace its gradient function
+
+        Args:
+            model: Loaded Keras model
+            img_size (int): Model input height and width
+        """
+        import tensorflow as tf
+
+        self.model = model
+        self.img_size = img_size
+
+        layers = [
+            layer for layer in model.layers
+            if type(layer).__name__ != 'InputLayer'
+        ]
+        conv_index = None
+        for index, layer in enumerate(layers):
+            if len(layer.output.shape) == 4:
+                conv_index = index
+        if conv_index is None:
+            raise ExplanationUnavailable('The model has no convolutional feature map to explain')
+
+        # A nested base model (e.g. ResNet50 as one layer) counts as one layer here,
+        # so its output is the last convolutional block
+        self.layer_name = layers[conv_index].name
+        inputs = model.inputs[0] if len(model.inputs) == 1 else model.inputs
+        self._features = tf.keras.Model(inputs, layers[conv_index].output)
+        self._head = layers[conv_index + 1:]
+
+        self._explain = tf.function(self._explain_graph, reduce_retracing=True)
+        self._check_head()
+
+    def _run_head(self, features):
+        output = features
+        for layer in self._head:
+            output = layer(output, training=False)
+        return output
+
+    def _check_head(self):
+        """
+        Make sure features + head reproduce the model (fails for branching heads)
+        """
+        sample = np.random.default_rng(0).random(
+            (1, self.img_size, self.img_size, 3), dtype=np.float32
+        )
+        expected = self.model(sample, training=False).numpy()
+        actual = self._run_head(self._features(sample, training=False)).numpy()
+        if actual.shape != expected.shape or not np.allclose(actual, expected, atol=1e-4):
+            raise ExplanationUnavailable(
+                f"Cannot split the model after layer '{self.layer_name}': the layers "
+                "after it are not a simple chain"
+            )
+
+    def _explain_graph(self, img_batch, class_indices):
+        import tensorflow as tf
+
+        with tf.GradientTape() as tape:
+            features = self._features(img_batch, training=False)
+            tape.watch(features)
+            probabilities = self._run_head(features)
+            # -1 explains the predicted class
+            targets = tf.where(
+                class_indices >= 0, class_indices,
+                tf.argmax(probabilities, axis=1, output_type=tf.int32)
+            )
+            scores = tf.gather(probabilities, targets, batch_dims=1)
+
+        # Images of a batch are independent, so one gradient of the summed
+        # scores gives every image its own gradient
+        gradients = tape.gradient(scores, features)
+        weights = tf.reduce_mean(gradients, axis=(1, 2))
+        cam = tf.nn.relu(tf.einsum('bhwc,bc->bhw', features, weights))
+        cam = cam / (tf.reduce_max(cam, axis=(1, 2), keepdims=True) + 1e-8)
+        return probabilities, targets, cam
+
+    def explain(self, img_batch, class_indices=None):
+        """
+        Predict and compute heatmaps for a batch
+
+        Args:
+            img_batch (numpy array): Batch of shape (N, 224, 224, 3)
+            class_indices (list): Class to explain per image; None or -1
+                entries explain the predicted class
+
+        Returns:
+            tuple: (probabilities (N, num_classes), explained class per image,
+            heatmaps (N, h, w) scaled to [0, 1] at feature-map resolution)
+        """
+        if class_indices is None:
+            class_indices = [-1] * len(img_batch)
+        class_indices = np.array(
+            [-1 if index is None else index for index in class_indices], dtype=np.int32
+        )
+
+        probabilities, targets, cam = self._explain(
+            np.ascontiguousarray(img_batch, dtype=np.float32), class_indices
+        )
+        return probabilities.numpy(), targets.numpy(), cam.numpy()
+
+
+def jet_colormap(values):
+    """
+    Blue-to-red JET colours, close to OpenCV's COLORMAP_JET
+
+    Args:
+        values (numpy array): Values in [0, 1]
+
+    Returns:
+        numpy array: uint8 RGB colours, one per value
+    """
+    x = np.asarray(values, dtype=np.float32)[..., np.newaxis] * 4.0
+    rgb = np.clip(1.5 - np.abs(x - np.array([3.0, 2.0, 1.0], dtype=np.float32)), 0.0, 1.0)
+    return np.uint8(np.round(rgb * 255))
+
+
+def render_heatmap(grid, size=224):
+    """
+    Colour a heatmap grid as a PNG for overlaying on the preprocessed image
+
+    Args:
+        grid (list or numpy array): Heatmap values in [0, 1]
+        size (int): Output width and height
+
+    Returns:
+        str: data: URL of the PNG
+    """
+    try:
+        import cv2
+    except ImportError:
+        cv2 = None
+
+    heatmap = np.asarray(grid, dtype=np.float32)
+    if cv2 is not None:
+        heatmap = cv2.resize(heatmap, (size, size), interpolation=cv2.INTER_LINEAR)
+        colored = cv2.applyColorMap(np.uint8(np.clip(heatmap, 0, 1) * 255), cv2.COLORMAP_JET)
+        ok, png = cv2.imencode('.png', colored)
+        if not ok:
+            raise ValueError('Could not encode heatmap')
+        png = png.tobytes()
+    else:
+        heatmap = np.asarray(Image.fromarray(heatmap).resize((size, size), Image.BILINEAR))
+        buffer = io.BytesIO()
+        Image.fromarray(jet_colormap(np.clip(heatmap, 0, 1))).save(buffer, 'PNG')
+        png = buffer.getvalue()
+    return 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+
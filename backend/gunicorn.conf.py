@@ -0,0 +1,67 @@
+"""
+Gunicorn configuration for pre-fork multi-worker serving
+
+Usage (from backend/): gunicorn -c gunicorn.conf.py app:app
+
+With SHARED_WEIGHTS=1 the workers share one read-only, memory-mapped copy of
+the model weights (TFLite backend, without XNNPACK) instead of each loading
+its own.
+"""
+
+import os
+import subprocess
+import sys
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 120
+
+# Every worker imports app.py and loads the model after the fork; TensorFlow
+# must not be initialized in the master the workers are forked from
+preload_app = False
+
+# A worker only accepts connections once its model is loaded
+os.environ.setdefault('MODEL_LOAD_MODE', 'eager')
+
+
+def check_shared_weights():
+    """
+    Check the settings shared weights depend on, so a misconfigured
+    deployment stops here instead of in every worker
+
+    Returns:
+        str: Why the settings cannot work, or None
+    """
+    backend = os.environ.get('INFERENCE_BACKEND', 'tflite')
+    if backend != 'tflite':
+        return (f"SHARED_WEIGHTS=1 serves the TFLite backend, but INFERENCE_BACKEND={backend}. "
+                f"Unset INFERENCE_BACKEND or set SHARED_WEIGHTS=0.")
+
+    model_path = os.environ.get('MODEL_PATH', '../models/chest_xray_model.h5')
+    if model_path.endswith('.tflite'):
+        if not os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), model_path)):
+            return f"SHARED_WEIGHTS=1 maps MODEL_PATH={model_path}, which does not exist."
+    elif os.environ.get('MODEL_CACHE', '1') != '1':
+        return ("SHARED_WEIGHTS=1 exports the .h5 to a .tflite file in the model cache, "
+                "but MODEL_CACHE=0. Enable the model cache or serve a .tflite MODEL_PATH.")
+    return None
+
+
+def on_starting(server):
+    """
+    With shared weights, check the settings and export the weights file once,
+    before any worker starts
+
+    The export runs in a child process so the master never imports TensorFlow.
+    """
+    if os.environ.get('SHARED_WEIGHTS', '0') == '1':
+        problem = check_shared_weights()
+        if problem:
+            raise SystemExit(f"❌ {problem}")
+        subprocess.run(
+            [sys.executable, 'prefork.py', 'export'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True
+        )
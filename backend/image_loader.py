@@ -0,0 +1,161 @@
+"""
+Image Loading Module
+Decodes uploaded X-rays close to the model input size instead of at native
+resolution, and records decode time and pixel buffer size per image
+"""
+
+import threading
+import time
+from collections import deque
+
+from PIL import Image
+
+
+# Bytes per band for the PIL modes we see in X-ray uploads
+_BAND_BYTES = {'I;16': 2, 'I;16L': 2, 'I;16B': 2, 'I': 4, 'F': 4}
+
+# Modes Image.reduce rejects, or where averaging neighbouring values would
+# mix palette indices, and what to convert them to first
+_REDUCE_MODES = {'1': 'L', 'P': 'RGB', 'PA': 'RGBA',
+                 'I;16': 'I', 'I;16L': 'I', 'I;16B': 'I', 'I;16N': 'I'}
+
+
+def pixel_buffer_bytes(mode, size):
+    """
+    Size of the decoded pixel buffer of an image
+
+    Args:
+        mode (str): PIL image mode
+        size (tuple): (width, height)
+
+    Returns:
+        int: Bytes needed to hold the decoded pixels
+    """
+    bands = Image.getmodebands(mode)
+    return size[0] * size[1] * bands * _BAND_BYTES.get(mode, 1)
+
+
+class LoadedImage:
+    """
+    A decoded image together with its decode statistics
+    """
+
+    __slots__ = ('image', 'source_size', 'native_bytes', 'decode_ms', 'peak_bytes', 'method')
+
+    def __init__(self, image, source_size, native_bytes, decode_ms, peak_bytes, method):
+        self.image = image
+        self.source_size = source_size
+        self.native_bytes = native_bytes
+        self.decode_ms = decode_ms
+        self.peak_bytes = peak_bytes
+        self.method = method
+
+    def to_dict(self):
+        return {
+            'source_size': list(self.source_size),
+            'decoded_size': list(self.image.size),
+            'decode_ms': self.decode_ms,
+            'peak_pixel_bytes': self.peak_bytes,
+            'method': self.method
+        }
+
+
+class ImageLoader:
+    """
+    Opens images for ChestXrayPredictor with cheap decode-time downscaling
+
+    JPEGs are decoded in draft mode, which lets libjpeg produce a 1/2, 1/4 or
+    1/8 scaled image directly. Other formats are decoded in full and then
+    shrunk with Image.reduce (box averaging) before any further processing.
+    Either way the decoded image keeps at least min_size pixels on its short
+    side, so the final resize to the model input size still has headroom.
+    """
+
+    def __init__(self, min_size=None, history=100):
+        """
+        Initialize the loader
+
+        Args:
+            min_size (int): Smallest short side to decode to; None or 0
+                decodes at native resolution
+            history (int): Per-image records kept for get_stats
+        """
+        self.min_size = int(min_size) if min_size else 0
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+        self._images = 0
+        self._total_decode_ms = 0.0
+        self._total_peak_bytes = 0
+        self._total_native_bytes = 0
+
+    def _open(self, image_file):
+        if isinstance(image_file, str):
+            return Image.open(image_file)
+        return Image.open(getattr(image_file, 'stream', image_file))
+
+    def load(self, image_file):
+        """
+        Decode one image
+
+        Args:
+            image_file: File object or file path
+
+        Returns:
+            LoadedImage: Decoded image with decode time and peak buffer size
+        """
+        start = time.perf_counter()
+        img = self._open(image_file)
+        source_size = img.size
+        native_bytes = pixel_buffer_bytes(img.mode, source_size)
+        method = 'full'
+
+        if self.min_size and min(source_size) >= 2 * self.min_size:
+            if img.format == 'JPEG':
+                img.draft(img.mode, (self.min_size, self.min_size))
+                if img.size != source_size:
+                    method = 'draft'
+
+        img.load()
+        peak_bytes = pixel_buffer_bytes(img.mode, img.size)
+
+        factor = min(img.size) // self.min_size if self.min_size else 1
+        if factor >= 2:
+            mode = _REDUCE_MODES.get(img.mode)
+            if mode == 'RGB' and 'transparency' in img.info:
+                mode = 'RGBA'
+            if mode is not None:
+                img = img.convert(mode)
+                peak_bytes += pixel_buffer_bytes(mode, img.size)
+            img = img.reduce(factor)
+            method = 'reduce' if method == 'full' else f'{method}+reduce'
+
+        decode_ms = (time.perf_counter() - start) * 1000.0
+        loaded = LoadedImage(img, source_size, native_bytes, decode_ms, peak_bytes, method)
+        self._record(loaded)
+        return loaded
+
+    def _record(self, loaded):
+        with self._lock:
+            self._images += 1
+            self._total_decode_ms += loaded.decode_ms
+            self._total_peak_bytes += loaded.peak_bytes
+            self._total_native_bytes += loaded.native_bytes
+            self._recent.append(loaded.to_dict())
+
+    def get_stats(self):
+        """
+        Get decode statistics
+
+        Returns:
+            dict: Averages over all images plus the most recent per-image records
+        """
+        with self._lock:
+            images = self._images
+            return {
+                'min_size': self.min_size,
+                'images': images,
+                'avg_decode_ms': self._total_decode_ms / images if images else 0.0,
+                'avg_peak_pixel_bytes': self._total_peak_bytes / images if images else 0.0,
+                'avg_native_pixel_bytes': self._total_native_bytes / images if images else 0.0,
+                'recent': list(self._recent)
+            }
@@ -0,0 +1,145 @@
+"""
+Low-Overhead Inference Module
+Calls the loaded Keras model through pre-traced TensorFlow functions
+instead of model.predict
+"""
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+
+class InferenceEngine:
+    """
+    Wraps a Keras model in traced functions with fixed input signatures
+
+    model.predict builds a data adapter and runs a full predict loop on every
+    call, which costs milliseconds for a single image. A concrete function
+    traced once per batch size skips all of that and runs the graph directly.
+    """
+
+    def __init__(self, model, batch_sizes=(1, 8, 32), img_size=224):
+        """
+        Initialize the engine and trace one function per batch size
+
+        Args:
+            model: Loaded Keras model
+            batch_sizes (tuple): Batch sizes that get a fixed-shape signature
+            img_size (int): Model input height and width
+        """
+        self.model = model
+        self.img_size = img_size
+        self.batch_sizes = tuple(sorted(set(int(size) for size in batch_sizes if int(size) > 0)))
+        self.parity = None
+
+        self._fixed = {
+            size: self._trace(size)
+            for size in self.batch_sizes
+        }
+        # Any other batch size goes through one dynamic-batch signature
+        self._dynamic = self._trace(None)
+
+    def _trace(self, batch_size):
+        """
+        Trace the model call for one input signature
+
+        Args:
+            batch_size (int): Fixed batch size, or None for a dynamic batch
+
+        Returns:
+            ConcreteFunction: Callable graph for that signature
+        """
+        spec = tf.TensorSpec(
+            shape=(batch_size, self.img_size, self.img_size, 3),
+            dtype=tf.float32
+        )
+
+        @tf.function(input_signature=[spec])
+        def serve(images):
+            return self.model(images, training=False)
+
+        return serve.get_concrete_function()
+
+    def run(self, img_batch):
+        """
+        Run a forward pass
+
+        Args:
+            img_batch (numpy array): Batch of shape (N, 224, 224, 3)
+
+        Returns:
+            numpy array: Class probabilities of shape (N, num_classes)
+        """
+        img_batch = np.asarray(img_batch, dtype=np.float32)
+        function = self._fixed.get(img_batch.shape[0], self._dynamic)
+        return function(tf.constant(img_batch)).numpy()
+
+    def warmup(self):
+        """
+        Execute every traced signature once so the first real request
+        does not pay for graph optimization
+
+        Returns:
+            float: Warmup time in seconds
+        """
+        start = time.perf_counter()
+
+        for size in self.batch_sizes:
+            self.run(np.zeros((size, self.img_size, self.img_size, 3), dtype=np.float32))
+
+        # Exercise the dynamic signature with a size that has no fixed trace
+        dynamic_size = max(self.batch_sizes, default=0) + 1
+        self.run(np.zeros((dynamic_size, self.img_size, self.img_size, 3), dtype=np.float32))
+
+        return time.perf_counter() - start
+
+    def check_parity(self, samples_per_size=2, atol=1e-5, seed=0):
+        """
+        Compare the traced path against model.predict on random inputs
+
+        Args:
+            samples_per_size (int): Random images per batch size checked
+            atol (float): Largest allowed absolute probability difference
+            seed (int): Random seed so reports are reproducible
+
+        Returns:
+            dict: Parity report with the largest difference and top-1 agreement
+        """
+        rng = np.random.default_rng(seed)
+        max_abs_diff = 0.0
+        compared = 0
+        top1_matches = 0
+
+        for size in self.batch_sizes + (max(self.batch_sizes, default=0) + 1,):
+            for _ in range(samples_per_size):
+                batch = rng.random((size, self.img_size, self.img_size, 3), dtype=np.float32)
+
+                expected = self.model.predict(batch, verbose=0)
+                actual = self.run(batch)
+
+                max_abs_diff = max(max_abs_diff, float(np.max(np.abs(expected - actual))))
+                top1_matches += int(np.sum(np.argmax(expected, axis=1) == np.argmax(actual, axis=1)))
+                compared += size
+
+        self.parity = {
+            'passed': max_abs_diff <= atol and top1_matches == compared,
+            'max_abs_diff': max_abs_diff,
+            'tolerance': atol,
+            'images_compared': compared,
+            'top1_agreement': top1_matches / compared if compared else 1.0
+        }
+        return self.parity
+
+    def describe(self):
+        """
+        Get information about the engine
+
+        Returns:
+            dict: Traced batch sizes and the latest parity report
+        """
+        return {
+            'type': 'traced_function',
+            'batch_sizes': list(self.batch_sizes),
+            'parity': self.parity
+        }
@@ -0,0 +1,136 @@
+"""
+Upload Ingest Module
+Receives uploaded images into spooled in-memory buffers instead of
+saving them to the uploads folder and reopening them
+"""
+
+import hashlib
+import tempfile
+
+from flask import Request
+from werkzeug.utils import secure_filename
+
+
+def make_request_class(spool_threshold, spill_dir=None):
+    """
+    Build a Flask request class whose file uploads are parsed straight into
+    spooled buffers
+
+    Werkzeug writes every part larger than 500KB to a temporary file on disk.
+    With this request class a part stays in memory until it grows beyond
+    spool_threshold bytes and only then spills to spill_dir.
+
+    Args:
+        spool_threshold (int): Bytes kept in memory per uploaded file
+        spill_dir (str): Directory used for files larger than the threshold
+
+    Returns:
+        type: Request subclass to assign to app.request_class
+    """
+
+    class SpooledRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type,
+                             filename=None, content_length=None):
+            return tempfile.SpooledTemporaryFile(
+                max_size=spool_threshold, mode='w+b', dir=spill_dir
+            )
+
+    return SpooledRequest
+
+
+class IngestedUpload:
+    """
+    One uploaded image, ready to be decoded from its buffer
+    """
+
+    def __init__(self, filename, stream=None, digest=None, size=0, error=None):
+        """
+        Args:
+            filename (str): Sanitized client filename
+            stream: Seekable buffer positioned at the start of the image bytes
+            digest (str): SHA-256 hex digest of the image bytes
+            size (int): Image size in bytes
+            error (str): Reason the upload was rejected, if any
+        """
+        self.filename = filename
+        self.stream = stream
+        self.digest = digest
+        self.size = size
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def rewind(self):
+        """
+        Position the buffer at the start so the image can be decoded again
+        """
+        if self.stream is not None:
+            self.stream.seek(0)
+        return self.stream
+
+    def close(self):
+        """
+        Release the buffer (and its spill file, if any)
+        """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+def ingest_upload(file, allowed_file, chunk_size=64 * 1024):
+    """
+    Validate one uploaded file and hash its bytes in place
+
+    Args:
+        file (FileStorage): Uploaded file from request.files
+        allowed_file (callable): Returns True for accepted filenames
+        chunk_size (int): Bytes hashed per read
+
+    Returns:
+        IngestedUpload: Upload with digest, or with an error if rejected
+    """
+    if not allowed_file(file.filename):
+        return IngestedUpload(
+            file.filename,
+            error='Invalid file type. Only PNG, JPG, and JPEG are allowed.'
+        )
+
+    stream = file.stream
+    stream.seek(0)
+
+    sha256 = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        sha256.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+
+    if size == 0:
+        return IngestedUpload(secure_filename(file.filename), error='Empty file')
+
+    return IngestedUpload(
+        secure_filename(file.filename),
+        stream=stream,
+        digest=sha256.hexdigest(),
+        size=size
+    )
+
+
+def ingest_files(files, allowed_file):
+    """
+    Ingest all files of one form field
+
+    Args:
+        files (list): FileStorage objects from request.files.getlist
+        allowed_file (callable): Returns True for accepted filenames
+
+    Returns:
+        list: IngestedUpload per non-empty file part, in request order
+    """
+    return [
+        ingest_upload(file, allowed_file)
+        for file in files
+        if file and file.filename != ''
+    ]
@@ -0,0 +1,376 @@
+"""
+Asynchronous Job Module
+Batch predictions that run in the background while clients poll for progress
+
+Submitting a job stores its uploaded images in a job directory and returns at
+once. A runner thread predicts them chunk by chunk and appends each result to
+the job's results file, so finished results can be fetched while the rest are
+still running. Jobs are deleted when they expire.
+
+Job directory layout:
+    job.json        State, progress and expiry (replaced atomically)
+    items.json      Filename, content digest or upload error per image
+    inputs/<n>      Uploaded image n, removed when the job finishes
+    results.jsonl   One result per finished image, in input order
+"""
+
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+
+from metrics import JOBS_FINISHED
+
+
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+
+
+class JobNotFound(Exception):
+    """
+    Raised for unknown, deleted or expired job ids
+    """
+    pass
+
+
+class JobQueueFullError(Exception):
+    """
+    Raised when too many jobs are waiting to run
+    """
+    pass
+
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """
+    Job state, inputs and results on local disk
+
+    Every server process (and gunicorn worker) on the host can read any
+    job; only the process that accepted a job runs it.
+    """
+
+    def __init__(self, root, ttl_seconds=86400):
+        """
+        Args:
+            root (str): Directory holding one subdirectory per job
+            ttl_seconds (float): How long a job is kept after it was submitted,
+                and again after it finished
+        """
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, job_id, *parts):
+        # Ids are uuid4 hex; anything else could point outside root
+        if len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+            raise JobNotFound(job_id)
+        return os.path.join(self.root, job_id, *parts)
+
+    def create(self, uploads):
+        """
+        Store the uploads of a new job
+
+        Args:
+            uploads (list): IngestedUpload per file; rejected uploads are kept
+                as items with their error
+
+        Returns:
+            dict: Job state
+        """
+        job_id = uuid.uuid4().hex
+        inputs_dir = self._path(job_id, 'inputs')
+        os.makedirs(inputs_dir)
+
+        items = []
+        for index, upload in enumerate(uploads):
+            if upload.ok:
+                with open(os.path.join(inputs_dir, str(index)), 'wb') as f:
+                    shutil.copyfileobj(upload.rewind(), f)
+            items.append({'filename': upload.filename, 'digest': upload.digest,
+                          'error': upload.error})
+        _write_json(self._path(job_id, 'items.json'), items)
+        open(self._path(job_id, 'results.jsonl'), 'wb').close()
+
+        now = time.time()
+        job = {
+            'id': job_id,
+            'state': 'queued',
+            'total': len(items),
+            'completed': 0,
+            'failed': 0,
+            'error': None,
+            'created': now,
+            'started': None,
+            'finished': None,
+            'expires': now + self.ttl_seconds,
+            'pid': os.getpid(),
+            'results_bytes': 0
+        }
+        self.save(job)
+        return job
+
+    def save(self, job):
+        _write_json(self._path(job['id'], 'job.json'), job)
+
+    def load(self, job_id):
+        """
+        Returns:
+            dict: Job state; a job whose process died while it was queued or
+            running is reported as failed
+        """
+        try:
+            with open(self._path(job_id, 'job.json')) as f:
+                job = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise JobNotFound(job_id)
+
+        if job['expires'] <= time.time():
+            self.delete(job_id)
+            raise JobNotFound(job_id)
+        if job['state'] in ('queued', 'running') and not _process_alive(job['pid']):
+            job['state'] = 'failed'
+            job['error'] = 'Interrupted by a server restart; submit the job again'
+        return job
+
+    def load_items(self, job_id):
+        with open(self._path(job_id, 'items.json')) as f:
+            return json.load(f)
+
+    def input_path(self, job_id, index):
+        return self._path(job_id, 'inputs', str(index))
+
+    def remove_inputs(self, job_id):
+        shutil.rmtree(self._path(job_id, 'inputs'), ignore_errors=True)
+
+    def append_results(self, job, results):
+        """
+        Append finished results and record how far the results file is valid
+        """
+        with open(self._path(job['id'], 'results.jsonl'), 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+            f.flush()
+            job['results_bytes'] = f.tell()
+
+    def read_results(self, job, offset=0, limit=None):
+        """
+        Results finished so far; a negative offset or a limit below 1 is a ValueError
+
+        Args:
+            job (dict): Job state from load(); results past its progress are ignored
+            offset (int): Index of the first result
+            limit (int): Most results returned, None for all
+
+        Returns:
+            list: Result dicts
+        """
+        # Negative values would count from the end, as in a slice
+        if offset < 0 or (limit is not None and limit < 1):
+            raise ValueError(f'Invalid results range: offset={offset}, limit={limit}')
+        with open(self._path(job['id'], 'results.jsonl'), 'rb') as f:
+            data = f.read(job['results_bytes'])
+        lines = data.splitlines()[offset:]
+        if limit is not None:
+            lines = lines[:limit]
+        return [json.loads(line) for line in lines]
+
+    def delete(self, job_id):
+        shutil.rmtree(self._path(job_id), ignore_errors=True)
+
+    def purge_expired(self):
+        """
+        Delete expired jobs
+
+        Returns:
+            int: Jobs deleted
+        """
+        purged = 0
+        now = time.time()
+        for job_id in os.listdir(self.root):
+            try:
+                with open(self._path(job_id, 'job.json')) as f:
+                    expires = json.load(f)['expires']
+            except (JobNotFound, OSError, ValueError, KeyError):
+                continue
+            if expires <= now:
+                self.delete(job_id)
+                purged += 1
+        return purged
+
+
+class JobRunner:
+    """
+    Runs queued jobs one at a time on a background thread
+    """
+
+    def __init__(self, store, predict_fn, chunk_size=32, max_queued=16, sweep_interval=300):
+        """
+        Args:
+            store (JobStore): Where jobs live
+            predict_fn (callable): Takes a list of (image path, content digest)
+                and returns one result dict per image, in order
+            chunk_size (int): Images predicted between progress updates
+            max_queued (int): Jobs waiting to run before submissions are refused
+            sweep_interval (float): Seconds between deletions of expired jobs
+        """
+        self.store = store
+        self.predict_fn = predict_fn
+        self.chunk_size = max(1, int(chunk_size))
+        self.max_queued = max(1, int(max_queued))
+        self.sweep_interval = sweep_interval
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the background worker thread if it is not running yet
+        """
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='job-runner', daemon=True)
+                self._worker.start()
+
+    def queued(self):
+        """
+        Jobs waiting to run in this process
+        """
+        return self._queue.qsize()
+
+    def submit(self, uploads):
+        """
+        Store a new job and queue it
+
+        Args:
+            uploads (list): IngestedUpload per file
+
+        Returns:
+            dict: Job state
+        """
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFullError(f'Job queue is full ({self.max_queued} jobs waiting)')
+        self.start()
+
+        job = self.store.create(uploads)
+        self._queue.put(job['id'])
+        return job
+
+    def _run(self):
+        last_sweep = 0.0
+        while True:
+            if time.monotonic() - last_sweep >= self.sweep_interval:
+                purged = self.store.purge_expired()
+                if purged:
+                    print(f"🧹 Deleted {purged} expired job(s)")
+                last_sweep = time.monotonic()
+
+            try:
+                job_id = self._queue.get(timeout=self.sweep_interval)
+            except queue.Empty:
+                continue
+
+            try:
+                self._process(job_id)
+            except JobNotFound:
+                pass  # Deleted (cancelled) or expired while it ran
+            except Exception as e:
+                print(f"❌ Job {job_id} failed: {e}")
+                try:
+                    job = self.store.load(job_id)
+                    self._finish(job, 'failed', error=str(e))
+                except JobNotFound:
+                    pass
+
+    def _process(self, job_id):
+        job = self.store.load(job_id)
+        items = self.store.load_items(job_id)
+        job['state'] = 'running'
+        job['started'] = time.time()
+        self.store.save(job)
+
+        for start in range(0, len(items), self.chunk_size):
+            chunk = list(enumerate(items[start:start + self.chunk_size], start))
+            results = [None] * len(chunk)
+            pending = []
+            for position, (index, item) in enumerate(chunk):
+                if item['error'] is not None:
+                    results[position] = {'success': False, 'error': item['error']}
+                else:
+                    pending.append(position)
+
+            try:
+                predictions = self.predict_fn([
+                    (self.store.input_path(job_id, chunk[position][0]), chunk[position][1]['digest'])
+                    for position in pending
+                ])
+            except FileNotFoundError:
+                raise JobNotFound(job_id)
+            for position, prediction in zip(pending, predictions):
+                results[position] = prediction
+
+            for (index, item), result in zip(chunk, results):
+                result['index'] = index
+                result['filename'] = item['filename']
+
+            # Stop if the job was deleted meanwhile
+            self.store.load(job_id)
+            self.store.append_results(job, results)
+            job['completed'] += len(results)
+            job['failed'] += sum(1 for result in results if not result['success'])
+            self.store.save(job)
+
+        self._finish(job, 'done')
+
+    def _finish(self, job, state, error=None):
+        job['state'] = state
+        job['error'] = error
+        job['finished'] = time.time()
+        job['expires'] = job['finished'] + self.store.ttl_seconds
+        self.store.save(job)
+        self.store.remove_inputs(job['id'])
+        JOBS_FINISHED.inc(state=state)
+
+
+def job_status(job):
+    """
+    Public view of a job's state and progress
+
+    Args:
+        job (dict): Job state from JobStore.load
+
+    Returns:
+        dict: Response body for GET /api/jobs/<id>
+    """
+    return {
+        'success': True,
+        'job_id': job['id'],
+        'state': job['state'],
+        'total': job['total'],
+        'completed': job['completed'],
+        'failed': job['failed'],
+        'progress': job['completed'] / job['total'] if job['total'] else 1.0,
+        'error': job['error'],
+        'created': job['created'],
+        'started': job['started'],
+        'finished': job['finished'],
+        'expires': job['expires']
+    }
@@ -0,0 +1,304 @@
+"""
+Load Generator
+Drives /api/predict and /api/batch-predict with a configurable mix of
+endpoints and upload sizes and reports throughput, latency percentiles and
+error rates, for capacity planning and before/after comparisons
+
+Closed loop (default): --concurrency clients each send their next request as
+soon as the previous one is answered. Open loop (--rate): requests arrive as
+a Poisson process at the given rate regardless of how fast the server answers,
+with at most --concurrency in flight; arrivals beyond that are counted as
+dropped.
+
+Usage:
+    python loadtest.py --start flask --concurrency 8 --duration 30
+    python loadtest.py --url http://127.0.0.1:5000 --rate 40 --concurrency 64 \\
+        --mix predict=0.8,batch-predict=0.2 --sizes 512=0.5,1024=0.4,2048=0.1
+    python loadtest.py ... --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+from compare_serving import (
+    SERVER_COMMANDS, make_png, multipart_files, post_upload, summarize, wait_until_ready
+)
+
+
+ENDPOINTS = {
+    'predict': ('/api/predict', 'file'),
+    'batch-predict': ('/api/batch-predict', 'files')
+}
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loadtest_results')
+
+
+def parse_weights(text, cast=str):
+    """
+    Parse 'a=0.8,b=0.2' into {a: 0.8, b: 0.2}; a missing weight counts as 1
+    """
+    weights = {}
+    for item in text.split(','):
+        key, _, weight = item.partition('=')
+        weights[cast(key.strip())] = float(weight) if weight else 1.0
+    return weights
+
+
+class RequestMix:
+    """
+    Pre-built request bodies, drawn at random with the configured weights
+
+    Every size gets `distinct` different images so that, with the prediction
+    cache on, repeats still hit the cache at a realistic rate instead of
+    always or never.
+    """
+
+    def __init__(self, endpoints, sizes, batch_files=4, distinct=16, seed=0):
+        """
+        Args:
+            endpoints (dict): Endpoint name -> weight
+            sizes (dict): Image width/height in pixels -> weight
+            batch_files (int): Images per /api/batch-predict request
+            distinct (int): Different images generated per size
+            seed (int): Random seed
+        """
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise ValueError(f"Unknown endpoints {sorted(unknown)}, expected {list(ENDPOINTS)}")
+
+        self.rng = random.Random(seed)
+        self.endpoints = list(endpoints.items())
+        self.sizes = list(sizes.items())
+        self.batch_files = batch_files
+        self.images = {
+            size: [make_png(size, seed + size * 1000 + index) for index in range(distinct)]
+            for size in sizes
+        }
+
+    def _choose(self, weighted):
+        return self.rng.choices([key for key, _ in weighted], [weight for _, weight in weighted])[0]
+
+    def next_request(self):
+        """
+        Returns:
+            tuple: (endpoint name, path, body, content type, upload bytes)
+        """
+        endpoint = self._choose(self.endpoints)
+        path, field = ENDPOINTS[endpoint]
+        count = self.batch_files if endpoint == 'batch-predict' else 1
+
+        files = []
+        for index in range(count):
+            size = self._choose(self.sizes)
+            files.append((f'{endpoint}_{size}_{index}.png', self.rng.choice(self.images[size])))
+
+        body, content_type = multipart_files(field, files)
+        return endpoint, path, body, content_type, len(body)
+
+
+async def run_load(host, port, mix, concurrency, duration, rate=None, warmup=0.0):
+    """
+    Generate load for `warmup + duration` seconds
+
+    Args:
+        host (str): Server address
+        port (int): Server port
+        mix (RequestMix): Request generator
+        concurrency (int): Closed loop: number of clients; open loop: most
+            requests in flight
+        duration (float): Measured seconds
+        rate (float): Requests per second for open-loop arrivals; None for closed loop
+        warmup (float): Seconds of load before measuring starts
+
+    Returns:
+        tuple: (samples as (endpoint, status, seconds, upload bytes), dropped
+        arrivals, measured seconds)
+    """
+    samples = []
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+    dropped = 0
+
+    async def send():
+        endpoint, path, body, content_type, size = mix.next_request()
+        sent_at = time.perf_counter()
+        status, seconds = await post_upload(port, body, content_type, path=path, host=host)
+        if sent_at >= measure_from:
+            samples.append((endpoint, status, seconds, size))
+
+    if rate is None:
+        async def client():
+            while time.perf_counter() < deadline:
+                await send()
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    else:
+        in_flight = set()
+        next_arrival = time.perf_counter()
+        while next_arrival < deadline:
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(in_flight) < concurrency:
+                task = asyncio.create_task(send())
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            elif next_arrival >= measure_from:
+                dropped += 1
+            next_arrival += mix.rng.expovariate(rate)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    return samples, dropped, time.perf_counter() - measure_from
+
+
+def report(samples, dropped, elapsed):
+    """
+    Throughput, latency percentiles and error rates, overall and per endpoint
+    """
+    def section(rows):
+        summary = summarize([(status, seconds) for _, status, seconds, _ in rows])
+        errors = sum(1 for _, status, _, _ in rows if status != 200)
+        summary['throughput_rps'] = len(rows) / elapsed
+        summary['error_rate'] = errors / len(rows) if rows else 0.0
+        summary['avg_upload_kb'] = (
+            sum(size for *_, size in rows) / len(rows) / 1024 if rows else 0.0
+        )
+        return summary
+
+    result = {'overall': section(samples), 'endpoints': {}}
+    result['overall']['dropped'] = dropped
+    for endpoint in sorted({endpoint for endpoint, *_ in samples}):
+        result['endpoints'][endpoint] = section([row for row in samples if row[0] == endpoint])
+    return result
+
+
+def start_server(mode, port):
+    """
+    Start a local server and wait for its model
+
+    Returns:
+        Popen: Server process
+    """
+    env = dict(os.environ, MODEL_LOAD_MODE='eager', TF_CPP_MIN_LOG_LEVEL='3')
+    if mode == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+        env['GUNICORN_BIND'] = f'127.0.0.1:{port}'
+    else:
+        command = SERVER_COMMANDS[mode] + [str(port)]
+
+    server = subprocess.Popen(
+        command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    if not wait_until_ready(port):
+        server.terminate()
+        raise RuntimeError(f'{mode} server did not become ready')
+    return server
+
+
+def print_report(result, previous=None):
+    print(f"\n{'endpoint':<16}{'requests':>9}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}")
+    rows = [('overall', result['overall'])] + list(result['endpoints'].items())
+    for name, row in rows:
+        if not row['requests']:
+            continue
+        print(f"{name:<16}{row['requests']:>9}{row['throughput_rps']:>8.1f}"
+              f"{row['p50_ms']:>7.1f}ms{row['p95_ms']:>7.1f}ms{row['p99_ms']:>7.1f}ms"
+              f"{row['error_rate']:>8.1%}")
+    if result['overall']['dropped']:
+        print(f"⚠️  {result['overall']['dropped']} arrivals dropped at the concurrency limit")
+
+    if previous is None:
+        return
+    print("\nChange against the previous run:")
+    for name, row in rows:
+        before = previous['overall'] if name == 'overall' else previous['endpoints'].get(name)
+        if not before or not before['requests'] or not row['requests']:
+            continue
+        changes = ', '.join(
+            f"{key} {row[key] / before[key] - 1:+.0%}"
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms') if before[key]
+        )
+        print(f"  {name:<14} {changes}, error rate {before['error_rate']:.1%} -> {row['error_rate']:.1%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the prediction API')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://127.0.0.1:5000', help='Running server')
+    target.add_argument('--start', choices=list(SERVER_COMMANDS) + ['gunicorn'],
+                        help='Start a local server of this kind on --port')
+    parser.add_argument('--port', type=int, default=5057, help='Port for --start')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Open loop: requests per second (default: closed loop)')
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=3.0, help='Seconds not measured')
+    parser.add_argument('--mix', default='predict=0.9,batch-predict=0.1',
+                        help='Endpoint weights')
+    parser.add_argument('--sizes', default='512=0.3,1024=0.5,2048=0.2',
+                        help='Upload image size (pixels) weights')
+    parser.add_argument('--batch-files', type=int, default=4)
+    parser.add_argument('--distinct', type=int, default=16,
+                        help='Different images per size (repeats may hit the prediction cache)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Results file (default: loadtest_results/<time>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare with')
+    args = parser.parse_args()
+
+    mix = RequestMix(parse_weights(args.mix), parse_weights(args.sizes, int),
+                     batch_files=args.batch_files, distinct=args.distinct, seed=args.seed)
+
+    server = None
+    if args.start:
+        print(f"🚀 Starting {args.start} server on port {args.port}...")
+        server = start_server(args.start, args.port)
+        host, port = '127.0.0.1', args.port
+    else:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+
+    try:
+        mode = f'open loop at {args.rate}/s' if args.rate else 'closed loop'
+        print(f"⏱️  {mode}, concurrency {args.concurrency}, {args.duration:.0f}s "
+              f"(+{args.warmup:.0f}s warmup) against {host}:{port}")
+        samples, dropped, elapsed = asyncio.run(run_load(
+            host, port, mix, args.concurrency, args.duration, rate=args.rate, warmup=args.warmup
+        ))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=60)
+
+    result = {
+        'config': {
+            'target': args.start or args.url,
+            'mode': 'open' if args.rate else 'closed',
+            'rate': args.rate,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'mix': parse_weights(args.mix),
+            'sizes': parse_weights(args.sizes),
+            'batch_files': args.batch_files,
+            'distinct': args.distinct,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        **report(samples, dropped, elapsed)
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(result, previous)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
@@ -0,0 +1,281 @@
+"""
+Metrics Module
+In-process counters, gauges and histograms, rendered in the Prometheus text
+exposition format for the /metrics endpoint
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers sub-millisecond stages (resize, LUTs) up to slow uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base class: one metric family with a fixed set of label names
+    """
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self):
+        """
+        Returns:
+            list: (suffix, label string, value) per exported sample
+        """
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {_escape(self.documentation)}',
+            f'# TYPE {self.name} {self.type_name}'
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count
+    """
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [('_total', self._labels(key), value) for key, value in items]
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down, optionally read from a callback at render time
+    """
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """
+        Report function() instead of a stored value (unlabeled gauges only)
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                return [('', '', float(self._function()))]
+            except Exception:
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [('', self._labels(key), value) for key, value in items]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets
+    """
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """
+        Also pass every observation to listener(value, labels)
+        """
+        self._listeners.append(listener)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, the last one is +Inf; sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+        for listener in self._listeners:
+            listener(value, labels)
+
+    def time(self, **labels):
+        """
+        Context manager observing the duration of its block in seconds
+        """
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1])) for key, state in self._values.items())
+
+        samples = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(('_bucket', self._labels(key, ('le', _format_value(bound))), cumulative))
+            samples.append(('_sum', self._labels(key), total))
+            samples.append(('_count', self._labels(key), cumulative))
+        return samples
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Named metric families; asking twice for the same name returns the same metric
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """
+        Returns:
+            str: All metrics in the Prometheus text format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Shared by the preprocessing, inference and serving modules
+STAGE_SECONDS = registry.histogram(
+    'xray_stage_duration_seconds',
+    'Time spent in each stage of handling an image',
+    ['stage']
+)
+BATCH_SIZE = registry.histogram(
+    'xray_inference_batch_size',
+    'Images per forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+PREDICTION_ERRORS = registry.counter(
+    'xray_prediction_errors',
+    'Images that did not get a prediction, by reason',
+    ['reason']
+)
+CASCADE_PREDICTIONS = registry.counter(
+    'xray_cascade_predictions',
+    'Cascade predictions by the stage that answered (fast, or escalated to full)',
+    ['stage']
+)
+LANE_QUEUE_DEPTH = registry.gauge(
+    'xray_batcher_lane_queue_depth',
+    'Images waiting in each priority lane of the micro-batcher',
+    ['lane']
+)
+LANE_WAIT_SECONDS = registry.histogram(
+    'xray_batcher_lane_wait_seconds',
+    'Time images wait in the micro-batcher before their forward pass, by lane',
+    ['lane']
+)
+LANE_IMAGES = registry.counter(
+    'xray_batcher_lane_images',
+    'Images run through the micro-batcher, by lane',
+    ['lane']
+)
+JOBS_FINISHED = registry.counter(
+    'xray_jobs',
+    'Asynchronous batch jobs by final state',
+    ['state']
+)
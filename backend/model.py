@@ -4,11 +4,20 @@ Handles loading the trained model and making predictions on X-ray images
 """
 
 import numpy as np
-from PIL import Image
-import tensorflow as tf
-from tensorflow.keras.models import load_model
 import os
 import json
+import threading
+import time
+from preprocessing import PreprocessingEngine
+from admission import check_deadline
+from backends import create_backend, load_keras_model
+from explain import ExplanationUnavailable
+from metrics import CASCADE_PREDICTIONS, PREDICTION_ERRORS, STAGE_SECONDS
+
+
+# Lifecycle of the model behind a predictor; TensorFlow is only imported
+# once loading starts
+MODEL_STATES = ('not_loaded', 'loading', 'ready', 'failed', 'missing')
 
 
 class ChestXrayPredictor:
@@ -16,16 +25,78 @@ class ChestXrayPredictor:
     Class to handle chest X-ray image predictions
     """
     
-    def __init__(self, model_path='../models/chest_xray_model.h5'):
+    def __init__(self, model_path='../models/chest_xray_model.h5', batch_size=32,
+                 inference_batch_sizes=(1, 8, 32), check_parity=False,
+                 preprocess_mode='reference', grayscale_fast_path=True, decode_min_size=None,
+                 load_mode='eager', model_cache_dir=None, backend='keras', tflite_threads=None,
+                 share_weights=False, cascade_model_path=None, cascade_threshold=0.8):
         """
         Initialize the predictor with a trained model
         
         Args:
-            model_path (str): Path to the trained model file
+            model_path (str): Path to the trained model file (.h5, or a .tflite
+                variant from quantize.py)
+            batch_size (int): Largest number of images per forward pass in predict_batch
+            inference_batch_sizes (tuple): Batch sizes traced with a fixed input signature
+            check_parity (bool): Compare the traced path with model.predict after loading
+            preprocess_mode (str): 'reference' (CLAHE at full resolution) or
+                'resize_first' (resize to 224 before CLAHE, faster on large scans)
+            grayscale_fast_path (bool): Equalize single-channel X-rays on one channel
+            decode_min_size (int): Decode large uploads down to about this short side;
+                None picks 448 in 'resize_first' mode and native resolution otherwise
+            load_mode (str): 'eager' loads the model now, 'background' starts
+                loading in a thread, 'lazy' waits for the first ensure_loaded()
+            model_cache_dir (str): Directory for the converted fast-loading copy
+                of the model; None always loads the .h5
+            backend (str): Inference runtime, 'keras' or 'tflite'
+            tflite_threads (int): Threads per TFLite interpreter
+            share_weights (bool): Memory-map the weights read-only so that worker
+                processes share one copy; uses the TFLite backend
+            cascade_model_path (str): Cheaper first-stage model (e.g. a quantized
+                .tflite from quantize.py); None runs every image on the full model
+            cascade_threshold (float): Top probability at which the first stage
+                answers; below it the image is escalated to the full model
         """
         self.model_path = model_path
-        self.model = None
+        self.model = None  # Keras model, when the Keras backend is active
+        # A converted/quantized .tflite file can only run on the TFLite backend, and
+        # only TFLite can run on weights it does not copy into the process
+        self.share_weights = share_weights
+        if model_path.endswith('.tflite') or share_weights:
+            backend = 'tflite'
+        self.backend_name = backend
+        self.tflite_threads = tflite_threads
+        self.backend = None
+        self.cascade_model_path = cascade_model_path
+        self.cascade_threshold = float(cascade_threshold)
+        self.cascade_backend = None  # First stage, when a cascade is configured
+        self._cascade_lock = threading.Lock()
+        self._cascade_counts = {'fast': 0, 'full': 0}
+        self._explainer = None  # GradCamExplainer, built on the first explanation
+        self._explainer_lock = threading.Lock()
+        self.model_cache_dir = model_cache_dir
+        self.state = 'not_loaded'
+        self.load_error = None
+        self.load_source = None  # 'h5' or 'cache'
+        self.load_seconds = None
+        self._load_lock = threading.Lock()
+        self._load_thread = None
+        self.engine = None
+        self.preprocess_executor = None  # PreprocessPool or SharedMemoryPreprocessPool
+        self.inference_batch_sizes = inference_batch_sizes
+        self.check_parity = check_parity
         self.img_size = 224  # Must match training size
+        self.batch_size = max(1, int(batch_size))
+        if decode_min_size is None:
+            # CLAHE at full resolution needs the full image; resize_first only
+            # needs headroom for an antialiased final resize
+            decode_min_size = 2 * self.img_size if preprocess_mode == 'resize_first' else 0
+        self.preprocessor = PreprocessingEngine(
+            img_size=self.img_size,
+            mode=preprocess_mode,
+            grayscale_fast_path=grayscale_fast_path,
+            decode_min_size=decode_min_size
+        )
         # CRITICAL: Class order must match train_generator.class_indices from training
         # Based on ChestX6 dataset alphabetical folder sorting:
         self.class_labels = {
@@ -37,27 +108,165 @@ class ChestXrayPredictor:
             5: 'Tuberculosis'
         }
         
-        # Try to load the model
-        self.load_model()
+        if load_mode == 'eager':
+            self.load_model()
+        elif load_mode == 'background':
+            self.start_background_load()
+    
+    @property
+    def ready(self):
+        """
+        True once the model is loaded and warmed up
+        """
+        return self.state == 'ready'
     
     def load_model(self):
         """
         Load the trained model from disk
+        
+        Safe to call from several threads; only the first call loads, the
+        others wait for it and return its outcome.
+        
+        Returns:
+            bool: True if the model is ready
         """
-        try:
-            if not os.path.exists(self.model_path):
-                print(f"⚠️  Warning: Model file not found at {self.model_path}")
-                print("Please train the model first using the Colab notebook.")
-                return False
+        with self._load_lock:
+            if self.state != 'not_loaded':
+                return self.ready
+            self.state = 'loading'
+            start = time.perf_counter()
             
-            print(f"📦 Loading model from {self.model_path}...")
-            self.model = load_model(self.model_path)
-            print("✅ Model loaded successfully!")
-            return True
+            try:
+                if not os.path.exists(self.model_path):
+                    print(f"⚠️  Warning: Model file not found at {self.model_path}")
+                    print("Please train the model first using the Colab notebook.")
+                    self.state = 'missing'
+                    return False
+                
+                print(f"📦 Loading model from {self.model_path} ({self.backend_name} backend)...")
+                backend = create_backend(
+                    self.backend_name,
+                    self.model_path,
+                    img_size=self.img_size,
+                    batch_sizes=self.inference_batch_sizes,
+                    check_parity=self.check_parity,
+                    model_cache_dir=self.model_cache_dir,
+                    num_threads=self.tflite_threads,
+                    share_weights=self.share_weights
+                )
+                backend.load()
+                self.load_source = backend.source
+                print(f"✅ Model loaded successfully! ({self.load_source})")
+                
+                backend.warmup()
+                latency = backend.measure_baseline()
+                print(f"⏱️  Single-image latency: {latency:.1f} ms")
+                
+                if self.cascade_model_path:
+                    self.cascade_backend = self._load_cascade(backend)
+                
+                self.backend = backend
+                self.model = getattr(backend, 'model', None)
+                self.engine = getattr(backend, 'engine', None)
+                self.load_seconds = time.perf_counter() - start
+                self.state = 'ready'
+                return True
+                
+            except Exception as e:
+                print(f"❌ Error loading model: {str(e)}")
+                self.backend = None
+                self.cascade_backend = None
+                self.model = None
+                self.engine = None
+                self.load_error = str(e)
+                self.state = 'failed'
+                return False
+    
+    def _load_cascade(self, full_backend):
+        """
+        Load the first-stage model of the cascade
+        
+        Args:
+            full_backend (InferenceBackend): Loaded full model, to check the
+                first stage predicts the same classes
             
-        except Exception as e:
-            print(f"❌ Error loading model: {str(e)}")
-            return False
+        Returns:
+            InferenceBackend: Warmed-up first-stage backend
+        """
+        name = 'tflite' if self.cascade_model_path.endswith('.tflite') else 'keras'
+        print(f"📦 Loading cascade first stage from {self.cascade_model_path} ({name} backend)...")
+        backend = create_backend(
+            name,
+            self.cascade_model_path,
+            img_size=self.img_size,
+            batch_sizes=self.inference_batch_sizes,
+            model_cache_dir=self.model_cache_dir,
+            num_threads=self.tflite_threads,
+            share_weights=self.share_weights and name == 'tflite'
+        )
+        backend.metrics_stage = 'inference_fast'
+        backend.load()
+        
+        fast_outputs = backend.describe()['output_shape'][-1]
+        full_outputs = full_backend.describe()['output_shape'][-1]
+        if fast_outputs != full_outputs:
+            raise ValueError(
+                f"Cascade model predicts {fast_outputs} classes, the full model {full_outputs}"
+            )
+        
+        backend.warmup()
+        latency = backend.measure_baseline()
+        print(f"⏱️  Cascade first stage latency: {latency:.1f} ms "
+              f"(answers at confidence >= {self.cascade_threshold:.2f})")
+        return backend
+    
+    def start_background_load(self):
+        """
+        Load the model in a daemon thread so startup does not block on it
+        
+        Returns:
+            threading.Thread: The loader thread
+        """
+        with self._load_lock:
+            if self._load_thread is None and self.state == 'not_loaded':
+                self._load_thread = threading.Thread(
+                    target=self.load_model, name='model-loader', daemon=True
+                )
+                self._load_thread.start()
+            return self._load_thread
+    
+    def ensure_loaded(self, timeout=None):
+        """
+        Load the model now if nobody has started loading it yet, otherwise
+        wait for the load in progress
+        
+        Args:
+            timeout (float): Seconds to wait for a background load; None waits
+                until it finishes
+        
+        Returns:
+            bool: True if the model is ready
+        """
+        thread = self._load_thread
+        if thread is not None:
+            thread.join(timeout)
+            return self.ready
+        return self.load_model()
+    
+    def get_status(self):
+        """
+        Get the model loading state
+        
+        Returns:
+            dict: State, whether predictions can be served, load source/time and error
+        """
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'source': self.load_source,
+            'load_seconds': self.load_seconds,
+            'error': self.load_error
+        }
     
     def preprocess_image(self, image_file):
         """
@@ -70,68 +279,28 @@ class ChestXrayPredictor:
             numpy array: Preprocessed image ready for prediction
         """
         try:
-            # Open image
-            if isinstance(image_file, str):
-                img = Image.open(image_file)
-            else:
-                img = Image.open(image_file.stream)
-            
-            # Convert to RGB (in case image is grayscale)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Convert to array for preprocessing
-            img_array = np.array(img)
-            
-            # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-            # This normalizes contrast across different X-ray sources for better generalization
-            try:
-                import cv2
-                
-                # Convert to LAB color space for better contrast enhancement
-                lab = cv2.cvtColor(img_array, cv2.COLOR_RGB2LAB)
-                l, a, b = cv2.split(lab)
-                
-                # Apply CLAHE to L channel (lightness)
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-                l = clahe.apply(l)
-                
-                # Merge back
-                lab = cv2.merge([l, a, b])
-                img_array = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
-                
-                print("✓ CLAHE preprocessing applied")
-            except ImportError:
-                # Fallback: Simple histogram equalization using numpy
-                print("⚠️ OpenCV not available, using basic normalization")
-                # Normalize to 0-1 range per channel
-                for i in range(3):
-                    channel = img_array[:, :, i].astype(np.float32)
-                    min_val, max_val = channel.min(), channel.max()
-                    if max_val > min_val:
-                        img_array[:, :, i] = ((channel - min_val) / (max_val - min_val) * 255).astype(np.uint8)
-            
-            # Convert back to PIL Image for resizing
-            img = Image.fromarray(img_array.astype(np.uint8))
-            
-            # Resize to model input size
-            img = img.resize((self.img_size, self.img_size))
-            
-            # Convert to array
-            img_array = np.array(img)
-            
-            # Normalize pixel values to [0, 1]
-            img_array = img_array.astype('float32') / 255.0
-            
-            # Add batch dimension
-            img_array = np.expand_dims(img_array, axis=0)
-            
-            return img_array
+            return self._preprocess(image_file)
             
         except Exception as e:
             print(f"❌ Error preprocessing image: {str(e)}")
             return None
     
+    def _preprocess(self, image_file):
+        """
+        Preprocess one image, raising on failure so callers can report the cause
+        
+        CLAHE (Contrast Limited Adaptive Histogram Equalization) normalizes
+        contrast across different X-ray sources for better generalization.
+        
+        Args:
+            image_file: File object or file path
+            
+        Returns:
+            numpy array: Preprocessed image of shape (1, 224, 224, 3)
+        """
+        with STAGE_SECONDS.time(stage='preprocess'):
+            return self.preprocessor.preprocess(image_file)
+    
     def predict(self, image_file):
         """
         Make prediction on a single image
@@ -142,7 +311,7 @@ class ChestXrayPredictor:
         Returns:
             dict: Prediction results with class and confidence
         """
-        if self.model is None:
+        if not self.ready:
             return {
                 'success': False,
                 'error': 'Model not loaded. Please train the model first.'
@@ -159,29 +328,7 @@ class ChestXrayPredictor:
                 }
             
             # Make prediction
-            predictions = self.model.predict(img_array, verbose=0)
-            
-            # Get predicted class and confidence
-            predicted_class = int(np.argmax(predictions[0]))
-            confidence = float(predictions[0][predicted_class])
-            
-            # Get class label
-            class_label = self.class_labels.get(predicted_class, 'UNKNOWN')
-            
-            # Get all class probabilities
-            all_probabilities = {
-                self.class_labels[i]: float(predictions[0][i])
-                for i in range(len(predictions[0]))
-            }
-            
-            return {
-                'success': True,
-                'predicted_class': class_label,
-                'confidence': confidence,
-                'confidence_percentage': f"{confidence * 100:.2f}%",
-                'all_probabilities': all_probabilities,
-                'interpretation': self._interpret_result(class_label, confidence)
-            }
+            return self.predict_arrays(img_array)[0]
             
         except Exception as e:
             return {
@@ -189,24 +336,295 @@ class ChestXrayPredictor:
                 'error': f'Prediction failed: {str(e)}'
             }
     
+    def predict_arrays(self, img_batch):
+        """
+        Run one forward pass over already preprocessed images
+        
+        Args:
+            img_batch (numpy array): Batch of shape (N, 224, 224, 3)
+            
+        Returns:
+            list: One prediction result per image, in input order
+        """
+        if self.cascade_backend is None:
+            predictions = self.run_model(img_batch)
+            return [self._format_prediction(probs) for probs in predictions]
+        
+        predictions, escalated = self.run_cascade(img_batch)
+        return [
+            self._format_prediction(probs, stage='full' if doubtful else 'fast')
+            for probs, doubtful in zip(predictions, escalated)
+        ]
+    
+    def run_cascade(self, img_batch):
+        """
+        Run the first-stage model and escalate low-confidence images to the full model
+        
+        Args:
+            img_batch (numpy array): Batch of shape (N, 224, 224, 3)
+            
+        Returns:
+            tuple: (probabilities of shape (N, num_classes), boolean array
+            marking the images answered by the full model)
+        """
+        predictions = np.array(self.cascade_backend.run(img_batch), dtype=np.float32)
+        escalated = predictions.max(axis=1) < self.cascade_threshold
+        
+        doubtful = np.flatnonzero(escalated)
+        if len(doubtful):
+            predictions[doubtful] = self.run_model(img_batch[doubtful])
+        
+        answered_fast = len(predictions) - len(doubtful)
+        with self._cascade_lock:
+            self._cascade_counts['fast'] += answered_fast
+            self._cascade_counts['full'] += len(doubtful)
+        CASCADE_PREDICTIONS.inc(answered_fast, stage='fast')
+        CASCADE_PREDICTIONS.inc(len(doubtful), stage='full')
+        return predictions, escalated
+    
+    def get_cascade_stats(self):
+        """
+        Get cascade settings and how often the first stage had to escalate
+        
+        Returns:
+            dict: Cascade statistics, or {'enabled': False}
+        """
+        if self.cascade_backend is None:
+            return {'enabled': False}
+        
+        with self._cascade_lock:
+            fast = self._cascade_counts['fast']
+            full = self._cascade_counts['full']
+        
+        return {
+            'enabled': True,
+            'model_path': self.cascade_model_path,
+            'threshold': self.cascade_threshold,
+            'answered_fast': fast,
+            'escalated': full,
+            'escalation_rate': full / (fast + full) if fast + full else 0.0,
+            'first_stage': self.cascade_backend.describe()
+        }
+    
+    def run_model(self, img_batch):
+        """
+        Get raw class probabilities for already preprocessed images
+        
+        Args:
+            img_batch (numpy array): Batch of shape (N, 224, 224, 3)
+            
+        Returns:
+            numpy array: Probabilities of shape (N, num_classes)
+        """
+        return self.backend.run(img_batch)
+    
+    def get_explainer(self):
+        """
+        Get the Grad-CAM explainer, building it on first use
+        
+        With the TFLite backend the Keras model is loaded for it (from the
+        model cache when possible); a .tflite MODEL_PATH has no Keras model.
+        
+        Returns:
+            GradCamExplainer: Explainer for the served model
+        """
+        if not self.ready:
+            raise ExplanationUnavailable('Model not loaded')
+        
+        with self._explainer_lock:
+            if self._explainer is None:
+                from explain import GradCamExplainer
+                
+                model = self.model
+                if model is None:
+                    if self.model_path.endswith('.tflite'):
+                        raise ExplanationUnavailable(
+                            'Heatmaps need the Keras model; MODEL_PATH is a .tflite file'
+                        )
+                    print("📦 Loading the Keras model for explanations...")
+                    model, _ = load_keras_model(self.model_path, self.model_cache_dir)
+                self._explainer = GradCamExplainer(model, self.img_size)
+                print(f"🔥 Grad-CAM ready (feature map: {self._explainer.layer_name})")
+            return self._explainer
+    
+    def explain_arrays(self, img_batch, class_indices=None):
+        """
+        Predict and compute a Grad-CAM heatmap for already preprocessed images
+        
+        Prediction and heatmap come from one forward pass per chunk of at most
+        self.batch_size images, with the gradients of the chunk computed together.
+        
+        Args:
+            img_batch (numpy array): Batch of shape (N, 224, 224, 3)
+            class_indices (list): Class to explain per image; None entries
+                explain the predicted class
+            
+        Returns:
+            list: (prediction result, explanation dict) per image, in input order
+        """
+        explainer = self.get_explainer()
+        results = []
+        
+        for start in range(0, len(img_batch), self.batch_size):
+            check_deadline()
+            chunk = img_batch[start:start + self.batch_size]
+            targets = None if class_indices is None else class_indices[start:start + self.batch_size]
+            with STAGE_SECONDS.time(stage='explain'):
+                probabilities, explained, heatmaps = explainer.explain(chunk, targets)
+            
+            for probs, class_index, heatmap in zip(probabilities, explained, heatmaps):
+                results.append((self._format_prediction(probs), {
+                    'class': self.class_labels.get(int(class_index), 'UNKNOWN'),
+                    'layer': explainer.layer_name,
+                    'heatmap': np.round(heatmap, 4).tolist()
+                }))
+        
+        return results
+    
+    def class_index(self, class_label):
+        """
+        Model output index of a class label, or None if unknown
+        """
+        for index, label in self.class_labels.items():
+            if label == class_label:
+                return index
+        return None
+    
+    def _format_prediction(self, probabilities, stage='full'):
+        """
+        Build the prediction response for one row of model output
+        
+        Args:
+            probabilities (numpy array): Class probabilities for one image
+            stage (str): Model that answered: 'fast' (cascade first stage) or 'full'
+            
+        Returns:
+            dict: Prediction results with class and confidence
+        """
+        # Get predicted class and confidence
+        predicted_class = int(np.argmax(probabilities))
+        confidence = float(probabilities[predicted_class])
+        
+        # Get class label
+        class_label = self.class_labels.get(predicted_class, 'UNKNOWN')
+        
+        # Get all class probabilities
+        all_probabilities = {
+            self.class_labels[i]: float(probabilities[i])
+            for i in range(len(probabilities))
+        }
+        
+        return {
+            'success': True,
+            'predicted_class': class_label,
+            'confidence': confidence,
+            'confidence_percentage': f"{confidence * 100:.2f}%",
+            'all_probabilities': all_probabilities,
+            'interpretation': self._interpret_result(class_label, confidence),
+            'stage': stage
+        }
+    
     def predict_batch(self, image_files):
         """
         Make predictions on multiple images
         
+        All images are preprocessed first, stacked into one tensor and run
+        through the model in chunks of at most self.batch_size images. Raises
+        DeadlineExceeded if the current request's deadline passes before a
+        chunk reaches the model.
+        
         Args:
             image_files: List of file objects or file paths
             
         Returns:
-            list: List of prediction results
+            list: List of prediction results, in input order
         """
-        results = []
+        if not self.ready:
+            return [{
+                'success': False,
+                'error': 'Model not loaded. Please train the model first.'
+            } for _ in image_files]
         
-        for img_file in image_files:
-            result = self.predict(img_file)
-            results.append(result)
+        results = [None] * len(image_files)
+        
+        # Preprocess everything first; a bad image only fails its own slot
+        batch, valid_indices, errors = self.preprocess_many(image_files)
+        if errors:
+            PREDICTION_ERRORS.inc(len(errors), reason='preprocess')
+        for index, error in errors.items():
+            print(f"❌ Error preprocessing image: {error}")
+            results[index] = {
+                'success': False,
+                'error': 'Failed to preprocess image'
+            }
+        
+        # One forward pass per chunk instead of one per image
+        try:
+            for start in range(0, len(valid_indices), self.batch_size):
+                # Nobody is waiting for the rest once the deadline has passed
+                check_deadline()
+                chunk_indices = valid_indices[start:start + self.batch_size]
+                chunk = batch[start:start + self.batch_size]
+                
+                try:
+                    chunk_results = self.predict_arrays(chunk)
+                except Exception as e:
+                    PREDICTION_ERRORS.inc(len(chunk_indices), reason='inference')
+                    chunk_results = [{
+                        'success': False,
+                        'error': f'Prediction failed: {str(e)}'
+                    } for _ in chunk_indices]
+                
+                for index, result in zip(chunk_indices, chunk_results):
+                    results[index] = result
+        finally:
+            self.release_batch(batch)
         
         return results
     
+    def preprocess_many(self, image_files):
+        """
+        Preprocess several images, in parallel when a preprocess executor is set
+        
+        Args:
+            image_files: List of file objects or file paths
+            
+        Returns:
+            tuple: (batch array of the successful images or None, their
+            indices in image_files, {index: error message} for failures)
+        """
+        with STAGE_SECONDS.time(stage='preprocess_batch'):
+            return self._preprocess_many(image_files)
+    
+    def _preprocess_many(self, image_files):
+        if self.preprocess_executor is not None:
+            return self.preprocess_executor.preprocess_batch(self._preprocess, image_files)
+        
+        arrays = []
+        valid_indices = []
+        errors = {}
+        for index, img_file in enumerate(image_files):
+            try:
+                arrays.append(self._preprocess(img_file)[0])
+                valid_indices.append(index)
+            except Exception as e:
+                errors[index] = str(e)
+        
+        batch = np.stack(arrays) if arrays else None
+        return batch, valid_indices, errors
+    
+    def release_batch(self, batch):
+        """
+        Return a batch from preprocess_many to its executor once inference is done
+        
+        Process-pool batches live in reusable shared-memory buffers.
+        
+        Args:
+            batch (numpy array): Batch returned by preprocess_many
+        """
+        if self.preprocess_executor is not None:
+            self.preprocess_executor.release_batch(batch)
+    
     def _interpret_result(self, class_label, confidence):
         """
         Provide interpretation of the prediction
@@ -244,28 +662,62 @@ class ChestXrayPredictor:
         Returns:
             dict: Model information
         """
-        if self.model is None:
+        if not self.ready:
             return {
                 'loaded': False,
-                'message': 'Model not loaded'
+                'message': 'Model not loaded',
+                'status': self.get_status()
             }
         
+        backend = self.backend.describe()
+        
         return {
             'loaded': True,
+            'status': self.get_status(),
             'model_path': self.model_path,
-            'input_shape': self.model.input_shape,
-            'output_shape': self.model.output_shape,
-            'total_parameters': self.model.count_params(),
-            'classes': self.class_labels
+            'input_shape': backend.pop('input_shape'),
+            'output_shape': backend.pop('output_shape'),
+            'total_parameters': backend.pop('total_parameters'),
+            'classes': self.class_labels,
+            'inference_engine': backend.pop('inference_engine', None),
+            'backend': backend,
+            'cascade': self.get_cascade_stats(),
+            'preprocessing': {
+                'mode': self.preprocessor.mode,
+                'grayscale_fast_path': self.preprocessor.grayscale_fast_path,
+                'decode': self.preprocessor.loader.get_stats(),
+                'executor': (self.preprocess_executor.get_stats()
+                             if self.preprocess_executor is not None else None)
+            }
         }
 
 
-# Create a global instance
-predictor = ChestXrayPredictor()
+# Create a global instance. Importing this module stays cheap: the model is
+# loaded by the first ensure_loaded() call, or in the background by app.py.
+predictor = ChestXrayPredictor(
+    model_path=os.environ.get('MODEL_PATH', '../models/chest_xray_model.h5'),
+    batch_size=int(os.environ.get('PREDICT_BATCH_SIZE', 32)),
+    inference_batch_sizes=tuple(
+        int(size) for size in os.environ.get('INFERENCE_BATCH_SIZES', '1,8,32').split(',')
+    ),
+    check_parity=os.environ.get('INFERENCE_PARITY_CHECK', '0') == '1',
+    preprocess_mode=os.environ.get('PREPROCESS_MODE', 'reference'),
+    grayscale_fast_path=os.environ.get('GRAYSCALE_FAST_PATH', '1') == '1',
+    decode_min_size=int(os.environ['DECODE_MIN_SIZE']) if os.environ.get('DECODE_MIN_SIZE') else None,
+    load_mode='lazy',
+    backend=os.environ.get('INFERENCE_BACKEND', 'keras'),
+    tflite_threads=int(os.environ['TFLITE_THREADS']) if os.environ.get('TFLITE_THREADS') else None,
+    share_weights=os.environ.get('SHARED_WEIGHTS', '0') == '1',
+    cascade_model_path=os.environ.get('CASCADE_MODEL_PATH') or None,
+    cascade_threshold=float(os.environ.get('CASCADE_THRESHOLD', 0.8)),
+    model_cache_dir=(os.environ.get('MODEL_CACHE_DIR', '../models/.cache')
+                     if os.environ.get('MODEL_CACHE', '1') == '1' else None)
+)
 
 
 if __name__ == '__main__':
     # Test the predictor
+    predictor.ensure_loaded()
     info = predictor.get_model_info()
     print("\n📊 Model Information:")
     print(json.dumps(info, indent=2))
@@ -0,0 +1,251 @@
+"""
+Model Cache Module
+Converts the .h5 model into a faster-loading format (architecture JSON plus
+one flat weights file), keyed by the content hash of the .h5 file
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from cache import hash_file
+
+
+class ModelCache:
+    """
+    On-disk cache of converted models
+
+    Each entry is a directory named after the SHA-256 of the source .h5:
+
+        <cache_dir>/<hash>/architecture.json   model.to_json()
+        <cache_dir>/<hash>/weights.bin         all weights, back to back
+        <cache_dir>/<hash>/manifest.json       shape/dtype/offset per weight
+        <cache_dir>/<hash>/model.tflite        TFLite conversion, when used
+
+    Loading skips HDF5 parsing and copies the weights from one mapped file.
+    Hashing a 100+ MB file on every boot would eat most of the gain, so the
+    hash is remembered per (path, size, mtime) in index.json.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir (str): Directory holding converted models
+        """
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, 'index.json')
+
+    def _read_index(self):
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def model_hash(self, model_path):
+        """
+        Content hash of the model file, reusing the remembered one when the
+        file has not changed since it was last hashed
+
+        Args:
+            model_path (str): Path to the .h5 file
+
+        Returns:
+            str: SHA-256 hex digest
+        """
+        stat = os.stat(model_path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        index_key = os.path.abspath(model_path)
+
+        with self._lock:
+            index = self._read_index()
+            entry = index.get(index_key)
+            if entry and entry.get('signature') == signature:
+                return entry['sha256']
+
+            digest = hash_file(model_path)
+            index[index_key] = {'signature': signature, 'sha256': digest}
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{self._index_path()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(index, f, indent=2)
+                os.replace(tmp_path, self._index_path())
+            except OSError as e:
+                print(f"⚠️  Could not update model cache index: {str(e)}")
+            return digest
+
+    def entry_dir(self, model_path):
+        """
+        Directory of the cache entry for the current content of model_path
+
+        Args:
+            model_path (str): Path to the .h5 file
+
+        Returns:
+            str: Entry directory (may not exist yet)
+        """
+        return os.path.join(self.cache_dir, self.model_hash(model_path)[:16])
+
+    def load(self, model_path):
+        """
+        Load the converted model if a cache entry exists
+
+        Args:
+            model_path (str): Path to the .h5 file
+
+        Returns:
+            keras.Model: Model with weights, or None if there is no entry
+        """
+        entry = self.entry_dir(model_path)
+        manifest_path = os.path.join(entry, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return None
+
+        from tensorflow.keras.models import model_from_json
+
+        with open(os.path.join(entry, 'architecture.json')) as f:
+            model = model_from_json(f.read())
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        # Mapped rather than read: set_weights copies into the variables anyway
+        model.set_weights(read_weights(os.path.join(entry, 'weights.bin'), manifest, mmap=True))
+        return model
+
+    def artifact_path(self, model_path, name):
+        """
+        Path of another file derived from the model (e.g. a TFLite
+        conversion), stored next to the converted Keras model
+
+        Args:
+            model_path (str): Path to the .h5 file
+            name (str): File name inside the entry
+
+        Returns:
+            str: Path (the file may not exist yet)
+        """
+        return os.path.join(self.entry_dir(model_path), name)
+
+    def write_artifact(self, model_path, name, data):
+        """
+        Atomically store a derived file in the cache entry
+
+        Args:
+            model_path (str): Path to the .h5 file
+            name (str): File name inside the entry
+            data (bytes): File content
+
+        Returns:
+            str: Path of the stored file
+        """
+        path = self.artifact_path(model_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def save(self, model_path, model):
+        """
+        Convert a loaded model into a cache entry
+
+        Args:
+            model_path (str): Path to the .h5 file the model came from
+            model (keras.Model): Loaded model
+
+        Returns:
+            str: Entry directory
+        """
+        entry = self.entry_dir(model_path)
+        os.makedirs(entry, exist_ok=True)
+        suffix = f".tmp{os.getpid()}"
+        names = ('architecture.json', 'weights.bin', 'manifest.json')
+
+        try:
+            with open(os.path.join(entry, 'architecture.json' + suffix), 'w') as f:
+                f.write(model.to_json())
+
+            manifest = write_weights(
+                os.path.join(entry, 'weights.bin' + suffix), model.get_weights()
+            )
+            with open(os.path.join(entry, 'manifest.json' + suffix), 'w') as f:
+                json.dump(manifest, f)
+
+            # The manifest goes last: an entry without one is never loaded
+            for name in names:
+                os.replace(os.path.join(entry, name + suffix), os.path.join(entry, name))
+        except Exception:
+            for name in names:
+                try:
+                    os.remove(os.path.join(entry, name + suffix))
+                except OSError:
+                    pass
+            raise
+
+        return entry
+
+
+def write_weights(path, weights, alignment=64):
+    """
+    Write weight arrays back to back into one flat file
+
+    Args:
+        path (str): Output file
+        weights (list): numpy arrays from model.get_weights()
+        alignment (int): Byte alignment of each array
+
+    Returns:
+        list: Manifest entries (shape, dtype, offset) in weight order
+    """
+    manifest = []
+    offset = 0
+    with open(path, 'wb') as f:
+        for weight in weights:
+            weight = np.ascontiguousarray(weight)
+            padding = (-offset) % alignment
+            f.write(b'\0' * padding)
+            offset += padding
+            manifest.append({
+                'shape': list(weight.shape),
+                'dtype': weight.dtype.str,
+                'offset': offset
+            })
+            f.write(weight.tobytes())
+            offset += weight.nbytes
+    return manifest
+
+
+def read_weights(path, manifest, mmap=False):
+    """
+    Read weight arrays written by write_weights
+
+    Args:
+        path (str): Flat weights file
+        manifest (list): Entries from write_weights
+        mmap (bool): Map the file read-only instead of reading it
+
+    Returns:
+        list: numpy arrays in weight order (views into one buffer)
+    """
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        with open(path, 'rb') as f:
+            data = f.read()
+
+    weights = []
+    for item in manifest:
+        dtype = np.dtype(item['dtype'])
+        count = int(np.prod(item['shape'], dtype=np.int64))
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=item['offset'])
+        weights.append(array.reshape(item['shape']))
+    return weights
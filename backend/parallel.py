@@ -0,0 +1,178 @@
+"""
+Parallel Preprocessing Module
+Shared, bounded thread pool that decodes and preprocesses the images of a
+request in parallel
+"""
+
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class PoolFullError(Exception):
+    """
+    Raised when the preprocessing pool has too many pending images
+    """
+    pass
+
+
+class PreprocessPool:
+    """
+    Thread pool for image decoding and preprocessing
+
+    PIL decoding/resizing and OpenCV release the GIL for most of their work,
+    so threads scale across cores here. The number of images waiting for a
+    worker is bounded; results always come back in input order and a failing
+    image only fails its own slot.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64, submit_timeout=5.0):
+        """
+        Initialize the pool
+
+        Args:
+            max_workers (int): Worker threads
+            max_pending (int): Images queued or running across all requests
+            submit_timeout (float): Seconds to wait for a free slot before
+                raising PoolFullError
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(1, int(max_pending))
+        self.submit_timeout = submit_timeout
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='preprocess'
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def _submit(self, fn, item):
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise PoolFullError(
+                f'Preprocessing queue is full ({self.max_pending} pending images)'
+            )
+
+        with self._lock:
+            self._pending += 1
+
+        # Run in the caller's context so per-request profiling sees the stages
+        future = self._executor.submit(contextvars.copy_context().run, fn, item)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        self._slots.release()
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                # Dropped with the rest of a request the pool had no room for
+                self._rejected += 1
+            elif future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def map_isolated(self, fn, items):
+        """
+        Apply fn to every item in parallel
+
+        Args:
+            fn (callable): Function of one item
+            items (list): Inputs
+
+        Returns:
+            list: (value, error) per item in input order; error is None on
+            success and the raised exception otherwise
+        """
+        items = list(items)
+        if len(items) <= 1:
+            # Not worth a thread hop for a single image
+            results = []
+            for item in items:
+                try:
+                    results.append((fn(item), None))
+                except Exception as e:
+                    results.append((None, e))
+            return results
+
+        futures = []
+        try:
+            for item in items:
+                futures.append(self._submit(fn, item))
+        except PoolFullError:
+            for future in futures:
+                future.cancel()
+            raise
+
+        results = []
+        for future in futures:
+            try:
+                results.append((future.result(), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def preprocess_batch(self, preprocess, image_files):
+        """
+        Preprocess images in parallel and stack the successful ones
+
+        Args:
+            preprocess (callable): Returns a (1, H, W, 3) array for one image
+            image_files (list): File objects or file paths
+
+        Returns:
+            tuple: (batch array or None, indices of the stacked images,
+            {index: error message} for the failed ones)
+        """
+        arrays = []
+        valid_indices = []
+        errors = {}
+
+        for index, (array, error) in enumerate(self.map_isolated(preprocess, image_files)):
+            if error is not None:
+                errors[index] = str(error)
+            else:
+                arrays.append(array[0])
+                valid_indices.append(index)
+
+        batch = np.stack(arrays) if arrays else None
+        return batch, valid_indices, errors
+
+    def release_batch(self, batch):
+        """
+        Nothing to release; batches from this pool are ordinary arrays
+        """
+        pass
+
+    def get_stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: Settings and counters
+        """
+        with self._lock:
+            return {
+                'type': 'threads',
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected
+            }
+
+    def shutdown(self):
+        """
+        Stop the worker threads
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
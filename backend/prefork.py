@@ -0,0 +1,205 @@
+"""
+Pre-Fork Serving Module
+Exports the model once to a flat, memory-mappable weights file before the
+gunicorn workers start, and measures per-worker memory to show what the
+workers share
+
+Usage:
+    python prefork.py export                      Called by gunicorn.conf.py
+    python prefork.py measure [--workers 4]       Per-worker RSS/PSS report
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Configurations compared by `measure`
+MEMORY_MODES = {
+    'keras': {'INFERENCE_BACKEND': 'keras', 'SHARED_WEIGHTS': '0'},
+    'tflite': {'INFERENCE_BACKEND': 'tflite', 'SHARED_WEIGHTS': '0'},
+    'tflite_shared': {'INFERENCE_BACKEND': 'tflite', 'SHARED_WEIGHTS': '1'}
+}
+
+
+def export_shared_weights(model_path, model_cache_dir):
+    """
+    Make sure the weights file the workers map exists
+
+    Args:
+        model_path (str): Served model (.h5 or .tflite)
+        model_cache_dir (str): ModelCache directory
+
+    Returns:
+        str: Path of the .tflite file workers will map
+    """
+    if model_path.endswith('.tflite'):
+        return model_path
+
+    from backends import export_tflite
+
+    path, source = export_tflite(model_path, model_cache_dir)
+    print(f"🗺️  Shared weights file ({source}): {path} "
+          f"({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+    return path
+
+
+def process_memory(pid):
+    """
+    Memory of one process from /proc/<pid>/smaps_rollup (Linux)
+
+    RSS counts shared pages in full for every process; PSS splits each shared
+    page between the processes mapping it, so summing PSS over the workers
+    gives what they really cost together.
+
+    Args:
+        pid (int): Process id
+
+    Returns:
+        dict: rss, pss, shared and private memory in MB
+    """
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024.0
+
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'shared_mb': fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0),
+        'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+
+def child_pids(pid):
+    """
+    Direct children of a process (the gunicorn workers of a master)
+    """
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def send_predictions(port, count):
+    """
+    Run a few predictions so the workers allocate their inference buffers
+    """
+    from compare_serving import make_png, multipart_body
+
+    body, content_type = multipart_body('file', 'warmup.png', make_png(256, 0))
+    for _ in range(count):
+        request = urllib.request.Request(
+            f'http://127.0.0.1:{port}/api/predict', data=body,
+            headers={'Content-Type': content_type}
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+
+
+def wait_for_workers(master_pid, workers, port, timeout=300):
+    """
+    Wait until every worker is up and its memory has stopped growing
+
+    Returns:
+        list: Worker pids
+    """
+    deadline = time.time() + timeout
+    previous = None
+    while time.time() < deadline:
+        time.sleep(1.0)
+        try:
+            pids = child_pids(master_pid)
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ready', timeout=2):
+                pass
+        except (OSError, urllib.error.URLError):
+            continue
+        if len(pids) < workers:
+            continue
+
+        sizes = [round(process_memory(pid)['rss_mb']) for pid in pids]
+        if sizes == previous:
+            return pids
+        previous = sizes
+    raise TimeoutError('gunicorn workers did not settle')
+
+
+def measure_mode(mode, workers, port, model_path=None, requests_per_worker=4):
+    """
+    Start gunicorn in one configuration and measure its workers
+
+    Args:
+        mode (str): Key of MEMORY_MODES
+        workers (int): gunicorn workers
+        port (int): Port to bind
+        model_path (str): Model to serve (default: MODEL_PATH or the .h5)
+        requests_per_worker (int): Predictions sent before measuring
+
+    Returns:
+        dict: Per-worker memory and totals
+    """
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f'127.0.0.1:{port}',
+               MODEL_LOAD_MODE='eager', CACHE_ENABLED='0', TF_CPP_MIN_LOG_LEVEL='3',
+               **MEMORY_MODES[mode])
+    if model_path:
+        env['MODEL_PATH'] = model_path
+
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_workers(master.pid, workers, port)
+        send_predictions(port, requests_per_worker * workers)
+        pids = wait_for_workers(master.pid, workers, port)
+        per_worker = [process_memory(pid) for pid in pids]
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+    def average(key):
+        return sum(worker[key] for worker in per_worker) / len(per_worker)
+
+    return {
+        'workers': len(per_worker),
+        'avg_rss_mb': average('rss_mb'),
+        'avg_pss_mb': average('pss_mb'),
+        'avg_shared_mb': average('shared_mb'),
+        'avg_private_mb': average('private_mb'),
+        'total_pss_mb': sum(worker['pss_mb'] for worker in per_worker),
+        'per_worker': per_worker
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-fork serving helpers')
+    parser.add_argument('command', choices=['export', 'measure'])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--modes', default=','.join(MEMORY_MODES))
+    parser.add_argument('--model', default=None, help='Model to serve (default: MODEL_PATH)')
+    args = parser.parse_args()
+
+    model_path = args.model or os.environ.get('MODEL_PATH', '../models/chest_xray_model.h5')
+
+    if args.command == 'export':
+        export_shared_weights(
+            model_path, os.environ.get('MODEL_CACHE_DIR', '../models/.cache')
+        )
+    else:
+        report = {
+            'model': model_path,
+            'model_mb': os.path.getsize(model_path) / 1024 / 1024,
+            'modes': {}
+        }
+        for mode in args.modes.split(','):
+            print(f"📏 Measuring {mode} with {args.workers} workers...")
+            report['modes'][mode] = measure_mode(mode, args.workers, args.port, model_path)
+        print(json.dumps(report, indent=2))
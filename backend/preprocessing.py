@@ -0,0 +1,532 @@
+"""
+Image Preprocessing Module
+Reusable CLAHE preprocessing engine for ChestXrayPredictor, plus a parity
+and speed report against the original pipeline
+"""
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from image_loader import ImageLoader
+from metrics import STAGE_SECONDS
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+PREPROCESS_MODES = ('reference', 'resize_first')
+GRAYSCALE_MODES = ('L', 'I;16', 'I;16L', 'I;16B', 'I')
+
+
+def _srgb_to_lightness(values):
+    """
+    Lightness (0-1) of neutral gray pixels, as in the L channel of RGB->LAB
+
+    Args:
+        values (numpy array): Gray levels in [0, 1]
+
+    Returns:
+        numpy array: Lightness in [0, 1]
+    """
+    linear = np.where(values > 0.04045, ((values + 0.055) / 1.055) ** 2.4, values / 12.92)
+    f = np.where(linear > 0.008856, np.cbrt(linear), 7.787 * linear + 16.0 / 116.0)
+    return np.clip((116.0 * f - 16.0) / 100.0, 0.0, 1.0)
+
+
+def _lightness_to_srgb(lightness):
+    """
+    Inverse of _srgb_to_lightness
+
+    Args:
+        lightness (numpy array): Lightness in [0, 1]
+
+    Returns:
+        numpy array: Gray levels in [0, 1]
+    """
+    f = (lightness * 100.0 + 16.0) / 116.0
+    linear = np.where(f > 0.206893, f ** 3, (f - 16.0 / 116.0) / 7.787)
+    values = np.where(linear > 0.0031308, 1.055 * np.power(np.maximum(linear, 0), 1 / 2.4) - 0.055, 12.92 * linear)
+    return np.clip(values, 0.0, 1.0)
+
+
+def _build_gray_luts():
+    """
+    Lookup tables that take gray pixels to LAB lightness and back
+
+    A gray RGB pixel has a = b = 128 in LAB, so the colour-space round trip
+    of the original pipeline reduces to two per-pixel lookups around CLAHE.
+    The 8-bit tables come from OpenCV itself, so the result matches the RGB
+    path to within one gray level; the 16-bit tables use the same curve at
+    full 16-bit precision.
+
+    Returns:
+        dict: Forward and inverse tables for 8-bit and 16-bit inputs
+    """
+    luts = {}
+
+    if cv2 is not None:
+        ramp = np.repeat(np.arange(256, dtype=np.uint8)[:, np.newaxis], 3, axis=1)[np.newaxis]
+        luts['forward8'] = cv2.cvtColor(ramp, cv2.COLOR_RGB2LAB)[0, :, 0].copy()
+
+        lightness = np.zeros((1, 256, 3), dtype=np.uint8)
+        lightness[0, :, 0] = np.arange(256)
+        lightness[0, :, 1:] = 128
+        rgb = cv2.cvtColor(lightness, cv2.COLOR_LAB2RGB)[0].astype(np.float32)
+        luts['inverse8'] = np.round(rgb.mean(axis=1)).astype(np.uint8)
+
+    levels = np.arange(65536, dtype=np.float64) / 65535.0
+    luts['forward16'] = np.round(_srgb_to_lightness(levels) * 65535).astype(np.uint16)
+    luts['inverse16'] = _lightness_to_srgb(levels).astype(np.float32)
+
+    return luts
+
+
+def open_image(image_file):
+    """
+    Open an image from a path, an uploaded FileStorage or a binary file object
+
+    Args:
+        image_file: File object or file path
+
+    Returns:
+        PIL.Image: Lazily decoded image
+    """
+    if isinstance(image_file, str):
+        return Image.open(image_file)
+    return Image.open(getattr(image_file, 'stream', image_file))
+
+
+def stretch_channels(img_array):
+    """
+    Stretch every channel to the full 0-255 range in one vectorised pass
+
+    Used when OpenCV is not installed. Channels with a single value are
+    left unchanged.
+
+    Args:
+        img_array (numpy array): uint8 image of shape (H, W, C)
+
+    Returns:
+        numpy array: Stretched uint8 image
+    """
+    channels = img_array.astype(np.float32)
+    min_vals = channels.min(axis=(0, 1), keepdims=True)
+    max_vals = channels.max(axis=(0, 1), keepdims=True)
+    span = max_vals - min_vals
+
+    stretched = (channels - min_vals) / np.where(span > 0, span, 1.0) * 255
+    return np.where(span > 0, stretched, channels).astype(np.uint8)
+
+
+def stretch_to_uint16(gray):
+    """
+    Spread high-bit-depth gray data over the full 16-bit range
+
+    Scanners often store 10-14 bit data in 16-bit files. OpenCV limits the
+    CLAHE mapping slope per gray level, so without stretching such images
+    would barely be equalized.
+
+    Args:
+        gray (numpy array): Integer image (uint16 or int32)
+
+    Returns:
+        numpy array: uint16 image using the full 0-65535 range
+    """
+    min_val, max_val = int(gray.min()), int(gray.max())
+    if max_val <= min_val:
+        return np.clip(gray, 0, 65535).astype(np.uint16)
+    scaled = (gray.astype(np.float32) - min_val) * (65535.0 / (max_val - min_val))
+    return scaled.astype(np.uint16)
+
+
+def reference_preprocess(image_file, img_size=224):
+    """
+    The original preprocess_image pipeline, kept unchanged as the parity
+    baseline for PreprocessingEngine
+
+    Args:
+        image_file: File object or file path
+        img_size (int): Model input size
+
+    Returns:
+        numpy array: Image of shape (img_size, img_size, 3) in [0, 1]
+    """
+    img = open_image(image_file)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img_array = np.array(img)
+
+    if cv2 is not None:
+        lab = cv2.cvtColor(img_array, cv2.COLOR_RGB2LAB)
+        l, a, b = cv2.split(lab)
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        l = clahe.apply(l)
+        lab = cv2.merge([l, a, b])
+        img_array = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
+    else:
+        for i in range(3):
+            channel = img_array[:, :, i].astype(np.float32)
+            min_val, max_val = channel.min(), channel.max()
+            if max_val > min_val:
+                img_array[:, :, i] = ((channel - min_val) / (max_val - min_val) * 255).astype(np.uint8)
+
+    img = Image.fromarray(img_array.astype(np.uint8))
+    img = img.resize((img_size, img_size))
+    return np.array(img).astype('float32') / 255.0
+
+
+class PreprocessingEngine:
+    """
+    CLAHE preprocessing with per-thread CLAHE instances
+
+    In 'reference' mode the output matches the original pipeline: CLAHE runs
+    on the full-resolution image and the result is resized to the model input
+    size. In 'resize_first' mode the image is resized first and CLAHE runs on
+    the small image, which is much cheaper for large scans but shifts the
+    local contrast slightly (see parity_report).
+
+    Single-channel inputs (L, I;16) skip the RGB/LAB round trip: CLAHE and
+    resizing run on one channel and the result is widened to 3 channels as a
+    broadcast view. 16-bit inputs keep their full range through CLAHE.
+    """
+
+    def __init__(self, img_size=224, mode='reference', clip_limit=2.0, tile_grid_size=(8, 8),
+                 grayscale_fast_path=True, decode_min_size=None):
+        """
+        Initialize the engine
+
+        Args:
+            img_size (int): Model input size
+            mode (str): 'reference' or 'resize_first'
+            clip_limit (float): CLAHE contrast limit
+            tile_grid_size (tuple): CLAHE tile grid
+            grayscale_fast_path (bool): Process single-channel images (L, I;16)
+                on one channel and widen to RGB only at the end
+            decode_min_size (int): Decode large images down to about this short
+                side (see ImageLoader); None decodes at native resolution
+        """
+        if mode not in PREPROCESS_MODES:
+            raise ValueError(f"Unknown preprocessing mode '{mode}', expected one of {PREPROCESS_MODES}")
+
+        self.img_size = img_size
+        self.mode = mode
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tuple(tile_grid_size)
+        self.grayscale_fast_path = grayscale_fast_path and cv2 is not None
+        self._local = threading.local()
+        self._gray_luts = _build_gray_luts() if self.grayscale_fast_path else None
+        self.loader = ImageLoader(min_size=decode_min_size)
+
+        if cv2 is None:
+            print("⚠️ OpenCV not available, using basic normalization")
+
+    def get_options(self):
+        """
+        Constructor arguments that reproduce this engine (used to build
+        identical engines in worker processes)
+
+        Returns:
+            dict: PreprocessingEngine keyword arguments
+        """
+        return {
+            'img_size': self.img_size,
+            'mode': self.mode,
+            'clip_limit': self.clip_limit,
+            'tile_grid_size': self.tile_grid_size,
+            'grayscale_fast_path': self.grayscale_fast_path,
+            'decode_min_size': self.loader.min_size
+        }
+
+    def _get_clahe(self):
+        """
+        CLAHE objects are not safe to share between threads, so each thread
+        creates its own once and reuses it
+
+        Returns:
+            cv2.CLAHE: CLAHE instance for the calling thread
+        """
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid_size)
+            self._local.clahe = clahe
+        return clahe
+
+    def _resize_gray(self, gray):
+        """
+        Resize a single-channel image of any depth to the model input size
+
+        Args:
+            gray (numpy array): uint8, uint16 or float32 image
+
+        Returns:
+            numpy array: Resized image with the same dtype
+        """
+        if gray.shape[0] == self.img_size and gray.shape[1] == self.img_size:
+            return gray
+        if gray.dtype == np.uint8:
+            return np.asarray(Image.fromarray(gray).resize((self.img_size, self.img_size)))
+
+        # 16-bit and float data are resized in PIL's 32-bit float mode
+        resized = np.asarray(
+            Image.fromarray(gray.astype(np.float32)).resize((self.img_size, self.img_size))
+        )
+        if gray.dtype == np.uint16:
+            return np.clip(np.round(resized), 0, 65535).astype(np.uint16)
+        return resized
+
+    def process_grayscale(self, img):
+        """
+        Equalize and resize a single-channel image without the RGB/LAB round trip
+
+        16-bit sources are equalized at 16-bit precision.
+
+        Args:
+            img (PIL.Image): Image in mode L, I;16 or I
+
+        Returns:
+            numpy array: float32 image of shape (img_size, img_size, 3) in
+            [0, 1], a broadcast view of one channel
+        """
+        gray = np.asarray(img)
+        if img.mode == 'L':
+            forward, inverse, scale = self._gray_luts['forward8'], self._gray_luts['inverse8'], 255.0
+        else:
+            gray = stretch_to_uint16(gray)
+            forward, inverse, scale = self._gray_luts['forward16'], self._gray_luts['inverse16'], 1.0
+
+        if self.mode == 'resize_first':
+            with STAGE_SECONDS.time(stage='resize'):
+                gray = self._resize_gray(gray)
+            with STAGE_SECONDS.time(stage='equalize'):
+                gray = inverse[self._get_clahe().apply(forward[gray])]
+        else:
+            with STAGE_SECONDS.time(stage='equalize'):
+                gray = inverse[self._get_clahe().apply(forward[gray])]
+            with STAGE_SECONDS.time(stage='resize'):
+                gray = self._resize_gray(gray)
+
+        gray = gray.astype(np.float32)
+        if scale != 1.0:
+            gray /= scale
+
+        # Widen to 3 channels without copying
+        return np.broadcast_to(gray[:, :, np.newaxis], (self.img_size, self.img_size, 3))
+
+    def _resize(self, img_array):
+        """
+        Resize to the model input size with PIL, like the original pipeline
+
+        Args:
+            img_array (numpy array): uint8 image
+
+        Returns:
+            numpy array: Resized uint8 image
+        """
+        if img_array.shape[0] == self.img_size and img_array.shape[1] == self.img_size:
+            return img_array
+        img = Image.fromarray(img_array).resize((self.img_size, self.img_size))
+        return np.asarray(img)
+
+    def equalize(self, img_array):
+        """
+        Apply CLAHE to the lightness channel of an RGB image
+
+        Args:
+            img_array (numpy array): uint8 RGB image
+
+        Returns:
+            numpy array: Equalized uint8 RGB image
+        """
+        if cv2 is None:
+            return stretch_channels(img_array)
+
+        # Convert to LAB color space, equalize lightness only, convert back
+        lab = cv2.cvtColor(img_array, cv2.COLOR_RGB2LAB)
+        lab[:, :, 0] = self._get_clahe().apply(np.ascontiguousarray(lab[:, :, 0]))
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
+
+    def process(self, img):
+        """
+        Run the preprocessing pipeline on an opened image
+
+        Args:
+            img (PIL.Image): Decoded image
+
+        Returns:
+            numpy array: float32 image of shape (img_size, img_size, 3) in [0, 1]
+        """
+        if self.grayscale_fast_path and img.mode in GRAYSCALE_MODES:
+            return self.process_grayscale(img)
+
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img_array = np.asarray(img)
+
+        if self.mode == 'resize_first':
+            with STAGE_SECONDS.time(stage='resize'):
+                img_array = self._resize(img_array)
+            with STAGE_SECONDS.time(stage='equalize'):
+                img_array = self.equalize(img_array)
+        else:
+            with STAGE_SECONDS.time(stage='equalize'):
+                img_array = self.equalize(img_array)
+            with STAGE_SECONDS.time(stage='resize'):
+                img_array = self._resize(img_array)
+
+        return img_array.astype(np.float32) / 255.0
+
+    def preprocess(self, image_file):
+        """
+        Open and preprocess one image
+
+        Args:
+            image_file: File object or file path
+
+        Returns:
+            numpy array: Image of shape (1, img_size, img_size, 3)
+        """
+        with STAGE_SECONDS.time(stage='decode'):
+            img = self.loader.load(image_file).image
+        return self.process(img)[np.newaxis]
+
+
+PARITY_VARIANTS = {
+    'reference': {'mode': 'reference', 'grayscale_fast_path': False},
+    'reference+grayscale': {'mode': 'reference', 'grayscale_fast_path': True},
+    'resize_first': {'mode': 'resize_first', 'grayscale_fast_path': False},
+    'resize_first+grayscale': {'mode': 'resize_first', 'grayscale_fast_path': True},
+    'resize_first+grayscale+decode448': {
+        'mode': 'resize_first', 'grayscale_fast_path': True, 'decode_min_size': 448
+    }
+}
+
+
+def parity_report(image_files, variants=PARITY_VARIANTS, predictor=None, img_size=224):
+    """
+    Compare engine configurations with the original pipeline
+
+    Args:
+        image_files (list): Image paths
+        variants (dict): Name -> PreprocessingEngine keyword arguments
+        predictor (ChestXrayPredictor): Optional loaded predictor; when given,
+            the report also includes top-1 agreement and probability drift
+        img_size (int): Model input size
+
+    Returns:
+        dict: Per-variant pixel differences, timings and (optionally) prediction drift
+    """
+    reference_outputs = []
+    reference_times = []
+    for path in image_files:
+        start = time.perf_counter()
+        reference_outputs.append(reference_preprocess(path, img_size))
+        reference_times.append(time.perf_counter() - start)
+
+    use_model = predictor is not None and predictor.ready
+    if use_model:
+        reference_probs = np.concatenate([
+            predictor.run_model(output[np.newaxis]) for output in reference_outputs
+        ])
+
+    report = {
+        'images': len(image_files),
+        'reference_ms': 1000 * sum(reference_times) / max(len(reference_times), 1),
+        'variants': {}
+    }
+
+    for name, options in variants.items():
+        engine = PreprocessingEngine(img_size=img_size, **options)
+        outputs = []
+        times = []
+        for path in image_files:
+            start = time.perf_counter()
+            outputs.append(engine.preprocess(path)[0])
+            times.append(time.perf_counter() - start)
+
+        diffs = [np.abs(out - ref) for out, ref in zip(outputs, reference_outputs)]
+        mean_ms = 1000 * sum(times) / max(len(times), 1)
+        decode_stats = engine.loader.get_stats()
+        variant_report = {
+            'mean_ms': mean_ms,
+            'avg_decode_ms': decode_stats['avg_decode_ms'],
+            'avg_peak_pixel_bytes': decode_stats['avg_peak_pixel_bytes'],
+            'speedup': report['reference_ms'] / mean_ms if mean_ms else 0.0,
+            'max_abs_diff': float(max((d.max() for d in diffs), default=0.0)),
+            'mean_abs_diff': float(np.mean([d.mean() for d in diffs])) if diffs else 0.0
+        }
+
+        if use_model:
+            probs = np.concatenate([predictor.run_model(out[np.newaxis]) for out in outputs])
+            variant_report['top1_agreement'] = float(np.mean(
+                np.argmax(probs, axis=1) == np.argmax(reference_probs, axis=1)
+            ))
+            variant_report['max_probability_drift'] = float(np.max(np.abs(probs - reference_probs)))
+
+        report['variants'][name] = variant_report
+
+    return report
+
+
+def make_synthetic_xrays(directory, count=4, size=2048, seed=0):
+    """
+    Write X-ray-like test images (dark background, bright ribcage-like
+    bands, noise) so the report can run without patient data
+
+    Args:
+        directory (str): Output folder
+        count (int): Number of images
+        size (int): Width and height in pixels
+        seed (int): Random seed
+
+    Returns:
+        list: Paths of the written images
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    paths = []
+
+    for index in range(count):
+        lungs = np.exp(-(((x - 0.32) / 0.16) ** 2 + ((y - 0.5) / 0.3) ** 2)) + \
+            np.exp(-(((x - 0.68) / 0.16) ** 2 + ((y - 0.5) / 0.3) ** 2))
+        ribs = 0.5 + 0.5 * np.sin(y * rng.uniform(30, 45) + rng.uniform(0, np.pi))
+        img = 0.2 + 0.5 * lungs * (0.6 + 0.4 * ribs) + rng.normal(0, 0.05, (size, size))
+        img = (np.clip(img, 0, 1) * 255).astype(np.uint8)
+
+        path = os.path.join(directory, f'synthetic_{index}.png')
+        Image.fromarray(img).save(path)
+        paths.append(path)
+
+    return paths
+
+
+if __name__ == '__main__':
+    import json
+
+    # Usage: python preprocessing.py [image_folder] [--with-model]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+
+    if args:
+        folder = args[0]
+        paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if name.lower().endswith(('.png', '.jpg', '.jpeg'))
+        )
+    else:
+        import tempfile
+        print("No image folder given, generating synthetic 2048x2048 X-rays...")
+        paths = make_synthetic_xrays(tempfile.mkdtemp(prefix='xray_parity_'))
+
+    predictor = None
+    if '--with-model' in sys.argv:
+        from model import predictor
+        predictor.ensure_loaded()
+
+    print(json.dumps(parity_report(paths, predictor=predictor), indent=2))
@@ -0,0 +1,242 @@
+"""
+Request Profiling Module
+Opt-in timing breakdown of a single request, optionally with a cProfile or
+sampled-stack dump written to a local directory
+
+A request is profiled when it asks for it (and profiling is enabled) or when
+it is picked by 1-in-N sampling. Stage timings are the same ones reported to
+/metrics, collected for this request only.
+"""
+
+import contextvars
+import cProfile
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from metrics import STAGE_SECONDS
+
+
+PROFILE_TOOLS = ('cprofile', 'sample')
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+def current_profile():
+    """
+    Returns:
+        RequestProfile: Profile of the request being handled, or None
+    """
+    return _current.get()
+
+
+def _record_stage(seconds, labels):
+    profile = _current.get()
+    if profile is not None:
+        profile.add(labels['stage'], seconds)
+
+
+STAGE_SECONDS.add_listener(_record_stage)
+
+
+class StackSampler:
+    """
+    Samples the Python stack of one thread at a fixed interval
+
+    Much cheaper than cProfile (the profiled thread runs at full speed), so it
+    is the default for automatically sampled requests. Output is in the
+    collapsed-stack format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class RequestProfile:
+    """
+    Stage timings (and optionally a profiler) for one request
+    """
+
+    def __init__(self, label, tool=None, dump_dir=None, sampled=False):
+        """
+        Args:
+            label (str): What is being profiled, e.g. the endpoint
+            tool (str): 'cprofile', 'sample' or None for timings only
+            dump_dir (str): Where dumps are written
+            sampled (bool): Picked by 1-in-N sampling rather than requested
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.tool = tool
+        self.dump_dir = dump_dir
+        self.sampled = sampled
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._token = None
+        self._started = None
+        self._result = None
+
+    def add(self, stage, seconds):
+        """
+        Add time spent in a stage; stages that repeat (one per image) are summed
+        """
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def start(self):
+        """
+        Make this the current request's profile and start the profiler
+        """
+        self._token = _current.set(self)
+        self._started = time.perf_counter()
+        if self.tool == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.tool == 'sample':
+            self._profiler = StackSampler(threading.get_ident())
+            self._profiler.start()
+        return self
+
+    def finish(self):
+        """
+        Stop profiling and write the dump, if any
+
+        Safe to call more than once; later calls return the same breakdown.
+
+        Returns:
+            dict: Total and per-stage milliseconds, and the dump path
+        """
+        if self._result is not None:
+            return self._result
+
+        total = time.perf_counter() - self._started
+        if self.tool == 'cprofile':
+            self._profiler.disable()
+        elif self.tool == 'sample':
+            self._profiler.stop()
+        _current.reset(self._token)
+
+        with self._lock:
+            stages = {
+                stage: {'ms': seconds * 1000.0, 'count': count}
+                for stage, (seconds, count) in sorted(
+                    self.stages.items(), key=lambda item: -item[1][0]
+                )
+            }
+
+        self._result = {
+            'id': self.id,
+            'total_ms': total * 1000.0,
+            'stages': stages,
+            'dump': self._write_dump(total, stages) if self.tool else None
+        }
+        return self._result
+
+    def _write_dump(self, total, stages):
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            base = os.path.join(
+                self.dump_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.id}"
+            )
+            if self.tool == 'cprofile':
+                path = base + '.prof'
+                self._profiler.dump_stats(path)
+            else:
+                path = base + '.folded'
+                self._profiler.dump(path)
+
+            with open(base + '.json', 'w') as f:
+                json.dump({
+                    'id': self.id,
+                    'label': self.label,
+                    'sampled': self.sampled,
+                    'tool': self.tool,
+                    'total_ms': total * 1000.0,
+                    'stages': stages,
+                    'dump': path
+                }, f, indent=2)
+            return path
+        except OSError as e:
+            print(f"⚠️  Could not write profile {self.id}: {e}")
+            return None
+
+
+class RequestProfiler:
+    """
+    Decides which requests are profiled and how
+    """
+
+    def __init__(self, enabled=False, dump_dir='profiles', sample_rate=0, sample_tool='sample'):
+        """
+        Args:
+            enabled (bool): Honour the per-request profile flag
+            dump_dir (str): Directory for profile dumps
+            sample_rate (int): Profile 1 in every N requests (0 = never)
+            sample_tool (str): Tool used for sampled requests
+        """
+        if sample_tool not in PROFILE_TOOLS:
+            raise ValueError(f"Unknown profile tool '{sample_tool}', expected one of {PROFILE_TOOLS}")
+
+        self.enabled = enabled
+        self.dump_dir = dump_dir
+        self.sample_rate = max(0, int(sample_rate))
+        self.sample_tool = sample_tool
+        self._counter = itertools.count(1)
+
+    def start(self, label, flag=None):
+        """
+        Start profiling a request if it asked for it or was sampled
+
+        Args:
+            label (str): What is being profiled, e.g. the endpoint
+            flag (str): Value of the request's profile flag: '1' for timings
+                only, or a tool name for timings plus a dump
+
+        Returns:
+            tuple: (RequestProfile or None, whether to return the breakdown
+            in the response)
+        """
+        if self.enabled and flag and flag.lower() not in ('0', 'false', 'no'):
+            tool = flag.lower() if flag.lower() in PROFILE_TOOLS else None
+            return RequestProfile(label, tool, self.dump_dir).start(), True
+
+        if self.sample_rate and next(self._counter) % self.sample_rate == 0:
+            profile = RequestProfile(label, self.sample_tool, self.dump_dir, sampled=True)
+            return profile.start(), False
+
+        return None, False
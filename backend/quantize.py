@@ -0,0 +1,198 @@
+"""
+Post-Training Quantization Tool
+Writes dynamic-range, float16 and full-int8 TFLite variants of the trained
+model and reports size, latency and prediction parity against the float model
+
+Usage: python quantize.py [image_folder] [--model PATH] [--output-dir DIR]
+                          [--calibration N] [--mode reference|resize_first]
+
+Serve a variant with MODEL_PATH=<variant>.tflite (the TFLite backend is
+selected automatically).
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from backends import QUANTIZATIONS, KerasBackend, TFLiteBackend, convert_to_tflite
+from model import predictor
+from preprocessing import PreprocessingEngine, make_synthetic_xrays
+
+
+def list_images(folder):
+    """
+    Image paths in a folder, sorted
+
+    Args:
+        folder (str): Directory with PNG/JPEG images
+
+    Returns:
+        list: Image paths
+    """
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(('.png', '.jpg', '.jpeg'))
+    )
+
+
+def preprocess_images(paths, mode='reference', img_size=224):
+    """
+    Preprocess images exactly as the server does
+
+    Args:
+        paths (list): Image paths
+        mode (str): PreprocessingEngine mode used in serving
+        img_size (int): Model input size
+
+    Returns:
+        numpy array: Batch of shape (N, img_size, img_size, 3)
+    """
+    engine = PreprocessingEngine(img_size=img_size, mode=mode)
+    return np.concatenate([engine.preprocess(path) for path in paths])
+
+
+def quantize_model(model, output_dir, calibration_images, basename='chest_xray_model'):
+    """
+    Write a float32 TFLite model plus every quantized variant
+
+    Args:
+        model (keras.Model): Float model
+        output_dir (str): Directory for the .tflite files
+        calibration_images (numpy array): Representative preprocessed images
+            for int8 calibration
+        basename (str): File name prefix
+
+    Returns:
+        dict: Variant name -> written path
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for quantization in (None,) + QUANTIZATIONS:
+        name = quantization or 'float32'
+        print(f"🔄 Converting {name} variant...")
+        content = convert_to_tflite(
+            model, quantization=quantization, representative_images=calibration_images
+        )
+        path = os.path.join(output_dir, f"{basename}_{name}.tflite")
+        with open(path, 'wb') as f:
+            f.write(content)
+        paths[name] = path
+    return paths
+
+
+def compare_predictions(reference, probs, class_labels):
+    """
+    Prediction parity of one variant against the float model
+
+    Args:
+        reference (numpy array): Float model probabilities (N, num_classes)
+        probs (numpy array): Variant probabilities (N, num_classes)
+        class_labels (dict): Class index -> label
+
+    Returns:
+        dict: Top-1 agreement, overall drift and drift per class
+    """
+    drift = np.abs(probs - reference)
+    return {
+        'top1_agreement': float(np.mean(np.argmax(probs, axis=1) == np.argmax(reference, axis=1))),
+        'max_probability_drift': float(drift.max()),
+        'mean_probability_drift': float(drift.mean()),
+        'per_class_drift': {
+            class_labels[index]: {
+                'mean': float(drift[:, index].mean()),
+                'max': float(drift[:, index].max())
+            }
+            for index in range(reference.shape[1])
+        }
+    }
+
+
+def quantization_report(reference_backend, variant_paths, eval_images, class_labels,
+                        latency_runs=20):
+    """
+    Compare every variant with the float Keras model
+
+    Args:
+        reference_backend (KerasBackend): Loaded float model
+        variant_paths (dict): Variant name -> .tflite path
+        eval_images (numpy array): Preprocessed evaluation images
+        class_labels (dict): Class index -> label
+        latency_runs (int): Timed single-image calls per variant
+
+    Returns:
+        dict: Size, single-image latency and prediction parity per variant
+    """
+    reference_backend.warmup()
+    reference = reference_backend.run(eval_images)
+    model_path = reference_backend.model_path
+
+    report = {
+        'images': len(eval_images),
+        'reference': {
+            'path': model_path,
+            'size_bytes': os.path.getsize(model_path),
+            'latency_ms': reference_backend.measure_baseline(latency_runs)
+        },
+        'variants': {}
+    }
+
+    for name, path in variant_paths.items():
+        backend = TFLiteBackend(path, batch_sizes=(1,))
+        backend.load()
+        backend.warmup()
+        probs = backend.run(eval_images)
+
+        variant_report = {
+            'path': path,
+            'size_bytes': os.path.getsize(path),
+            'size_ratio': os.path.getsize(path) / report['reference']['size_bytes'],
+            'latency_ms': backend.measure_baseline(latency_runs)
+        }
+        variant_report.update(compare_predictions(reference, probs, class_labels))
+        report['variants'][name] = variant_report
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Quantize the chest X-ray model')
+    parser.add_argument('images', nargs='?',
+                        help='Folder of X-rays for calibration and evaluation '
+                             '(default: synthetic images)')
+    parser.add_argument('--model', default='../models/chest_xray_model.h5')
+    parser.add_argument('--output-dir', default='../models/quantized')
+    parser.add_argument('--calibration', type=int, default=100,
+                        help='Images used to calibrate the int8 variant')
+    parser.add_argument('--mode', default=os.environ.get('PREPROCESS_MODE', 'reference'),
+                        help='Preprocessing mode used in serving')
+    args = parser.parse_args()
+
+    if args.images:
+        paths = list_images(args.images)
+    else:
+        print("No image folder given, generating synthetic 2048x2048 X-rays...")
+        print("⚠️  Calibrate and evaluate on real X-rays before serving an int8 model")
+        paths = make_synthetic_xrays(tempfile.mkdtemp(prefix='xray_quant_'), count=16)
+
+    images = preprocess_images(paths, mode=args.mode)
+    # Evenly spaced calibration subset, so it is not all one class of a sorted folder
+    step = max(1, len(images) // max(1, args.calibration))
+    calibration = images[::step][:args.calibration]
+
+    float_backend = KerasBackend(args.model, batch_sizes=(1,))
+    float_backend.load()
+
+    basename = os.path.splitext(os.path.basename(args.model))[0]
+    variant_paths = quantize_model(float_backend.model, args.output_dir, calibration, basename)
+    report = quantization_report(float_backend, variant_paths, images, predictor.class_labels)
+    report['calibration_images'] = len(calibration)
+
+    report_path = os.path.join(args.output_dir, 'quantization_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"\n📄 Report written to {report_path}")
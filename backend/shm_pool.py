@@ -0,0 +1,489 @@
+"""
+Process-Pool Preprocessing Module
+Preprocesses images in worker processes that write finished tensors straight
+into a shared-memory batch buffer read by the inference process
+"""
+
+import atexit
+import io
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from metrics import STAGE_SECONDS
+from parallel import PoolFullError
+
+
+# Per-worker state, created by _init_worker
+_worker_engine = None
+_worker_buffers = {}
+_worker_timings = []
+
+
+def _collect_stage(seconds, labels):
+    _worker_timings.append((labels['stage'], seconds))
+
+
+def _init_worker(engine_options):
+    """
+    Build one PreprocessingEngine per worker process
+    """
+    global _worker_engine
+    from preprocessing import PreprocessingEngine, cv2
+
+    # Parallelism comes from the processes; keep OpenCV single-threaded in each
+    if cv2 is not None:
+        cv2.setNumThreads(1)
+    _worker_engine = PreprocessingEngine(**engine_options)
+    # Stage timings are sent back with each result; the parent's metrics
+    # cannot see this process's histograms
+    STAGE_SECONDS.add_listener(_collect_stage)
+
+
+def _attach(name):
+    """
+    Map a batch buffer created by the parent, once per worker
+
+    The parent owns (and unlinks) every buffer, so workers must not
+    unregister it from the shared resource tracker.
+    """
+    shm = _worker_buffers.get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_buffers[name] = shm
+    return shm
+
+
+def _preprocess_into(task):
+    """
+    Preprocess one image into its slot of a shared batch buffer
+
+    Args:
+        task (tuple): (buffer name, buffer capacity, slot, image path or bytes,
+            whether the buffer is pooled and worth keeping mapped)
+
+    Returns:
+        tuple: (slot, [(stage, seconds), ...] recorded while preprocessing)
+    """
+    name, capacity, slot, source, pooled = task
+    _worker_timings.clear()
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    # One-off buffers are unmapped right away so their memory is freed
+    # as soon as the parent destroys them
+    shm = _attach(name) if pooled else shared_memory.SharedMemory(name=name)
+    img_size = _worker_engine.img_size
+    batch = np.ndarray(
+        (capacity, img_size, img_size, 3), dtype=np.float32, buffer=shm.buf
+    )
+    try:
+        batch[slot] = _worker_engine.preprocess(source)[0]
+    finally:
+        if not pooled:
+            del batch
+            shm.close()
+    return slot, list(_worker_timings)
+
+
+def _noop(_):
+    return os.getpid()
+
+
+class _SharedBatchBuffer:
+    """
+    A reusable shared-memory block holding up to `capacity` input tensors
+    """
+
+    def __init__(self, capacity, img_size):
+        self.capacity = capacity
+        self.img_size = img_size
+        nbytes = capacity * img_size * img_size * 3 * np.dtype(np.float32).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        # Workers forked later (on start or after a restart) would otherwise
+        # inherit the mapping and keep the memory alive after destroy()
+        if hasattr(mmap, 'MADV_DONTFORK'):
+            self.shm._mmap.madvise(mmap.MADV_DONTFORK)
+        self.array = np.ndarray(
+            (capacity, img_size, img_size, 3), dtype=np.float32, buffer=self.shm.buf
+        )
+
+    def destroy(self):
+        self.array = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A caller still holds a view; the mapping goes away with it
+            pass
+        self.shm.unlink()
+
+
+class SharedMemoryPreprocessPool:
+    """
+    Process-based alternative to PreprocessPool for bulk jobs
+
+    CLAHE and the colour-space work hold the GIL in places, so heavy batches
+    scale better across processes. Each batch gets a shared-memory buffer;
+    workers write finished 224x224x3 float32 tensors into their slot and the
+    batch returned to ChestXrayPredictor is a view of that buffer, so no
+    tensor is copied or pickled on the way back. Buffers of buffer_capacity
+    slots are reused after release_batch; a larger batch gets a one-off
+    buffer that is freed when it is released. If a worker process dies, the
+    workers are restarted.
+    """
+
+    def __init__(self, engine_options, processes=None, max_pending=256, buffer_capacity=32,
+                 submit_timeout=5.0):
+        """
+        Initialize the pool
+
+        Args:
+            engine_options (dict): PreprocessingEngine arguments for the workers
+            processes (int): Worker processes (default: CPU count)
+            max_pending (int): Images queued or running across all batches
+            buffer_capacity (int): Slots per reusable batch buffer
+            submit_timeout (float): Seconds to wait for a free slot before
+                raising PoolFullError
+        """
+        self.engine_options = dict(engine_options)
+        self.img_size = self.engine_options.get('img_size', 224)
+        self.processes = max(1, int(processes or os.cpu_count() or 1))
+        self.max_pending = max(1, int(max_pending))
+        self.buffer_capacity = max(1, int(buffer_capacity))
+        self.submit_timeout = submit_timeout
+
+        # Forked workers skip re-importing the serving module (a spawned worker
+        # would re-run app.py and load the model again). They only run
+        # PIL/OpenCV code, never TensorFlow.
+        start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._mp_context = multiprocessing.get_context(start_method)
+
+        # Workers must share our resource tracker; one started inside a worker
+        # would unlink the buffers when that worker exits
+        resource_tracker.ensure_running()
+        self._executor = self._create_executor()
+
+        # One slot per image queued or running, released as each one finishes,
+        # so a batch larger than max_pending streams through the pool
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._free_buffers = []
+        self._in_use = {}  # id(batch view) -> buffer
+        self._buffers_created = 0
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._restarts = 0
+
+        atexit.register(self.shutdown)
+
+    @classmethod
+    def from_engine(cls, engine, **kwargs):
+        """
+        Create a pool whose workers reproduce an existing PreprocessingEngine
+
+        Args:
+            engine (PreprocessingEngine): Engine used in the serving process
+            **kwargs: Other SharedMemoryPreprocessPool arguments
+
+        Returns:
+            SharedMemoryPreprocessPool: New pool
+        """
+        return cls(engine.get_options(), **kwargs)
+
+    def warmup(self):
+        """
+        Start every worker process now rather than on the first batch
+
+        Returns:
+            float: Seconds taken
+        """
+        start = time.perf_counter()
+        list(self._executor.map(_noop, range(self.processes)))
+        return time.perf_counter() - start
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=self._mp_context,
+            initializer=_init_worker,
+            initargs=(self.engine_options,)
+        )
+
+    def _restart(self, broken):
+        """
+        Replace a process pool whose worker died, unless another thread
+        already did
+        """
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._create_executor()
+            self._restarts += 1
+        print("⚠️  A preprocessing worker process died, restarting the workers")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, task):
+        """
+        Returns:
+            tuple: (future, executor it was submitted to)
+        """
+        executor = self._executor
+        try:
+            return executor.submit(_preprocess_into, task), executor
+        except BrokenProcessPool:
+            # A worker died since the last batch
+            self._restart(executor)
+            executor = self._executor
+            return executor.submit(_preprocess_into, task), executor
+
+    def _acquire_buffer(self, count):
+        with self._lock:
+            for index, buffer in enumerate(self._free_buffers):
+                if buffer.capacity >= count:
+                    return self._free_buffers.pop(index)
+            self._buffers_created += 1
+        return _SharedBatchBuffer(max(count, self.buffer_capacity), self.img_size)
+
+    def preprocess_batch(self, preprocess, image_files):
+        """
+        Preprocess images in worker processes into one shared batch buffer
+
+        Args:
+            preprocess (callable): Unused; workers run their own engine built
+                from engine_options
+            image_files (list): File objects or file paths
+
+        Returns:
+            tuple: (batch view or None, indices of the stacked images,
+            {index: error message} for the failed ones). Pass the batch to
+            release_batch once inference is done.
+        """
+        count = len(image_files)
+        if count == 0:
+            return None, [], {}
+
+        buffer = self._acquire_buffer(count)
+        pooled = buffer.capacity <= self.buffer_capacity
+        errors = {}
+        futures = []
+        broken = set()
+        try:
+            for slot, image_file in enumerate(image_files):
+                if isinstance(image_file, str):
+                    source = image_file
+                else:
+                    # Compressed bytes are small; only they cross the process boundary
+                    stream = getattr(image_file, 'stream', image_file)
+                    stream.seek(0)
+                    source = stream.read()
+
+                if not self._slots.acquire(timeout=self.submit_timeout):
+                    with self._lock:
+                        self._rejected += count - slot
+                    raise PoolFullError(
+                        f'Preprocessing queue is full ({self.max_pending} pending images)'
+                    )
+                with self._lock:
+                    self._pending += 1
+                try:
+                    future, executor = self._submit(
+                        (buffer.shm.name, buffer.capacity, slot, source, pooled)
+                    )
+                except Exception:
+                    self._slots.release()
+                    with self._lock:
+                        self._pending -= 1
+                    raise
+                future.add_done_callback(self._on_done)
+                futures.append((future, executor))
+
+            for slot, (future, executor) in enumerate(futures):
+                try:
+                    _, timings = future.result()
+                except BrokenProcessPool:
+                    broken.add(executor)
+                    errors[slot] = 'Preprocessing worker exited unexpectedly'
+                except Exception as e:
+                    errors[slot] = str(e)
+                else:
+                    for stage, seconds in timings:
+                        STAGE_SECONDS.observe(seconds, stage=stage)
+        except Exception:
+            # Workers may still be writing into the buffer
+            for future, _ in futures:
+                future.cancel()
+            for future, _ in futures:
+                if not future.cancelled():
+                    future.exception()
+            self._return_buffer(buffer)
+            raise
+
+        for executor in broken:
+            self._restart(executor)
+
+        with self._lock:
+            self._failed += len(errors)
+            self._completed += count - len(errors)
+
+        valid_indices = [index for index in range(count) if index not in errors]
+        if not valid_indices:
+            self._return_buffer(buffer)
+            return None, [], errors
+
+        if len(valid_indices) == count:
+            batch = buffer.array[:count]
+        else:
+            # Compact the successful tensors to the front of the buffer
+            for position, index in enumerate(valid_indices):
+                if position != index:
+                    buffer.array[position] = buffer.array[index]
+            batch = buffer.array[:len(valid_indices)]
+
+        with self._lock:
+            self._in_use[id(batch)] = buffer
+        return batch, valid_indices, errors
+
+    def _on_done(self, future):
+        self._slots.release()
+        with self._lock:
+            self._pending -= 1
+
+    def _return_buffer(self, buffer):
+        if buffer.capacity > self.buffer_capacity:
+            # Keeping every oversized buffer would pin the largest batch
+            # ever seen in /dev/shm for the life of the process
+            buffer.destroy()
+            return
+        with self._lock:
+            self._free_buffers.append(buffer)
+
+    def release_batch(self, batch):
+        """
+        Hand a batch buffer back for reuse
+
+        Args:
+            batch (numpy array): Batch returned by preprocess_batch
+        """
+        if batch is None:
+            return
+        with self._lock:
+            buffer = self._in_use.pop(id(batch), None)
+        if buffer is not None:
+            self._return_buffer(buffer)
+
+    def get_stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: Settings and counters
+        """
+        with self._lock:
+            return {
+                'type': 'processes',
+                'processes': self.processes,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'shared_buffers': self._buffers_created,
+                'buffers_in_use': len(self._in_use),
+                'buffers_free': len(self._free_buffers),
+                'restarts': self._restarts
+            }
+
+    def shutdown(self):
+        """
+        Stop the workers and free every shared buffer
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        atexit.unregister(self.shutdown)
+        with self._lock:
+            buffers = self._free_buffers + list(self._in_use.values())
+            self._free_buffers = []
+            self._in_use = {}
+        for buffer in buffers:
+            buffer.destroy()
+
+
+def benchmark_scaling(image_paths, engine_options, process_counts, repeats=3):
+    """
+    Measure preprocessing throughput for increasing worker counts
+
+    Args:
+        image_paths (list): Images preprocessed in one batch per run
+        engine_options (dict): PreprocessingEngine arguments
+        process_counts (list): Worker counts to try
+        repeats (int): Timed runs per worker count (best is reported)
+
+    Returns:
+        dict: Sequential baseline plus images/s and speedup per worker count
+    """
+    from preprocessing import PreprocessingEngine
+
+    engine = PreprocessingEngine(**engine_options)
+    sequential = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in image_paths:
+            engine.preprocess(path)
+        sequential = min(sequential, time.perf_counter() - start)
+
+    report = {
+        'images': len(image_paths),
+        'cpu_count': os.cpu_count(),
+        'sequential_images_per_s': len(image_paths) / sequential,
+        'processes': {}
+    }
+
+    for processes in process_counts:
+        pool = SharedMemoryPreprocessPool(engine_options, processes=processes)
+        pool.warmup()
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            batch, _, errors = pool.preprocess_batch(None, image_paths)
+            best = min(best, time.perf_counter() - start)
+            pool.release_batch(batch)
+        pool.shutdown()
+
+        report['processes'][processes] = {
+            'images_per_s': len(image_paths) / best,
+            'speedup': sequential / best,
+            'errors': len(errors)
+        }
+
+    return report
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+    import tempfile
+
+    from preprocessing import make_synthetic_xrays
+
+    # Usage: python shm_pool.py [image_folder]
+    if len(sys.argv) > 1:
+        folder = sys.argv[1]
+        paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if name.lower().endswith(('.png', '.jpg', '.jpeg'))
+        )
+    else:
+        print("No image folder given, generating synthetic 2048x2048 X-rays...")
+        paths = make_synthetic_xrays(tempfile.mkdtemp(prefix='xray_bench_'), count=16)
+
+    cpus = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    print(json.dumps(benchmark_scaling(paths, {'img_size': 224}, counts), indent=2))
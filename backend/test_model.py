@@ -10,6 +10,7 @@ print("🧪 MODEL CLASS LABELS VERIFICATION")
 print("="*60)
 
 # Get model info
+predictor.ensure_loaded()
 info = predictor.get_model_info()
 
 if info['loaded']:
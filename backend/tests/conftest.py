@@ -0,0 +1,51 @@
+"""
+Shared fixtures for the backend tests
+
+Run from backend/ with:
+    python -m pytest tests
+"""
+
+import io
+import os
+import sys
+import tempfile
+
+import pytest
+from PIL import Image
+
+# The backend modules are imported flat, as the server does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests that import app.py must not start loading the real model or keep
+# their jobs in the working tree
+os.environ.setdefault('MODEL_LOAD_MODE', 'lazy')
+os.environ.setdefault('JOBS_DIR', os.path.join(tempfile.mkdtemp(prefix='xray-tests-'), 'jobs'))
+
+
+@pytest.fixture
+def png_bytes():
+    """
+    Factory for encoded PNG images: png_bytes(mode='L', size=(64, 64), color=128)
+    """
+    def make(mode='L', size=(64, 64), color=128):
+        buffer = io.BytesIO()
+        Image.new(mode, size, color).save(buffer, 'PNG')
+        return buffer.getvalue()
+    return make
+
+
+@pytest.fixture
+def png_files(tmp_path, png_bytes):
+    """
+    Factory writing count PNG files under tmp_path: png_files(count, subdir='')
+    """
+    def make(count, subdir=''):
+        directory = tmp_path / subdir
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for index in range(count):
+            path = directory / f'{index:03d}.png'
+            path.write_bytes(png_bytes(color=index % 256))
+            paths.append(str(path))
+        return paths
+    return make
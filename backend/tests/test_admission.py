@@ -0,0 +1,223 @@
+"""
+Tests for admission control, request deadlines and Retry-After on overload,
+in the batcher and on both servers
+"""
+
+import io
+import time
+
+import numpy as np
+import pytest
+
+import app as flask_module
+from admission import (
+    AdmissionController, DeadlineExceeded, check_deadline, current_deadline, parse_timeout,
+    reset_deadline, set_deadline
+)
+from batching import MicroBatcher
+from parallel import PoolFullError
+
+
+@pytest.mark.parametrize('value, maximum, expected', [
+    (None, 30, 30),
+    ('5', 30, 5),
+    ('60', 30, 30),
+    ('0.5', 0, 0.5),
+    (None, 0, None),
+    ('-1', 30, 30),
+    ('soon', 30, 30),
+])
+def test_parse_timeout(value, maximum, expected):
+    assert parse_timeout(value, maximum) == expected
+
+
+def test_deadline_follows_the_request_context():
+    assert current_deadline() is None
+    check_deadline()
+
+    token = set_deadline(time.perf_counter() - 0.01)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            check_deadline()
+    finally:
+        reset_deadline(token)
+
+    assert current_deadline() is None
+    check_deadline(time.perf_counter() + 10)
+
+
+def test_admission_limit():
+    controller = AdmissionController(max_in_flight=2)
+
+    assert controller.try_acquire() and controller.try_acquire()
+    assert not controller.try_acquire()
+    controller.release()
+    assert controller.try_acquire()
+    assert controller.get_stats() == {'max_in_flight': 2, 'in_flight': 2, 'admitted': 3, 'rejected': 1}
+
+
+def test_zero_limit_admits_everything():
+    controller = AdmissionController(max_in_flight=0)
+
+    assert all(controller.try_acquire() for _ in range(100))
+
+
+class FakePredictor:
+    def predict_arrays(self, img_batch):
+        return [{'success': True, 'value': float(img[0, 0, 0])} for img in img_batch]
+
+
+def image(value):
+    return np.full((4, 4, 3), value, dtype=np.float32)
+
+
+@pytest.fixture
+def idle_batcher(monkeypatch):
+    """
+    Batcher whose worker thread never starts, so batches can be taken by hand
+    """
+    def make(**kwargs):
+        batcher = MicroBatcher(FakePredictor(), **kwargs)
+        monkeypatch.setattr(batcher, 'start', lambda: None)
+        return batcher
+    return make
+
+
+def test_expired_requests_are_dropped_before_the_forward_pass(idle_batcher):
+    batcher = idle_batcher()
+    token = set_deadline(time.perf_counter() - 1.0)
+    try:
+        expired = batcher.submit_async(image(0))
+    finally:
+        reset_deadline(token)
+    live = batcher.submit_async(image(1))
+
+    batch = batcher._drop_expired(batcher._take())
+
+    assert [item.future for item in batch] == [live]
+    with pytest.raises(DeadlineExceeded):
+        expired.result(timeout=0)
+    assert batcher.get_stats()['expired'] == 1
+
+
+def test_waiting_for_room_stops_at_the_deadline(idle_batcher):
+    batcher = idle_batcher(max_queue_size=1)
+    batcher.submit_async(image(0))
+
+    token = set_deadline(time.perf_counter() + 0.05)
+    try:
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            batcher.submit_async(image(0), timeout=10)
+    finally:
+        reset_deadline(token)
+    assert time.perf_counter() - started < 1.0
+
+
+@pytest.fixture
+def model_ready(monkeypatch):
+    """
+    Let requests past the model check without loading the real model
+    """
+    monkeypatch.setitem(flask_module.app.config, 'MODEL_LOAD_MODE', 'background')
+    monkeypatch.setattr(flask_module.predictor, 'state', 'ready')
+
+
+@pytest.fixture
+def full_admission(monkeypatch):
+    admission = flask_module.admission
+    monkeypatch.setattr(admission, 'max_in_flight', 1)
+    assert admission.try_acquire()
+    yield
+    admission.release()
+
+
+class Server:
+    """
+    The Flask or the ASGI app behind one interface: responses come back as
+    (status code, headers, JSON body)
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        if kind == 'flask':
+            self.client = flask_module.app.test_client()
+        else:
+            pytest.importorskip('starlette')
+            pytest.importorskip('httpx')
+            from starlette.testclient import TestClient
+
+            import asgi_app
+            self.client = TestClient(asgi_app.app)
+
+    def _result(self, response):
+        body = response.get_json() if self.kind == 'flask' else response.json()
+        return response.status_code, response.headers, body
+
+    def predict(self, image, headers=None):
+        if self.kind == 'flask':
+            response = self.client.post('/api/predict', data={'file': (io.BytesIO(image), 'scan.png')},
+                                        headers=headers, content_type='multipart/form-data')
+        else:
+            response = self.client.post('/api/predict', files={'file': ('scan.png', image, 'image/png')},
+                                        headers=headers)
+        return self._result(response)
+
+    def get(self, path):
+        return self._result(self.client.get(path))
+
+
+@pytest.fixture(params=['flask', 'asgi'])
+def server(request):
+    return Server(request.param)
+
+
+def test_over_the_in_flight_limit_gets_429(server, full_admission, png_bytes):
+    status, headers, body = server.predict(png_bytes())
+
+    assert status == 429
+    assert headers['Retry-After'] == str(flask_module.app.config['BUSY_RETRY_AFTER'])
+    assert 'Too many requests in flight' in body['error']
+    # Only prediction endpoints are limited
+    assert server.get('/api/health')[0] == 200
+
+
+def test_admission_is_released_after_each_request(server, model_ready, png_bytes):
+    before = flask_module.admission.get_stats()
+
+    server.predict(png_bytes(), headers={'X-Request-Timeout': '0.000001'})
+
+    after = flask_module.admission.get_stats()
+    assert after['in_flight'] == before['in_flight']
+    assert after['admitted'] == before['admitted'] + 1
+
+
+def test_expired_deadline_gets_504(server, model_ready, png_bytes):
+    status, _, body = server.predict(png_bytes(), headers={'X-Request-Timeout': '0.000001'})
+
+    assert status == 504
+    assert body['error'].startswith('Deadline exceeded')
+
+
+def test_full_preprocessing_pool_gets_503_with_retry_after(server, model_ready, png_bytes,
+                                                           monkeypatch):
+    def busy(images):
+        raise PoolFullError('no free preprocessing slot')
+
+    monkeypatch.setattr(flask_module.predictor, 'preprocess_many', busy)
+    status, headers, body = server.predict(png_bytes())
+
+    assert status == 503
+    assert headers['Retry-After'] == str(flask_module.app.config['BUSY_RETRY_AFTER'])
+    assert body['error'] == 'Server busy: no free preprocessing slot'
+
+
+def test_loading_model_gets_503_with_retry_after(server, monkeypatch, png_bytes):
+    monkeypatch.setitem(flask_module.app.config, 'MODEL_LOAD_MODE', 'background')
+    monkeypatch.setattr(flask_module.predictor, 'state', 'loading')
+
+    status, headers, body = server.predict(png_bytes())
+
+    assert status == 503
+    assert headers['Retry-After'] == str(flask_module.app.config['MODEL_RETRY_AFTER'])
+    assert body['model_state'] == 'loading'
@@ -0,0 +1,103 @@
+"""
+Tests for the ASGI server's request handling: body size limit, request
+metrics and per-request profiling
+"""
+
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('httpx')
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+import asgi_app  # noqa: E402
+from metrics import STAGE_SECONDS, registry  # noqa: E402
+
+MULTIPART = {'content-type': 'multipart/form-data; boundary=xray'}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(asgi_app.config, 'MAX_CONTENT_LENGTH', 4096)
+    return TestClient(asgi_app.app)
+
+
+def chunks(count, size=1024):
+    for _ in range(count):
+        yield b'x' * size
+
+
+def metric(line_prefix):
+    for line in registry.render().splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_declared_length_over_the_limit_is_rejected(client):
+    response = client.post('/api/jobs', content=b'x' * 5000, headers=MULTIPART)
+
+    assert response.status_code == 413
+    assert response.json() == {'success': False, 'error': 'File too large. Maximum size is 16MB.'}
+
+
+def test_chunked_upload_over_the_limit_is_cut_off(client):
+    response = client.post('/api/jobs', content=chunks(50), headers=MULTIPART)
+
+    assert response.status_code == 413
+    assert response.json()['error'] == 'File too large. Maximum size is 16MB.'
+    assert 'content-length' not in response.request.headers
+
+
+def test_chunked_upload_under_the_limit_reaches_the_endpoint(client):
+    body = b'--xray--\r\n'
+    response = client.post('/api/jobs', content=iter([body]), headers=MULTIPART)
+
+    assert response.status_code == 400
+    assert response.json()['error'] == 'No files uploaded'
+
+
+def test_requests_are_counted_by_route(client):
+    label = 'xray_http_requests_total{endpoint="/api/jobs/<job_id>",method="GET",status="404"}'
+    before = metric(label)
+
+    assert client.get('/api/jobs/0123456789abcdef').status_code == 404
+
+    assert metric(label) == before + 1
+    assert metric('xray_http_requests_in_flight') == 0
+
+
+@pytest.fixture
+def profiled_client(monkeypatch):
+    monkeypatch.setattr(asgi_app.profiler, 'enabled', True)
+
+    async def predict(request):
+        STAGE_SECONDS.observe(0.002, stage='decode')
+        return JSONResponse(asgi_app.with_profile(request, {'success': True}))
+
+    app = Starlette(routes=[Route('/api/predict', predict, methods=['POST'])],
+                    middleware=[Middleware(asgi_app.ProfileMiddleware)])
+    return TestClient(app)
+
+
+@pytest.mark.parametrize('query, headers', [('?profile=1', {}), ('', {'X-Profile': '1'})])
+def test_profile_flag_adds_the_breakdown(profiled_client, query, headers):
+    body = profiled_client.post('/api/predict' + query, headers=headers).json()
+
+    assert body['success']
+    assert body['profile']['stages']['decode']['count'] == 1
+    assert body['profile']['dump'] is None
+
+
+def test_unprofiled_requests_are_unchanged(profiled_client):
+    assert profiled_client.post('/api/predict').json() == {'success': True}
+
+
+def test_profiling_needs_to_be_enabled(profiled_client, monkeypatch):
+    monkeypatch.setattr(asgi_app.profiler, 'enabled', False)
+
+    assert 'profile' not in profiled_client.post('/api/predict?profile=1').json()
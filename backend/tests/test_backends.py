@@ -0,0 +1,114 @@
+"""
+Tests for the Keras and TFLite inference backends on a tiny model
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+
+from backends import KerasBackend, TFLiteBackend, create_backend  # noqa: E402
+
+IMG_SIZE = 16
+
+
+@pytest.fixture(scope='module')
+def model_path(tmp_path_factory):
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(0)
+    model = keras.Sequential([
+        keras.Input((IMG_SIZE, IMG_SIZE, 3)),
+        keras.layers.Conv2D(4, 3, activation='relu'),
+        keras.layers.GlobalAveragePooling2D(),
+        keras.layers.Dense(3, activation='softmax')
+    ])
+    path = str(tmp_path_factory.mktemp('models') / 'tiny.h5')
+    model.save(path)
+    return path
+
+
+@pytest.fixture(scope='module')
+def tflite_path(model_path, tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp('cache'))
+    backend = TFLiteBackend(model_path, img_size=IMG_SIZE, model_cache_dir=cache_dir)
+    backend.load()
+    return backend.flatbuffer_path
+
+
+@pytest.fixture(scope='module')
+def keras_backend(model_path):
+    backend = KerasBackend(model_path, img_size=IMG_SIZE, batch_sizes=(1, 4))
+    backend.load()
+    backend.warmup()
+    return backend
+
+
+def images(count, seed=0):
+    return np.random.default_rng(seed).random((count, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+
+
+def test_tflite_matches_keras(keras_backend, model_path):
+    tflite = TFLiteBackend(model_path, img_size=IMG_SIZE, batch_sizes=(1, 4))
+    tflite.load()
+
+    for count in (1, 3, 4):
+        batch = images(count, seed=count)
+        np.testing.assert_allclose(tflite.run(batch), keras_backend.run(batch), atol=1e-5)
+
+
+def test_interpreters_are_capped_per_thread(keras_backend, tflite_path):
+    backend = TFLiteBackend(tflite_path, img_size=IMG_SIZE, batch_sizes=(1, 4))
+    backend.load()
+
+    for count in (1, 2, 3, 4, 5, 7, 4, 1, 2):
+        batch = images(count, seed=count)
+        np.testing.assert_allclose(backend.run(batch), keras_backend.run(batch), atol=1e-5)
+
+    info = backend.describe()
+    # Sizes 1 and 4 plus one interpreter resized for 2, 3, 5, 7 and 2 again
+    assert info['interpreters'] == 3
+    assert info['interpreter_resizes'] == 4
+    assert backend.get_latency_stats()['calls'] == 9
+
+
+def test_every_thread_gets_its_own_interpreters(tflite_path):
+    backend = TFLiteBackend(tflite_path, img_size=IMG_SIZE, batch_sizes=(1,))
+    backend.load()
+    expected = backend.run(images(1))
+
+    results = []
+
+    def predict():
+        results.append(backend.run(images(1)))
+
+    threads = [threading.Thread(target=predict) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.describe()['interpreters'] == 4
+    for result in results:
+        np.testing.assert_array_equal(result, expected)
+
+
+def test_shared_weights_read_the_tflite_file(keras_backend, tflite_path):
+    backend = TFLiteBackend(tflite_path, img_size=IMG_SIZE, share_weights=True)
+    backend.load()
+
+    assert backend.model_content is None
+    assert backend.describe()['shared_weights']
+    np.testing.assert_allclose(backend.run(images(2)), keras_backend.run(images(2)), atol=1e-5)
+
+
+def test_shared_weights_need_a_flatbuffer_file(model_path):
+    with pytest.raises(ValueError):
+        TFLiteBackend(model_path, img_size=IMG_SIZE, share_weights=True).load()
+
+
+def test_unknown_backend_is_rejected(model_path):
+    with pytest.raises(ValueError):
+        create_backend('onnx', model_path)
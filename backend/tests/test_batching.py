@@ -0,0 +1,105 @@
+"""
+Tests for the micro-batcher: batching, ordering of results, bounded
+queues and failure handling
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher, QueueFullError
+
+
+class FakePredictor:
+    """
+    Answers with the first pixel of each image, so results can be matched
+    to their requests
+    """
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    def predict_arrays(self, img_batch):
+        self.batches.append(len(img_batch))
+        if self.fail:
+            raise RuntimeError('forward pass failed')
+        return [{'success': True, 'value': float(img[0, 0, 0])} for img in img_batch]
+
+
+def image(value):
+    return np.full((4, 4, 3), value, dtype=np.float32)
+
+
+@pytest.fixture
+def idle_batcher(monkeypatch):
+    """
+    Batcher whose worker thread never starts, so batches can be taken by hand
+    """
+    def make(**kwargs):
+        batcher = MicroBatcher(FakePredictor(), **kwargs)
+        monkeypatch.setattr(batcher, 'start', lambda: None)
+        return batcher
+    return make
+
+
+def test_results_follow_their_requests():
+    batcher = MicroBatcher(FakePredictor(), max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit_async(image(value)) for value in range(10)]
+
+    assert [future.result(timeout=5)['value'] for future in futures] == list(range(10))
+    assert batcher.get_stats()['items'] == 10
+
+
+def test_concurrent_requests_share_a_forward_pass():
+    predictor = FakePredictor()
+    batcher = MicroBatcher(predictor, max_batch_size=4, max_wait_ms=1000)
+    futures = [batcher.submit_async(image(value)) for value in range(4)]
+
+    for future in futures:
+        future.result(timeout=5)
+    assert predictor.batches == [4]
+    assert batcher.get_stats()['batch_size_counts'] == {4: 1}
+
+
+def test_failed_forward_pass_fails_every_request_of_the_batch():
+    batcher = MicroBatcher(FakePredictor(fail=True), max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit_async(image(0)) for _ in range(3)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    assert batcher.get_stats()['failed_batches'] >= 1
+
+
+def test_full_queue_rejects(idle_batcher):
+    batcher = idle_batcher(max_queue_size=2)
+    batcher.submit_async(image(0))
+    batcher.submit_async(image(0))
+
+    with pytest.raises(QueueFullError):
+        batcher.submit_async(image(0))
+    assert batcher.get_stats()['rejected'] == 1
+
+
+def test_blocked_submit_proceeds_when_room_frees_up():
+    release = threading.Event()
+
+    class SlowPredictor(FakePredictor):
+        def predict_arrays(self, img_batch):
+            release.wait(5)
+            return super().predict_arrays(img_batch)
+
+    batcher = MicroBatcher(SlowPredictor(), max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+    first = batcher.submit_async(image(0))
+    # Wait until the worker holds the first image, then fill the queue
+    while batcher.queue_depth():
+        time.sleep(0.001)
+    second = batcher.submit_async(image(1))
+
+    threading.Timer(0.05, release.set).start()
+    third = batcher.submit_async(image(2), timeout=5)
+
+    assert [future.result(timeout=5)['value'] for future in (first, second, third)] == [0, 1, 2]
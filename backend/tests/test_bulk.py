@@ -0,0 +1,129 @@
+"""
+Tests for the bulk scorer: output, checkpoints and resuming
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from bulk import CheckpointError, run_bulk
+
+
+class FakePredictor:
+    """
+    Scores every readable image as Normal; can fail preprocessing after a
+    number of batches to simulate an interrupted run
+    """
+
+    class_labels = {0: 'Normal', 1: 'Other'}
+
+    def __init__(self, model_path, crash_after_batches=None):
+        self.model_path = model_path
+        self.crash_after_batches = crash_after_batches
+        self.batches = 0
+
+    def preprocess_many(self, paths):
+        if self.crash_after_batches is not None and self.batches >= self.crash_after_batches:
+            raise RuntimeError('interrupted')
+        self.batches += 1
+        valid = [index for index, path in enumerate(paths) if not path.endswith('bad.png')]
+        errors = {index: 'cannot identify image file' for index in range(len(paths)) if index not in valid}
+        batch = np.zeros((len(valid), 1, 1, 3), dtype=np.float32)
+        return batch, valid, errors
+
+    def predict_arrays(self, batch):
+        return [{
+            'success': True,
+            'predicted_class': 'Normal',
+            'confidence': 1.0,
+            'all_probabilities': {'Normal': 1.0, 'Other': 0.0}
+        } for _ in batch]
+
+    def release_batch(self, batch):
+        pass
+
+
+@pytest.fixture
+def archive(tmp_path, png_files):
+    png_files(5, 'images/a')
+    png_files(4, 'images/b')
+    (tmp_path / 'images' / 'b' / 'bad.png').write_bytes(b'not an image')
+    return str(tmp_path / 'images')
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / 'model.h5'
+    path.write_bytes(b'weights')
+    return str(path)
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_scores_every_image_once(archive, model_path, tmp_path):
+    output = str(tmp_path / 'scores.jsonl')
+    summary = run_bulk(FakePredictor(model_path), archive, output, batch_size=3, progress_every=60)
+
+    records = read_jsonl(output)
+    assert summary['total_images'] == 10
+    assert summary['failed'] == 1
+    assert len(records) == 10
+    assert [record['path'] for record in records] == sorted(record['path'] for record in records)
+    failed = [record for record in records if not record['success']]
+    assert [record['path'] for record in failed] == ['b/bad.png']
+
+
+def test_resume_continues_after_the_last_checkpoint(archive, model_path, tmp_path):
+    output = str(tmp_path / 'scores.jsonl')
+    with pytest.raises(RuntimeError):
+        run_bulk(FakePredictor(model_path, crash_after_batches=2), archive, output,
+                 batch_size=3, progress_every=60)
+
+    with open(output + '.checkpoint') as f:
+        checkpoint = json.load(f)
+    assert (checkpoint['done'], checkpoint['complete']) == (6, False)
+
+    # A partial line written after the checkpoint must not survive the resume
+    with open(output, 'a') as f:
+        f.write('{"path": "torn')
+
+    summary = run_bulk(FakePredictor(model_path), archive, output, batch_size=3,
+                       resume=True, progress_every=60)
+
+    records = read_jsonl(output)
+    assert summary['images'] == 4
+    assert summary['total_images'] == 10
+    assert len(records) == 10
+    assert len({record['path'] for record in records}) == 10
+
+
+def test_resume_of_a_complete_run_does_nothing(archive, model_path, tmp_path):
+    output = str(tmp_path / 'scores.jsonl')
+    run_bulk(FakePredictor(model_path), archive, output, batch_size=3, progress_every=60)
+
+    summary = run_bulk(FakePredictor(model_path), archive, output, batch_size=3,
+                       resume=True, progress_every=60)
+    assert summary['images'] == 0
+    assert len(read_jsonl(output)) == 10
+
+
+def test_resume_refuses_a_changed_tree(archive, model_path, tmp_path):
+    output = str(tmp_path / 'scores.jsonl')
+    with pytest.raises(RuntimeError):
+        run_bulk(FakePredictor(model_path, crash_after_batches=2), archive, output,
+                 batch_size=3, progress_every=60)
+
+    (tmp_path / 'images' / 'a' / '000.png').unlink()
+    with pytest.raises(CheckpointError):
+        run_bulk(FakePredictor(model_path), archive, output, batch_size=3,
+                 resume=True, progress_every=60)
+
+
+def test_resume_without_checkpoint(archive, model_path, tmp_path):
+    with pytest.raises(CheckpointError):
+        run_bulk(FakePredictor(model_path), archive, str(tmp_path / 'scores.jsonl'),
+                 resume=True, progress_every=60)
@@ -0,0 +1,153 @@
+"""
+Tests for the prediction cache: keys, LRU and TTL eviction, invalidation
+and persistence
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from cache import PredictionCache
+
+
+RESULT = {'success': True, 'predicted_class': 'Normal', 'confidence': 0.9}
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = tmp_path / 'model.h5'
+    path.write_bytes(b'weights v1')
+    return str(path)
+
+
+def test_round_trip_returns_a_copy(model_file):
+    cache = PredictionCache(model_file)
+    key = cache.make_key('abc')
+    cache.put(key, {**RESULT, 'filename': 'a.png'})
+
+    hit = cache.get(key)
+    assert hit == RESULT
+    hit['confidence'] = 0.0
+    assert cache.get(key)['confidence'] == 0.9
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_failed_results_are_not_stored(model_file):
+    cache = PredictionCache(model_file)
+    key = cache.make_key('abc')
+    cache.put(key, {'success': False, 'error': 'Prediction failed'})
+
+    assert cache.get(key) is None
+    assert cache.get_stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(model_file):
+    cache = PredictionCache(model_file, max_entries=2)
+    keys = [cache.make_key(digest) for digest in 'abc']
+    cache.put(keys[0], RESULT)
+    cache.put(keys[1], RESULT)
+    cache.get(keys[0])
+    cache.put(keys[2], RESULT)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert cache.evictions == 1
+
+
+def test_entries_expire(model_file):
+    cache = PredictionCache(model_file, ttl_seconds=0.05)
+    key = cache.make_key('abc')
+    cache.put(key, RESULT)
+    assert cache.get(key) is not None
+
+    time.sleep(0.1)
+    assert cache.get(key) is None
+    assert cache.expirations == 1
+
+
+def test_settings_are_part_of_the_key(model_file):
+    reference = PredictionCache(model_file, settings={'preprocessing': {'mode': 'reference'}})
+    resize_first = PredictionCache(model_file, settings={'preprocessing': {'mode': 'resize_first'}})
+    same = PredictionCache(model_file, settings={'preprocessing': {'mode': 'reference'}})
+
+    assert reference.make_key('abc') != resize_first.make_key('abc')
+    assert reference.make_key('abc') == same.make_key('abc')
+
+
+def test_changed_model_file_drops_entries(model_file):
+    cache = PredictionCache(model_file)
+    key = cache.make_key('abc')
+    cache.put(key, RESULT)
+
+    with open(model_file, 'wb') as f:
+        f.write(b'weights v2, retrained')
+
+    assert cache.get(key) is None
+    assert cache.get(cache.make_key('abc')) is None
+    assert cache.invalidations == 1
+
+
+def test_persisted_entries_survive_a_restart(model_file, tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = PredictionCache(model_file, persist_path=path, settings={'backend': 'keras'})
+    cache.put(cache.make_key('abc'), RESULT)
+    cache.save()
+
+    restored = PredictionCache(model_file, persist_path=path, settings={'backend': 'keras'})
+    assert restored.get(restored.make_key('abc')) == RESULT
+
+    other_settings = PredictionCache(model_file, persist_path=path, settings={'backend': 'tflite'})
+    assert other_settings.get_stats()['entries'] == 0
+
+
+def test_changed_cascade_model_drops_entries(model_file, tmp_path):
+    cascade_file = tmp_path / 'fast.tflite'
+    cascade_file.write_bytes(b'fast v1')
+    cache = PredictionCache(model_file, cascade_model_path=str(cascade_file))
+    key = cache.make_key('abc')
+    cache.put(key, RESULT)
+    assert cache.get(key) is not None
+
+    cascade_file.write_bytes(b'fast v2, requantized')
+
+    assert cache.get(key) is None
+    assert cache.make_key('abc') != key
+    assert cache.invalidations == 1
+
+
+def test_cascade_model_is_part_of_the_fingerprint(model_file, tmp_path):
+    cascade_file = tmp_path / 'fast.tflite'
+    cascade_file.write_bytes(b'fast v1')
+
+    assert (PredictionCache(model_file).fingerprint !=
+            PredictionCache(model_file, cascade_model_path=str(cascade_file)).fingerprint)
+
+
+def test_concurrent_saves_do_not_share_a_temp_file(model_file, tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / 'cache.json')
+    caches = [PredictionCache(model_file, persist_path=path) for _ in range(2)]
+    for index, cache in enumerate(caches):
+        cache.put(cache.make_key(f'digest{index}'), RESULT)
+
+    # Hold both saves between writing their temp file and renaming it
+    both_written = threading.Barrier(2)
+    replace = os.replace
+
+    def synchronized_replace(src, dst):
+        both_written.wait(timeout=5)
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', synchronized_replace)
+    threads = [threading.Thread(target=cache.save) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    monkeypatch.undo()
+
+    assert 'Could not save' not in capsys.readouterr().out
+    assert sorted(os.listdir(tmp_path)) == ['cache.json', 'model.h5']
+    assert PredictionCache(model_file, persist_path=path).get_stats()['entries'] == 1
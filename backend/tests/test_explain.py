@@ -0,0 +1,154 @@
+"""
+Tests for Grad-CAM explanations and heatmap rendering
+"""
+
+import base64
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from explain import ExplanationUnavailable, jet_colormap, render_heatmap
+
+IMG_SIZE = 16
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def decode_png(data_url):
+    assert data_url.startswith('data:image/png;base64,')
+    png = base64.b64decode(data_url.split(',', 1)[1])
+    return np.asarray(Image.open(io.BytesIO(png)).convert('RGB')).astype(np.int32)
+
+
+def has_cv2():
+    try:
+        import cv2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def without_cv2(monkeypatch):
+    # A None entry makes `import cv2` raise ImportError
+    monkeypatch.setitem(sys.modules, 'cv2', None)
+
+
+def test_heatmap_is_a_coloured_png():
+    grid = np.zeros((7, 7), dtype=np.float32)
+    grid[:, 4:] = 1.0
+
+    pixels = decode_png(render_heatmap(grid, size=56))
+
+    assert pixels.shape == (56, 56, 3)
+    # Cold is blue, hot is red
+    assert pixels[28, 0, 2] > 100 and pixels[28, 0, 0] < 50
+    assert pixels[28, -1, 0] > 100 and pixels[28, -1, 2] < 50
+
+
+def test_heatmap_renders_without_opencv(monkeypatch):
+    grid = np.random.default_rng(0).random((7, 7))
+    with_opencv = decode_png(render_heatmap(grid)) if has_cv2() else None
+
+    without_cv2(monkeypatch)
+    pixels = decode_png(render_heatmap(grid))
+
+    assert pixels.shape == (224, 224, 3)
+    if with_opencv is not None:
+        assert np.abs(pixels - with_opencv).mean() < 2
+        assert np.abs(pixels - with_opencv).max() <= 8
+
+
+def test_jet_colormap_matches_opencv():
+    cv2 = pytest.importorskip('cv2')
+    values = np.arange(256, dtype=np.uint8)
+
+    expected = cv2.applyColorMap(values[np.newaxis], cv2.COLORMAP_JET)[0, :, ::-1]
+    assert np.abs(jet_colormap(values / 255.0).astype(np.int32) - expected).max() <= 1
+
+
+def test_serving_modules_import_without_opencv():
+    script = (
+        "import sys; sys.modules['cv2'] = None\n"
+        "import model, explain, app\n"
+        "print(app.render_heatmap is explain.render_heatmap)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script], cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**os.environ, 'MODEL_LOAD_MODE': 'lazy'}, timeout=120
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith('True')
+
+
+@pytest.fixture(scope='module')
+def tiny_model():
+    pytest.importorskip('tensorflow')
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(0)
+    return keras.Sequential([
+        keras.Input((IMG_SIZE, IMG_SIZE, 3)),
+        keras.layers.Conv2D(4, 3, activation='relu'),
+        keras.layers.Conv2D(8, 3, strides=2, activation='relu'),
+        keras.layers.GlobalAveragePooling2D(),
+        keras.layers.Dense(3, activation='softmax')
+    ])
+
+
+@pytest.fixture(scope='module')
+def explainer(tiny_model):
+    from explain import GradCamExplainer
+
+    return GradCamExplainer(tiny_model, img_size=IMG_SIZE)
+
+
+def images(count):
+    return np.random.default_rng(1).random((count, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+
+
+def test_explanation_shares_the_prediction(tiny_model, explainer):
+    batch = images(3)
+
+    probabilities, targets, heatmaps = explainer.explain(batch)
+
+    np.testing.assert_allclose(probabilities, tiny_model(batch, training=False).numpy(), atol=1e-5)
+    np.testing.assert_array_equal(targets, probabilities.argmax(axis=1))
+    # At the resolution of the last convolutional feature map
+    assert heatmaps.shape == (3, 6, 6)
+    assert heatmaps.min() >= 0 and heatmaps.max() <= 1 + 1e-6
+
+
+def test_requested_classes_are_explained(explainer):
+    _, targets, _ = explainer.explain(images(3), class_indices=[2, None, 0])
+    _, predicted, _ = explainer.explain(images(3))
+
+    assert list(targets) == [2, predicted[1], 0]
+
+
+def test_batch_heatmaps_match_single_images(explainer):
+    batch = images(4)
+    _, _, heatmaps = explainer.explain(batch)
+
+    for index in range(len(batch)):
+        _, _, single = explainer.explain(batch[index:index + 1])
+        np.testing.assert_allclose(single[0], heatmaps[index], atol=1e-5)
+
+
+def test_model_without_feature_map_is_unavailable():
+    pytest.importorskip('tensorflow')
+    from tensorflow import keras
+
+    from explain import GradCamExplainer
+
+    flat = keras.Sequential([
+        keras.Input((IMG_SIZE, IMG_SIZE, 3)),
+        keras.layers.Flatten(),
+        keras.layers.Dense(3, activation='softmax')
+    ])
+    with pytest.raises(ExplanationUnavailable):
+        GradCamExplainer(flat, img_size=IMG_SIZE)
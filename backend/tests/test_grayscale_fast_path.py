@@ -0,0 +1,64 @@
+"""
+Tests for the single-channel grayscale fast path
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocessing import PreprocessingEngine, make_synthetic_xrays, reference_preprocess
+
+# The fast path needs OpenCV's CLAHE; without it the engine never takes it
+pytest.importorskip('cv2')
+
+
+@pytest.fixture(scope='module')
+def gray_xrays(tmp_path_factory):
+    return make_synthetic_xrays(str(tmp_path_factory.mktemp('xrays')), count=2, size=512)
+
+
+@pytest.mark.parametrize('mode', ['reference', 'resize_first'])
+def test_fast_path_matches_the_rgb_pipeline(gray_xrays, mode):
+    fast = PreprocessingEngine(mode=mode, grayscale_fast_path=True)
+    slow = PreprocessingEngine(mode=mode, grayscale_fast_path=False)
+
+    for path in gray_xrays:
+        # The lightness lookup tables round to within one grey level
+        assert np.abs(fast.preprocess(path) - slow.preprocess(path)).max() <= 1.5 / 255
+
+
+def test_reference_fast_path_stays_at_parity(gray_xrays):
+    engine = PreprocessingEngine(mode='reference', grayscale_fast_path=True)
+
+    for path in gray_xrays:
+        assert np.abs(engine.preprocess(path)[0] - reference_preprocess(path)).max() <= 1.5 / 255
+
+
+def test_fast_path_output_is_a_broadcast_channel(gray_xrays):
+    out = PreprocessingEngine(grayscale_fast_path=True).process(Image.open(gray_xrays[0]))
+
+    assert out.shape == (224, 224, 3)
+    assert out.strides[2] == 0
+    np.testing.assert_array_equal(out[:, :, 0], out[:, :, 2])
+
+
+def test_rgb_images_do_not_take_the_fast_path(gray_xrays, tmp_path):
+    rgb_path = str(tmp_path / 'rgb.png')
+    Image.open(gray_xrays[0]).convert('RGB').save(rgb_path)
+
+    out = PreprocessingEngine(grayscale_fast_path=True).preprocess(rgb_path)[0]
+    np.testing.assert_array_equal(out, reference_preprocess(rgb_path))
+
+
+def test_sixteen_bit_images_keep_their_precision():
+    ramp = np.tile(np.linspace(20000, 24095, 512).astype(np.uint16), (512, 1))
+    img = Image.fromarray(ramp)
+    assert img.mode == 'I;16'
+
+    out = PreprocessingEngine(mode='reference', grayscale_fast_path=True).process(img)
+
+    assert out.shape == (224, 224, 3)
+    assert 0.0 <= out.min() and out.max() <= 1.0
+    # An 8-bit pipeline could only produce multiples of 1/255
+    levels = out[:, :, 0] * 255
+    assert np.abs(levels - np.round(levels)).max() > 0.1
@@ -0,0 +1,56 @@
+"""
+Tests for decoding uploads down to the model input size
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from image_loader import ImageLoader
+
+
+def encode(img):
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize('mode, reduced_mode', [
+    ('1', 'L'),
+    ('L', 'L'),
+    ('P', 'RGB'),
+    ('I;16', 'I'),
+    ('RGB', 'RGB'),
+    ('RGBA', 'RGBA'),
+])
+def test_large_images_are_reduced_in_any_mode(mode, reduced_mode):
+    loaded = ImageLoader(min_size=224).load(encode(Image.new(mode, (1000, 900))))
+
+    assert loaded.method == 'reduce'
+    assert loaded.image.mode == reduced_mode
+    assert loaded.image.size == (250, 225)
+    assert loaded.source_size == (1000, 900)
+
+
+def test_palette_transparency_is_kept():
+    img = Image.new('P', (1000, 900))
+    img.info['transparency'] = 0
+
+    loaded = ImageLoader(min_size=224).load(encode(img))
+    assert loaded.image.mode == 'RGBA'
+
+
+def test_small_images_are_decoded_at_native_size():
+    loaded = ImageLoader(min_size=224).load(encode(Image.new('P', (300, 300))))
+
+    assert loaded.method == 'full'
+    assert loaded.image.size == (300, 300)
+
+
+def test_no_min_size_keeps_native_resolution():
+    loaded = ImageLoader().load(encode(Image.new('L', (1000, 900))))
+
+    assert loaded.method == 'full'
+    assert loaded.image.size == (1000, 900)
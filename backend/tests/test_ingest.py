@@ -0,0 +1,87 @@
+"""
+Tests for upload ingest: validation, hashing and in-memory spooling
+"""
+
+import hashlib
+import io
+
+import pytest
+from flask import Flask, jsonify, request
+from werkzeug.datastructures import FileStorage
+
+from ingest import IngestedUpload, ingest_files, ingest_upload, make_request_class
+
+
+def allowed_file(filename):
+    return filename.lower().endswith(('.png', '.jpg', '.jpeg'))
+
+
+def upload(data, filename='scan.png'):
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+
+def test_upload_is_hashed_and_rewound():
+    ingested = ingest_upload(upload(b'x-ray bytes'), allowed_file)
+
+    assert ingested.ok
+    assert ingested.digest == hashlib.sha256(b'x-ray bytes').hexdigest()
+    assert ingested.size == len(b'x-ray bytes')
+    assert ingested.stream.read() == b'x-ray bytes'
+    assert ingested.rewind().read() == b'x-ray bytes'
+
+
+def test_filename_is_sanitized():
+    assert ingest_upload(upload(b'data', '../../etc/scan.png'), allowed_file).filename == 'etc_scan.png'
+
+
+@pytest.mark.parametrize('data, filename, error', [
+    (b'data', 'notes.txt', 'Invalid file type. Only PNG, JPG, and JPEG are allowed.'),
+    (b'', 'empty.png', 'Empty file'),
+])
+def test_rejected_uploads_carry_their_error(data, filename, error):
+    ingested = ingest_upload(upload(data, filename), allowed_file)
+
+    assert not ingested.ok
+    assert ingested.error == error
+    assert ingested.digest is None
+
+
+def test_empty_file_parts_are_skipped():
+    files = [upload(b'a', 'a.png'), FileStorage(stream=io.BytesIO(b''), filename=''), upload(b'b', 'b.png')]
+
+    assert [ingested.filename for ingested in ingest_files(files, allowed_file)] == ['a.png', 'b.png']
+
+
+def test_close_releases_the_buffer():
+    ingested = IngestedUpload('a.png', stream=io.BytesIO(b'a'), digest='d', size=1)
+    ingested.close()
+
+    assert ingested.stream is None
+    assert ingested.rewind() is None
+
+
+@pytest.fixture
+def spooling_app(tmp_path):
+    app = Flask(__name__)
+    app.request_class = make_request_class(spool_threshold=1024, spill_dir=str(tmp_path))
+
+    @app.route('/upload', methods=['POST'])
+    def receive():
+        stream = request.files['file'].stream
+        return jsonify({
+            'in_memory': not getattr(stream, '_rolled', True),
+            'data': stream.read().decode()
+        })
+
+    return app
+
+
+@pytest.mark.parametrize('size, in_memory', [(100, True), (4096, False)])
+def test_uploads_stay_in_memory_up_to_the_threshold(spooling_app, size, in_memory):
+    data = 'x' * size
+    response = spooling_app.test_client().post(
+        '/upload', data={'file': (io.BytesIO(data.encode()), 'scan.png')},
+        content_type='multipart/form-data'
+    )
+
+    assert response.get_json() == {'in_memory': in_memory, 'data': data}
@@ -0,0 +1,183 @@
+"""
+Tests for asynchronous jobs: lifecycle, partial results, failures and expiry
+"""
+
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from ingest import IngestedUpload
+from jobs import JobNotFound, JobQueueFullError, JobRunner, JobStore, job_status
+
+
+def uploads(count, rejected=()):
+    return [
+        IngestedUpload(f'{index}.png', error='Empty file') if index in rejected
+        else IngestedUpload(f'{index}.png', stream=io.BytesIO(b'image %d' % index),
+                            digest=f'digest{index}', size=7)
+        for index in range(count)
+    ]
+
+
+def echo_predictions(images):
+    results = []
+    for path, digest in images:
+        with open(path, 'rb') as f:
+            results.append({'success': True, 'digest': digest, 'bytes': f.read().decode()})
+    return results
+
+
+def wait_for(store, job_id, states=('done', 'failed'), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.load(job_id)
+        if job['state'] in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job still {job["state"]} after {timeout} s')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs'), ttl_seconds=60)
+
+
+def test_job_runs_to_completion(store):
+    runner = JobRunner(store, echo_predictions, chunk_size=2)
+    job = runner.submit(uploads(5, rejected={3}))
+    assert job['state'] == 'queued'
+
+    job = wait_for(store, job['id'])
+    assert job_status(job)['progress'] == 1.0
+    assert (job['state'], job['completed'], job['failed']) == ('done', 5, 1)
+
+    results = store.read_results(job)
+    assert [result['index'] for result in results] == [0, 1, 2, 3, 4]
+    assert [result['filename'] for result in results] == [f'{index}.png' for index in range(5)]
+    assert results[3] == {'success': False, 'error': 'Empty file', 'index': 3, 'filename': '3.png'}
+    assert results[4]['bytes'] == 'image 4'
+    assert store.read_results(job, offset=1, limit=2) == results[1:3]
+
+
+def test_finished_chunks_are_readable_while_the_job_runs(store):
+    second_chunk = threading.Event()
+    resume = threading.Event()
+
+    def predict(images):
+        if images[0][1] == 'digest2':
+            second_chunk.set()
+            resume.wait(5)
+        return echo_predictions(images)
+
+    runner = JobRunner(store, predict, chunk_size=2)
+    job_id = runner.submit(uploads(4))['id']
+    assert second_chunk.wait(5)
+
+    job = store.load(job_id)
+    assert (job['state'], job['completed']) == ('running', 2)
+    assert len(store.read_results(job)) == 2
+
+    resume.set()
+    assert wait_for(store, job_id)['completed'] == 4
+
+
+def test_prediction_error_fails_the_job(store):
+    def predict(images):
+        raise RuntimeError('Server busy for over 600 s')
+
+    runner = JobRunner(store, predict)
+    job = wait_for(store, runner.submit(uploads(2))['id'])
+
+    assert job['state'] == 'failed'
+    assert 'Server busy' in job['error']
+    # Inputs are removed right after the final state is saved
+    deadline = time.monotonic() + 5
+    while os.path.exists(store.input_path(job['id'], 0)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not os.path.exists(store.input_path(job['id'], 0))
+
+
+def test_full_queue_refuses_jobs(store):
+    runner = JobRunner(store, echo_predictions, max_queued=1)
+    # Keep the runner from taking jobs off the queue
+    runner.start = lambda: None
+    runner.submit(uploads(1))
+
+    with pytest.raises(JobQueueFullError):
+        runner.submit(uploads(1))
+
+
+def test_expired_jobs_are_deleted(store):
+    runner = JobRunner(store, echo_predictions)
+    job = wait_for(store, runner.submit(uploads(1))['id'])
+
+    job['expires'] = time.time() - 1
+    store.save(job)
+    assert store.purge_expired() == 1
+    with pytest.raises(JobNotFound):
+        store.load(job['id'])
+
+
+def test_expired_job_is_not_found_on_load(store):
+    job = store.create(uploads(1))
+    job['expires'] = time.time() - 1
+    store.save(job)
+
+    with pytest.raises(JobNotFound):
+        store.load(job['id'])
+
+
+def test_job_of_a_dead_process_is_reported_failed(store):
+    job = store.create(uploads(1))
+    job['pid'] = 2 ** 22 + 1  # Above the kernel's pid limit
+    store.save(job)
+
+    job = store.load(job['id'])
+    assert job['state'] == 'failed'
+    assert job['error'] == 'Interrupted by a server restart; submit the job again'
+
+
+@pytest.mark.parametrize('job_id', ['../../etc', 'x' * 32, ''])
+def test_malformed_ids_are_not_found(store, job_id):
+    with pytest.raises(JobNotFound):
+        store.load(job_id)
+
+
+@pytest.mark.parametrize('offset, limit', [(-1, None), (-2, 1), (0, 0), (0, -1)])
+def test_negative_ranges_are_rejected(store, offset, limit):
+    runner = JobRunner(store, echo_predictions)
+    job = wait_for(store, runner.submit(uploads(3))['id'])
+
+    with pytest.raises(ValueError):
+        store.read_results(job, offset=offset, limit=limit)
+
+
+@pytest.mark.parametrize('query', ['offset=-1', 'limit=0', 'limit=-2', 'offset=x', 'limit='])
+@pytest.mark.parametrize('server', ['flask', 'asgi'])
+def test_results_endpoint_rejects_invalid_ranges(server, query):
+    if server == 'flask':
+        from app import app
+        response = app.test_client().get(f'/api/jobs/0123456789abcdef/results?{query}')
+        status, body = response.status_code, response.get_json()
+    else:
+        pytest.importorskip('starlette')
+        pytest.importorskip('httpx')
+        from starlette.testclient import TestClient
+
+        from asgi_app import app
+        response = TestClient(app).get(f'/api/jobs/0123456789abcdef/results?{query}')
+        status, body = response.status_code, response.json()
+
+    assert status == 400
+    assert body == {'success': False,
+                    'error': 'offset must be an integer >= 0 and limit an integer >= 1'}
+
+
+def test_results_range_defaults_to_everything():
+    from app import results_range
+
+    assert results_range({}) == (0, None)
+    assert results_range({'offset': '5', 'limit': '10'}) == (5, 10)
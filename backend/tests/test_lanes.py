@@ -0,0 +1,86 @@
+"""
+Tests for the micro-batcher's priority lanes and weighted fair sharing
+"""
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher, QueueFullError
+
+
+class FakePredictor:
+    def predict_arrays(self, img_batch):
+        return [{'success': True} for _ in img_batch]
+
+
+def image(value):
+    return np.full((4, 4, 3), value, dtype=np.float32)
+
+
+@pytest.fixture
+def idle_batcher(monkeypatch):
+    """
+    Batcher whose worker thread never starts, so batches can be taken by hand
+    """
+    def make(**kwargs):
+        batcher = MicroBatcher(FakePredictor(), **kwargs)
+        monkeypatch.setattr(batcher, 'start', lambda: None)
+        return batcher
+    return make
+
+
+def take_lanes(batcher):
+    return [item.lane for item in batcher._take()]
+
+
+def test_batches_are_shared_by_lane_weight(idle_batcher):
+    batcher = idle_batcher(max_batch_size=5, lane_weights={'interactive': 4, 'bulk': 1})
+    for _ in range(20):
+        batcher.submit_async(image(0), lane='interactive')
+        batcher.submit_async(image(1), lane='bulk')
+
+    for _ in range(4):
+        lanes = take_lanes(batcher)
+        assert lanes.count('interactive') == 4
+        assert lanes.count('bulk') == 1
+
+
+def test_fractional_shares_carry_over(idle_batcher):
+    batcher = idle_batcher(max_batch_size=4, lane_weights={'interactive': 7, 'bulk': 1})
+    for _ in range(32):
+        batcher.submit_async(image(0), lane='interactive')
+        batcher.submit_async(image(1), lane='bulk')
+
+    # Bulk earns half a slot per batch, so once its credit has built up it
+    # runs in every other batch
+    bulk_per_batch = [take_lanes(batcher).count('bulk') for _ in range(8)]
+    assert bulk_per_batch == [0, 0, 1, 0, 1, 0, 1, 0]
+
+
+def test_spare_slots_go_to_the_other_lane(idle_batcher):
+    batcher = idle_batcher(max_batch_size=8)
+    for _ in range(2):
+        batcher.submit_async(image(0), lane='interactive')
+    for _ in range(10):
+        batcher.submit_async(image(1), lane='bulk')
+
+    lanes = take_lanes(batcher)
+    assert lanes[:2] == ['interactive', 'interactive']
+    assert lanes.count('bulk') == 6
+
+
+def test_lanes_are_bounded_separately(idle_batcher):
+    batcher = idle_batcher(max_queue_size=2)
+    batcher.submit_async(image(0), lane='bulk')
+    batcher.submit_async(image(0), lane='bulk')
+
+    with pytest.raises(QueueFullError):
+        batcher.submit_async(image(0), lane='bulk')
+    batcher.submit_async(image(0), lane='interactive')
+    stats = batcher.get_stats()['lanes']
+    assert (stats['bulk']['rejected'], stats['interactive']['rejected']) == (1, 0)
+
+
+def test_unknown_lane(idle_batcher):
+    with pytest.raises(ValueError):
+        idle_batcher().submit_async(image(0), lane='urgent')
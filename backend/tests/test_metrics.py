@@ -0,0 +1,147 @@
+"""
+Tests for the metrics registry, the Prometheus text format and the /metrics
+endpoint
+"""
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+from metrics import CONTENT_TYPE, STAGE_SECONDS, Histogram, MetricsRegistry
+from preprocessing import PreprocessingEngine, make_synthetic_xrays
+
+
+def sample_lines(metric):
+    return metric.render().splitlines()[2:]
+
+
+def stage_count(stage):
+    for suffix, labels, value in STAGE_SECONDS.samples():
+        if suffix == '_count' and labels == f'{{stage="{stage}"}}':
+            return value
+    return 0
+
+
+def test_counter_renders_with_help_type_and_labels():
+    counter = MetricsRegistry().counter('xray_test_errors', 'Errors by reason', ['reason'])
+    counter.inc(reason='busy')
+    counter.inc(2, reason='busy')
+    counter.inc(reason='deadline')
+
+    assert counter.render().splitlines() == [
+        '# HELP xray_test_errors Errors by reason',
+        '# TYPE xray_test_errors counter',
+        'xray_test_errors_total{reason="busy"} 3',
+        'xray_test_errors_total{reason="deadline"} 1'
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = MetricsRegistry().counter('xray_test_paths', 'Paths', ['path'])
+    counter.inc(path='a"b\\c\nd')
+
+    assert sample_lines(counter) == ['xray_test_paths_total{path="a\\"b\\\\c\\nd"} 1']
+
+
+def test_wrong_labels_are_rejected():
+    counter = MetricsRegistry().counter('xray_test_labels', 'Labels', ['reason'])
+
+    with pytest.raises(ValueError):
+        counter.inc(stage='decode')
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_gauge_moves_both_ways_or_reads_a_function():
+    gauges = MetricsRegistry()
+    depth = gauges.gauge('xray_test_depth', 'Depth')
+    depth.inc(3)
+    depth.dec()
+    assert sample_lines(depth) == ['xray_test_depth 2']
+
+    depth.set(0.5)
+    assert sample_lines(depth) == ['xray_test_depth 0.5']
+
+    ready = gauges.gauge('xray_test_ready', 'Ready')
+    ready.set_function(lambda: True)
+    assert sample_lines(ready) == ['xray_test_ready 1']
+
+    # A failing callback drops the sample instead of breaking /metrics
+    ready.set_function(lambda: 1 / 0)
+    assert sample_lines(ready) == []
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('xray_test_seconds', 'Seconds', ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, stage='decode')
+
+    assert sample_lines(histogram) == [
+        'xray_test_seconds_bucket{stage="decode",le="0.1"} 2',
+        'xray_test_seconds_bucket{stage="decode",le="1"} 3',
+        'xray_test_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'xray_test_seconds_sum{stage="decode"} 3.65',
+        'xray_test_seconds_count{stage="decode"} 4'
+    ]
+
+
+def test_timer_and_listeners_see_every_observation():
+    histogram = Histogram('xray_test_timed', 'Timed', ['stage'])
+    seen = []
+    histogram.add_listener(lambda value, labels: seen.append((labels, value)))
+
+    with histogram.time(stage='resize'):
+        pass
+    histogram.observe(0.25, stage='decode')
+
+    assert [labels for labels, _ in seen] == [{'stage': 'resize'}, {'stage': 'decode'}]
+    assert 0 <= seen[0][1] < 1 and seen[1][1] == 0.25
+
+
+def test_registry_returns_one_metric_per_name():
+    metrics = MetricsRegistry()
+    first = metrics.counter('xray_test_once', 'Once')
+
+    assert metrics.counter('xray_test_once', 'Once') is first
+    with pytest.raises(ValueError):
+        metrics.gauge('xray_test_once', 'Once')
+    assert metrics.render().endswith('xray_test_once counter\n')
+
+
+def test_preprocessing_records_its_stages(tmp_path):
+    path = make_synthetic_xrays(str(tmp_path), count=1, size=256)[0]
+    before = {stage: stage_count(stage) for stage in ('decode', 'equalize', 'resize')}
+
+    PreprocessingEngine(grayscale_fast_path=False).preprocess(path)
+
+    for stage, count in before.items():
+        assert stage_count(stage) > count
+
+
+def test_batcher_records_queue_wait():
+    class Predictor:
+        def predict_arrays(self, img_batch):
+            return [{'success': True} for _ in img_batch]
+
+    before = stage_count('batch_wait')
+    batcher = MicroBatcher(Predictor(), max_batch_size=2, max_wait_ms=1)
+    futures = [batcher.submit_async(np.zeros((4, 4, 3), dtype=np.float32)) for _ in range(3)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert stage_count('batch_wait') == before + 3
+
+
+def test_metrics_endpoint_counts_requests():
+    from app import app
+
+    client = app.test_client()
+    client.get('/api/health')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type == CONTENT_TYPE
+    body = response.get_data(as_text=True)
+    assert 'xray_http_requests_total{endpoint="/api/health",method="GET",status="200"}' in body
+    assert '# TYPE xray_stage_duration_seconds histogram' in body
+    assert 'xray_model_ready ' in body
@@ -0,0 +1,117 @@
+"""
+Tests for the shared preprocessing thread pool
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from parallel import PoolFullError, PreprocessPool
+from profiling import RequestProfile, current_profile
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        pool = PreprocessPool(**kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def wait_idle(pool, timeout=5):
+    deadline = time.monotonic() + timeout
+    while pool.get_stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_results_come_back_in_input_order(make_pool):
+    pool = make_pool(max_workers=4)
+
+    def slow_square(value):
+        time.sleep(0.001 * (10 - value))
+        return value * value
+
+    assert pool.map_isolated(slow_square, range(10)) == [(value * value, None) for value in range(10)]
+
+
+def test_a_failing_item_only_fails_its_slot(make_pool):
+    pool = make_pool(max_workers=2)
+
+    def parse(text):
+        return int(text)
+
+    results = pool.map_isolated(parse, ['1', 'x', '3'])
+    assert [value for value, _ in results] == [1, None, 3]
+    assert isinstance(results[1][1], ValueError)
+
+    wait_idle(pool)
+    stats = pool.get_stats()
+    assert (stats['completed'], stats['failed']) == (2, 1)
+
+
+def test_more_items_than_max_pending_stream_through(make_pool):
+    pool = make_pool(max_workers=2, max_pending=2)
+
+    assert [value for value, _ in pool.map_isolated(lambda x: x + 1, range(20))] == list(range(1, 21))
+
+
+def test_full_pool_rejects_and_cancels_the_rest(make_pool, caplog):
+    pool = make_pool(max_workers=1, max_pending=2, submit_timeout=0.05)
+    release = threading.Event()
+
+    def blocked(value):
+        release.wait(5)
+        return value
+
+    with caplog.at_level(logging.ERROR):
+        with pytest.raises(PoolFullError):
+            # 0 runs, 1 waits for the worker, 2 finds no free slot
+            pool.map_isolated(blocked, range(3))
+        release.set()
+        wait_idle(pool)
+
+    stats = pool.get_stats()
+    assert (stats['pending'], stats['completed'], stats['failed'], stats['rejected']) == (0, 1, 0, 2)
+    # Cancelled futures must not break the done callback
+    assert not [record for record in caplog.records if 'callback' in record.getMessage()]
+    assert pool.map_isolated(lambda x: x, [1, 2]) == [(1, None), (2, None)]
+
+
+def test_preprocess_batch_stacks_the_successful_images(make_pool):
+    pool = make_pool(max_workers=2)
+
+    def preprocess(value):
+        if value < 0:
+            raise ValueError('cannot identify image file')
+        return np.full((1, 2, 2, 3), value, dtype=np.float32)
+
+    batch, valid_indices, errors = pool.preprocess_batch(preprocess, [1, -1, 3])
+
+    assert batch.shape == (2, 2, 2, 3)
+    assert [float(image[0, 0, 0]) for image in batch] == [1.0, 3.0]
+    assert valid_indices == [0, 2]
+    assert errors == {1: 'cannot identify image file'}
+
+
+def test_workers_see_the_request_profile(make_pool):
+    pool = make_pool(max_workers=2)
+
+    def decode(_):
+        current_profile().add('decode', 0.001)
+
+    profile = RequestProfile('test').start()
+    try:
+        pool.map_isolated(decode, range(3))
+    finally:
+        profile.finish()
+
+    assert profile.stages['decode'][1] == 3
@@ -0,0 +1,76 @@
+"""
+Tests for PreprocessingEngine: parity with the original pipeline, the
+resize-first mode and thread safety
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocessing import PreprocessingEngine, make_synthetic_xrays, reference_preprocess
+
+
+@pytest.fixture(scope='module')
+def xrays(tmp_path_factory):
+    """
+    Synthetic X-rays: two grayscale PNGs and an RGB copy of the first
+    """
+    directory = tmp_path_factory.mktemp('xrays')
+    paths = make_synthetic_xrays(str(directory), count=2, size=512)
+    rgb_path = str(directory / 'synthetic_rgb.png')
+    Image.open(paths[0]).convert('RGB').save(rgb_path)
+    return paths + [rgb_path]
+
+
+def test_reference_mode_matches_the_original_pipeline(xrays):
+    engine = PreprocessingEngine(mode='reference', grayscale_fast_path=False)
+
+    for path in xrays:
+        out = engine.preprocess(path)
+        assert out.shape == (1, 224, 224, 3)
+        assert out.dtype == np.float32
+        np.testing.assert_array_equal(out[0], reference_preprocess(path))
+
+
+def test_file_objects_and_paths_give_the_same_result(xrays):
+    engine = PreprocessingEngine(mode='reference', grayscale_fast_path=False)
+
+    with open(xrays[0], 'rb') as f:
+        np.testing.assert_array_equal(engine.preprocess(f), engine.preprocess(xrays[0]))
+
+
+def test_resize_first_stays_close_to_the_reference(xrays):
+    engine = PreprocessingEngine(mode='resize_first', grayscale_fast_path=False)
+
+    for path in xrays:
+        out = engine.preprocess(path)[0]
+        reference = reference_preprocess(path)
+        assert out.shape == reference.shape
+        assert 0.0 <= out.min() and out.max() <= 1.0
+        assert np.abs(out - reference).mean() < 0.05
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        PreprocessingEngine(mode='fastest')
+
+
+def test_options_rebuild_an_identical_engine(xrays):
+    engine = PreprocessingEngine(mode='resize_first', decode_min_size=448)
+    clone = PreprocessingEngine(**engine.get_options())
+
+    assert clone.get_options() == engine.get_options()
+    np.testing.assert_array_equal(clone.preprocess(xrays[0]), engine.preprocess(xrays[0]))
+
+
+def test_threads_share_one_engine(xrays):
+    engine = PreprocessingEngine(mode='reference', grayscale_fast_path=False)
+    expected = [engine.preprocess(path) for path in xrays]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(engine.preprocess, xrays * 8))
+
+    for index, result in enumerate(results):
+        np.testing.assert_array_equal(result, expected[index % len(xrays)])
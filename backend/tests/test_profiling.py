@@ -0,0 +1,144 @@
+"""
+Tests for per-request profiling: stage breakdowns, dumps and which requests
+get profiled
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+from metrics import STAGE_SECONDS
+from profiling import RequestProfile, RequestProfiler, current_profile
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stage_timings_are_collected_for_the_current_request():
+    STAGE_SECONDS.observe(0.5, stage='decode')
+    profile = RequestProfile('test').start()
+    assert current_profile() is profile
+
+    STAGE_SECONDS.observe(0.001, stage='decode')
+    STAGE_SECONDS.observe(0.002, stage='decode')
+    STAGE_SECONDS.observe(0.010, stage='inference')
+    result = profile.finish()
+
+    assert current_profile() is None
+    assert list(result['stages']) == ['inference', 'decode']
+    assert result['stages']['decode']['count'] == 2
+    assert result['stages']['decode']['ms'] == pytest.approx(3.0)
+    assert result['dump'] is None
+    # Only what happened while the profile was current
+    STAGE_SECONDS.observe(1.0, stage='decode')
+    assert profile.stages['decode'][1] == 2
+
+
+def test_finish_is_idempotent():
+    profile = RequestProfile('test').start()
+    first = profile.finish()
+
+    assert profile.finish() is first
+
+
+@pytest.mark.parametrize('tool, extension', [('cprofile', '.prof'), ('sample', '.folded')])
+def test_dumps_are_written_with_their_breakdown(tmp_path, tool, extension):
+    profile = RequestProfile('/api/predict', tool=tool, dump_dir=str(tmp_path)).start()
+    busy(0.05)
+    result = profile.finish()
+
+    assert result['dump'].endswith(extension)
+    assert os.path.getsize(result['dump']) > 0
+    with open(result['dump'][:-len(extension)] + '.json') as f:
+        summary = json.load(f)
+    assert (summary['id'], summary['label'], summary['tool']) == (profile.id, '/api/predict', tool)
+    if tool == 'sample':
+        with open(result['dump']) as f:
+            assert 'busy (test_profiling.py' in f.read()
+
+
+def test_unwritable_dump_dir_only_loses_the_dump(tmp_path, capsys):
+    not_a_dir = tmp_path / 'file'
+    not_a_dir.write_text('')
+
+    result = RequestProfile('test', tool='cprofile', dump_dir=str(not_a_dir)).start().finish()
+
+    assert result['dump'] is None
+    assert 'Could not write profile' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('enabled, flag, expected', [
+    (False, '1', (False, False)),
+    (True, None, (False, False)),
+    (True, '0', (False, False)),
+    (True, 'false', (False, False)),
+    (True, '1', (True, True)),
+    (True, 'cProfile', (True, True)),
+])
+def test_profile_flag_needs_profiling_enabled(tmp_path, enabled, flag, expected):
+    profile, in_response = RequestProfiler(enabled=enabled, dump_dir=str(tmp_path)).start('test', flag)
+    if profile is not None:
+        profile.finish()
+
+    assert (profile is not None, in_response) == expected
+
+
+def test_flag_picks_the_tool(tmp_path):
+    profiler = RequestProfiler(enabled=True, dump_dir=str(tmp_path))
+
+    for flag, tool in [('1', None), ('cprofile', 'cprofile'), ('sample', 'sample')]:
+        profile, _ = profiler.start('test', flag)
+        profile.finish()
+        assert profile.tool == tool
+
+
+def test_sampling_profiles_one_in_n_without_changing_responses(tmp_path):
+    profiler = RequestProfiler(dump_dir=str(tmp_path), sample_rate=3, sample_tool='cprofile')
+
+    picked = []
+    for _ in range(9):
+        profile, in_response = profiler.start('test')
+        picked.append(profile is not None)
+        assert not in_response
+        if profile is not None:
+            assert profile.sampled and profile.tool == 'cprofile'
+            profile.finish()
+
+    assert picked == [False, False, True] * 3
+    assert len(list(tmp_path.glob('*.prof'))) == 3
+
+
+def test_unknown_sample_tool_is_rejected():
+    with pytest.raises(ValueError):
+        RequestProfiler(sample_tool='perf')
+
+
+def test_shared_forward_pass_is_profiled_once():
+    class Predictor:
+        def __init__(self):
+            self.batches = []
+
+        def predict_arrays(self, img_batch):
+            self.batches.append(len(img_batch))
+            return [{'success': True} for _ in img_batch]
+
+    predictor = Predictor()
+    batcher = MicroBatcher(predictor, max_batch_size=3, max_wait_ms=1000)
+    profile = RequestProfile('test').start()
+    try:
+        futures = [batcher.submit_async(np.zeros((4, 4, 3), dtype=np.float32)) for _ in range(3)]
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        profile.finish()
+
+    assert predictor.batches == [3]
+    assert profile.stages['inference'][1] == 1
+    assert profile.stages['batch_wait'][1] == 3
@@ -0,0 +1,152 @@
+"""
+Tests for the shared-memory process pool: capacity, buffer reuse, error
+isolation and recovery from dead workers
+"""
+
+import os
+import signal
+import time
+
+import pytest
+
+from metrics import STAGE_SECONDS
+from parallel import PoolFullError
+from preprocessing import PreprocessingEngine
+from shm_pool import SharedMemoryPreprocessPool
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        pool = SharedMemoryPreprocessPool(PreprocessingEngine().get_options(), processes=2, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_batch_larger_than_max_pending_streams_through(make_pool, png_files):
+    pool = make_pool(max_pending=2, buffer_capacity=4)
+    paths = png_files(7)
+
+    batch, valid_indices, errors = pool.preprocess_batch(None, paths)
+    try:
+        assert batch.shape == (7, 224, 224, 3)
+        assert valid_indices == list(range(7))
+        assert errors == {}
+    finally:
+        pool.release_batch(batch)
+
+    stats = pool.get_stats()
+    assert (stats['pending'], stats['completed'], stats['rejected']) == (0, 7, 0)
+    assert stats['buffers_in_use'] == 0
+
+
+def test_busy_pool_rejects_after_the_submit_timeout(make_pool, png_files):
+    pool = make_pool(max_pending=2, submit_timeout=0.05)
+    paths = png_files(3)
+    # Stand in for other requests holding every slot
+    for _ in range(pool.max_pending):
+        pool._slots.acquire()
+    try:
+        with pytest.raises(PoolFullError):
+            pool.preprocess_batch(None, paths)
+    finally:
+        for _ in range(pool.max_pending):
+            pool._slots.release()
+
+    assert pool.get_stats()['rejected'] == 3
+    batch, valid_indices, _ = pool.preprocess_batch(None, paths)
+    pool.release_batch(batch)
+    assert valid_indices == [0, 1, 2]
+
+
+def test_failed_image_only_fails_its_slot(make_pool, png_files, tmp_path):
+    pool = make_pool(max_pending=4)
+    paths = png_files(3)
+    paths.insert(1, str(tmp_path / 'missing.png'))
+
+    batch, valid_indices, errors = pool.preprocess_batch(None, paths)
+    try:
+        assert batch.shape[0] == 3
+        assert valid_indices == [0, 2, 3]
+        assert list(errors) == [1]
+    finally:
+        pool.release_batch(batch)
+
+
+def test_pooled_buffers_are_reused(make_pool, png_files):
+    pool = make_pool(max_pending=4, buffer_capacity=4)
+    paths = png_files(3)
+
+    for _ in range(3):
+        batch, _, _ = pool.preprocess_batch(None, paths)
+        pool.release_batch(batch)
+
+    stats = pool.get_stats()
+    assert (stats['shared_buffers'], stats['buffers_free'], stats['buffers_in_use']) == (1, 1, 0)
+
+
+def worker_maps(pool, name):
+    """
+    Whether any worker process still maps the shared-memory block `name`
+    """
+    for pid in pool._executor._processes:
+        with open(f'/proc/{pid}/maps') as f:
+            if any(name in line for line in f):
+                return True
+    return False
+
+
+@pytest.mark.skipif(not os.path.isdir('/dev/shm'), reason='needs /dev/shm')
+def test_oversized_buffers_are_freed_on_release(make_pool, png_files):
+    pool = make_pool(max_pending=8, buffer_capacity=2)
+
+    batch, valid_indices, _ = pool.preprocess_batch(None, png_files(5))
+    assert valid_indices == list(range(5))
+    name = pool._in_use[id(batch)].shm.name.lstrip('/')
+    pool.release_batch(batch)
+    del batch
+
+    assert pool.get_stats()['buffers_free'] == 0
+    assert not os.path.exists(f'/dev/shm/{name}')
+    assert not worker_maps(pool, name)
+
+
+def test_pool_recovers_from_a_dead_worker(make_pool, png_files):
+    pool = make_pool(max_pending=4)
+    pool.warmup()
+    paths = png_files(3)
+
+    os.kill(next(iter(pool._executor._processes)), signal.SIGKILL)
+    deadline = time.monotonic() + 5
+    while not pool._executor._broken and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    batch, valid_indices, errors = pool.preprocess_batch(None, paths)
+    pool.release_batch(batch)
+    assert (valid_indices, errors) == ([0, 1, 2], {})
+    assert pool.get_stats()['restarts'] == 1
+
+
+def stage_count(stage):
+    for suffix, labels, value in STAGE_SECONDS.samples():
+        if suffix == '_count' and labels == f'{{stage="{stage}"}}':
+            return value
+    return 0
+
+
+def test_worker_stage_timings_reach_the_parent(make_pool, png_files):
+    pool = make_pool(max_pending=4)
+    before = {stage: stage_count(stage) for stage in ('decode', 'resize')}
+
+    batch, _, _ = pool.preprocess_batch(None, png_files(3))
+    pool.release_batch(batch)
+
+    assert {stage: stage_count(stage) - count for stage, count in before.items()} == {
+        'decode': 3, 'resize': 3
+    }